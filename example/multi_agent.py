@@ -7,56 +7,74 @@ async def multi_agent_example():
     llm = LLM_Provider(model="qwen3:0.6b", provider="ollama")
     factory = AgentFactory()
 
-    # 創建研究員
-    researcher = factory.create_agent(
-        name="研究員",
-        description="專業研究和資訊分析專家",
-        system_prompt="""你是一位專業研究員，專注於：
+    # 研究員完成後，三位審閱者同時審閱，最後由寫作助手整合
+    team_config = {
+        "researcher": {
+            "name": "研究員",
+            "description": "專業研究和資訊分析專家",
+            "system_prompt": """你是一位專業研究員，專注於：
 - 系統性資訊搜集
 - 批判性分析
 - 可靠資料驗證
 - 結構化報告撰寫
 
 請保持學術嚴謹性。""",
-        model=llm.model,
-        tools=["web_search", "pdf_reader"],
-        max_iterations=15
-    )
-
-    # 創建寫作助手
-    writer = factory.create_agent(
-        name="寫作助手",
-        description="專業內容創作和編輯專家",
-        system_prompt="""你是一位專業寫作助手，專注於：
+            "tools": ["web_search", "pdf_reader"],
+            "max_iterations": 15,
+            "prompt": "請深入研究 {input}，提供詳細的分析報告"
+        },
+        "accuracy_reviewer": {
+            "name": "事實審閱者",
+            "system_prompt": "你負責檢查研究報告中的事實與資料來源是否正確。",
+            "depends_on": ["researcher"],
+            "prompt": "請審閱以下研究報告的正確性：\n\n{researcher}"
+        },
+        "education_reviewer": {
+            "name": "教育審閱者",
+            "system_prompt": "你是教育領域專家，負責評估研究內容對教學現場的實用性。",
+            "depends_on": ["researcher"],
+            "prompt": "請從教學實務的角度審閱以下研究報告：\n\n{researcher}"
+        },
+        "ethics_reviewer": {
+            "name": "倫理審閱者",
+            "system_prompt": "你負責指出研究內容中的隱私、公平性與倫理風險。",
+            "depends_on": ["researcher"],
+            "prompt": "請審閱以下研究報告的倫理風險：\n\n{researcher}"
+        },
+        "writer": {
+            "name": "寫作助手",
+            "description": "專業內容創作和編輯專家",
+            "system_prompt": """你是一位專業寫作助手，專注於：
 - 內容結構規劃
 - 語言表達優化
 - 讀者體驗考量
 - 品質控制檢查
 
 請創作引人入勝的內容。""",
-        model=llm.model,
-        tools=["grammar_checker", "style_analyzer"],
-        max_iterations=10
-    )
+            "tools": ["grammar_checker", "style_analyzer"],
+            "max_iterations": 10,
+            "depends_on": ["researcher", "accuracy_reviewer", "education_reviewer", "ethics_reviewer"],
+            "prompt": """基於以下研究資料與審閱意見，撰寫一份易讀的報告：
+
+{researcher}
+
+事實審閱：{accuracy_reviewer}
 
-    # 初始化代理
-    await researcher.initialize()
-    await writer.initialize()
+教育審閱：{education_reviewer}
 
-    # 協作生成報告
-    research_topic = "人工智慧在教育領域的應用"
+倫理審閱：{ethics_reviewer}"""
+        }
+    }
 
-    # 第一階段：研究
-    research_data = await researcher.process_message(
-        f"請深入研究 {research_topic}，提供詳細的分析報告"
-    )
+    team = factory.create_agent_team(team_config, llm.model, max_concurrency=3)
+    result = await team.run("人工智慧在教育領域的應用")
 
-    # 第二階段：寫作
-    final_report = await writer.process_message(
-        f"基於以下研究資料，撰寫一份易讀的報告：\n\n{research_data}"
-    )
+    # 各步驟的計時
+    for step in result.steps.values():
+        print(f"{step.step_id}: {step.status}，開始 {step.started_at:.1f}s，耗時 {step.duration:.1f}s")
+    print(f"總耗時 {result.elapsed:.1f}s，關鍵路徑: {' → '.join(result.critical_path)}")
 
-    return final_report
+    return result.content
 
 async def main():
     report = await multi_agent_example()
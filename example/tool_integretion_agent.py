@@ -12,8 +12,8 @@ async def tool_integration_example():
     # 初始化工具管理器
     tool_manager = ToolManager()
 
-    # 初始化 MCP 客戶端
-    mcp_client = MCPClientService(
+    # 初始化 MCP 客戶端（在目前的事件迴圈中啟動伺服器）
+    mcp_client = await MCPClientService.create(
         mcp_config["mcpServers"],
         tool_manager
     )
@@ -34,12 +34,15 @@ async def tool_integration_example():
     )
 
     await agent.initialize()
-    return agent
+    return agent, mcp_client
 
 async def main():
-    agent = await tool_integration_example()
-    result = await agent.process_message("請用合適的工具查詢天氣")
-    print(result)
+    agent, mcp_client = await tool_integration_example()
+    try:
+        result = await agent.process_message("請用合適的工具查詢天氣")
+        print(result)
+    finally:
+        await mcp_client.aclose()
 
 if __name__ == "__main__":
     asyncio.run(main())
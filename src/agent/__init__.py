@@ -1,11 +1,33 @@
 """Agent 模組初始化"""
 
+from typing import TYPE_CHECKING, Any
+
 from .core.agent_factory import AgentFactory
 from .core.base_agent import BaseAgent, ReactAgent
-from .core.llm_factory import LLM_Provider
-from .tools.mcp_client import MCPClientService
-from .tools.tool_manager import ToolManager
-from .types.agent_types import AgentConfig, AgentState
+from .core.checkpoint import CheckpointBackend, SQLiteCheckpointBackend
+from .core.context_manager import ContextManager, ContextPolicy, register_context_policy
+from .core.graph_cache import GraphCache
+from .core.hedging import HedgedChatModel
+from .core.llm_factory import LLM_Provider, register_provider
+from .core.model_pool import ModelPool, get_model_pool
+from .core.resilience import CircuitBreaker, ResilientChatModel, RetryPolicy
+from .core.response_cache import ResponseCache
+from .core.router import RouterChatModel
+from .core.session import AgentSession, InMemorySessionStore, SessionStore
+from .core.team import AgentTeam
+from .tools.tool_manager import ToolManager, ToolSnapshot
+from .types.agent_types import AgentConfig, AgentResult, AgentState, TeamResult, TeamStep, TeamStepResult
+
+if TYPE_CHECKING:
+    from .tools.mcp_client import MCPClientService
+
+
+def __getattr__(name: str) -> Any:
+    # MCP 相關套件（mcp、langchain_mcp_adapters）載入較慢，僅在使用 MCPClientService 時匯入
+    if name == "MCPClientService":
+        from .tools.mcp_client import MCPClientService
+        return MCPClientService
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = [
     # Core classes
@@ -13,12 +35,36 @@ __all__ = [
     "ReactAgent",
     "AgentFactory",
     "LLM_Provider",
+    "register_provider",
+    "ModelPool",
+    "get_model_pool",
+    "ResponseCache",
+    "ResilientChatModel",
+    "RetryPolicy",
+    "CircuitBreaker",
+    "RouterChatModel",
+    "HedgedChatModel",
+    "ContextManager",
+    "ContextPolicy",
+    "register_context_policy",
+    "AgentSession",
+    "SessionStore",
+    "InMemorySessionStore",
+    "CheckpointBackend",
+    "SQLiteCheckpointBackend",
+    "GraphCache",
+    "AgentTeam",
 
     # Tools
     "ToolManager",
+    "ToolSnapshot",
     "MCPClientService",
 
     # Types
     "AgentConfig",
+    "AgentResult",
     "AgentState",
+    "TeamStep",
+    "TeamStepResult",
+    "TeamResult",
 ]
@@ -1,13 +1,18 @@
 """Agent 工廠 - 簡化版本，直接使用參數創建 Agent"""
 
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from langchain_core.language_models.chat_models import BaseChatModel
 
 from ..core.base_agent import BaseAgent, ReactAgent
+from ..core.checkpoint import CheckpointBackend
+from ..core.graph_cache import GraphCache
+from ..core.llm_factory import LLM_Provider
+from ..core.model_pool import get_model_pool
+from ..core.team import AgentTeam
 from ..tools.tool_manager import ToolManager
-from ..types.agent_types import AgentConfig
+from ..types.agent_types import AgentConfig, TeamStep
 
 logger = logging.getLogger(__name__)
 
@@ -26,8 +31,19 @@ class AgentFactory:
     3. 多 Agent 協作
     """
 
-    def __init__(self, tool_manager: Optional[ToolManager] = None):
+    def __init__(
+        self,
+        tool_manager: Optional[ToolManager] = None,
+        checkpoint: Optional[CheckpointBackend] = None,
+        graph_cache: Optional[GraphCache] = None,
+        max_execution_time: Optional[float] = None
+    ):
         self.tool_manager = tool_manager
+        self.checkpoint = checkpoint
+        # 未個別指定時套用到工廠建立的 Agent（通常來自 AppConfig.max_execution_time）
+        self.max_execution_time = max_execution_time
+        # 工廠建立的 Agent 共用編譯後的 graph
+        self.graph_cache = graph_cache or GraphCache()
         logger.info("初始化簡化版 Agent 工廠")
 
     def create_agent(
@@ -38,7 +54,12 @@ class AgentFactory:
         model: BaseChatModel,
         tools: Optional[List[str]] = None,
         max_iterations: int = 10,
-        temperature: float = 0.7
+        max_execution_time: Optional[float] = None,
+        temperature: float = 0.7,
+        context_token_budget: Optional[int] = None,
+        context_policy: str = "system_recent",
+        tool_top_k: Optional[int] = None,
+        always_include_tools: Optional[List[str]] = None
     ) -> ReactAgent:
         """創建 Agent"""
         # 創建配置
@@ -48,14 +69,21 @@ class AgentFactory:
             system_prompt=system_prompt,
             tools=tools or [],
             max_iterations=max_iterations,
-            temperature=temperature
+            max_execution_time=max_execution_time if max_execution_time is not None else self.max_execution_time,
+            temperature=temperature,
+            context_token_budget=context_token_budget,
+            context_policy=context_policy,
+            tool_top_k=tool_top_k,
+            always_include_tools=always_include_tools or []
         )
 
         # 創建 Agent
         agent = ReactAgent(
             config=config,
             model=model,
-            tool_manager=self.tool_manager
+            tool_manager=self.tool_manager,
+            checkpoint=self.checkpoint,
+            graph_cache=self.graph_cache
         )
 
         logger.info(f"成功創建 Agent: {config.name}")
@@ -67,10 +95,14 @@ class AgentFactory:
         model: BaseChatModel
     ) -> ReactAgent:
         """創建完全自定義的 Agent"""
+        if config.max_execution_time is None and self.max_execution_time is not None:
+            config = config.model_copy(update={"max_execution_time": self.max_execution_time})
         agent = ReactAgent(
             config=config,
             model=model,
-            tool_manager=self.tool_manager
+            tool_manager=self.tool_manager,
+            checkpoint=self.checkpoint,
+            graph_cache=self.graph_cache
         )
         logger.info(f"成功創建自定義 Agent: {config.name}")
         return agent
@@ -80,7 +112,12 @@ class AgentFactory:
         team_config: Dict[str, Dict[str, Any]],
         model: BaseChatModel
     ) -> Dict[str, ReactAgent]:
-        """創建多 Agent 協作團隊"""
+        """
+        創建多 Agent 協作團隊
+
+        成員配置可包含 llm_config（LLM_Provider 參數），相同配置的成員
+        會透過模型池共用同一個模型實例；未指定時使用傳入的 model。
+        """
         team = {}
 
         for agent_id, config in team_config.items():
@@ -90,30 +127,82 @@ class AgentFactory:
             system_prompt = config.get("system_prompt", "你是一個有用的AI助理。")
             tools = config.get("tools", [])
             max_iterations = config.get("max_iterations", 10)
+            max_execution_time = config.get("max_execution_time")
             temperature = config.get("temperature", 0.7)
+            context_token_budget = config.get("context_token_budget")
+            context_policy = config.get("context_policy", "system_recent")
+            tool_top_k = config.get("tool_top_k")
+            always_include_tools = config.get("always_include_tools")
+            llm_config = config.get("llm_config")
+            agent_model = LLM_Provider(**llm_config).model if llm_config else model
 
             agent = self.create_agent(
                 name=name,
                 description=description,
                 system_prompt=system_prompt,
-                model=model,
+                model=agent_model,
                 tools=tools,
                 max_iterations=max_iterations,
-                temperature=temperature
+                max_execution_time=max_execution_time,
+                temperature=temperature,
+                context_token_budget=context_token_budget,
+                context_policy=context_policy,
+                tool_top_k=tool_top_k,
+                always_include_tools=always_include_tools
             )
             team[agent_id] = agent
 
         logger.info(f"成功創建多 Agent 團隊，包含 {len(team)} 個 Agent")
         return team
 
+    def create_agent_team(
+        self,
+        team_config: Dict[str, Dict[str, Any]],
+        model: BaseChatModel,
+        steps: Optional[List[Union[TeamStep, Dict[str, Any]]]] = None,
+        max_concurrency: Optional[int] = None
+    ) -> AgentTeam:
+        """
+        創建以 DAG 執行的多 Agent 團隊流程
+
+        未指定 steps 時每個成員為一個步驟（步驟 ID 即成員 ID），由成員配置的
+        depends_on、prompt 與 step_timeout 描述相依關係；指定 steps 時同一個
+        成員可出現在多個步驟中。
+
+        Args:
+            team_config: 成員配置（同 create_multi_agent_team）
+            model: 預設模型
+            steps: 流程步驟（TeamStep 或其欄位組成的 dict）
+            max_concurrency: 同時執行的步驟數上限
+        """
+        agents = self.create_multi_agent_team(team_config, model)
+        if steps is None:
+            steps = [
+                TeamStep(
+                    id=agent_id,
+                    agent=agent_id,
+                    prompt=config.get("prompt"),
+                    depends_on=config.get("depends_on", []),
+                    timeout=config.get("step_timeout")
+                )
+                for agent_id, config in team_config.items()
+            ]
+        steps = [step if isinstance(step, TeamStep) else TeamStep(**step) for step in steps]
+        return AgentTeam(agents, steps, max_concurrency=max_concurrency)
+
     def get_factory_status(self) -> Dict[str, Any]:
         """獲取工廠狀態"""
         return {
             "tool_manager": self.tool_manager is not None,
+            "checkpoint": self.checkpoint is not None,
+            "max_execution_time": self.max_execution_time,
+            "graph_cache": self.graph_cache.get_stats(),
+            "model_pool": get_model_pool().get_stats(),
             "capabilities": [
                 "直接參數創建 Agent",
                 "自定義配置支援",
                 "多Agent協作",
+                "DAG 團隊流程",
                 "工具管理整合"
             ]
         }
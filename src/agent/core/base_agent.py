@@ -2,15 +2,22 @@
 
 import asyncio
 import logging
+import time
 from abc import ABC, abstractmethod
-from typing import Any, AsyncGenerator, Dict, List, Optional
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional
 
 from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
 from langchain_core.tools import BaseTool
-from langgraph.prebuilt import create_react_agent
+from langgraph.errors import GraphRecursionError
 
-from ..tools.tool_manager import ToolManager
-from ..types.agent_types import AgentConfig, AgentState, Message
+from ..tools.tool_manager import ToolManager, ToolSnapshot
+from ..tools.tool_retriever import ToolSelector
+from .checkpoint import CheckpointBackend
+from .context_manager import ContextManager
+from .graph_cache import GraphCache
+from .session import DEFAULT_SESSION_ID, AgentSession, InMemorySessionStore, SessionStore
+from ..types.agent_types import AgentConfig, AgentResult, AgentState, Message, StreamEvent, content_to_text
 
 logger = logging.getLogger(__name__)
 
@@ -18,12 +25,27 @@ logger = logging.getLogger(__name__)
 class BaseAgent(ABC):
     """基礎 Agent 抽象類別"""
 
-    def __init__(self, config: AgentConfig, model: BaseChatModel, tool_manager: Optional[ToolManager] = None):
+    def __init__(
+        self,
+        config: AgentConfig,
+        model: BaseChatModel,
+        tool_manager: Optional[ToolManager] = None,
+        session_store: Optional[SessionStore] = None,
+        checkpoint: Optional[CheckpointBackend] = None,
+        graph_cache: Optional[GraphCache] = None
+    ):
         self.config = config
         self.model = model
         self.tool_manager = tool_manager
-        self.state = AgentState()
         self._agent = None
+        # 建立 graph 時的工具註冊表版本，版本變更時重新建立
+        self._tool_version: Optional[int] = None
+        # 所有 Session 共用同一個編譯好的 graph，對話狀態存放在 Session 中
+        self.session_store = session_store or InMemorySessionStore()
+        # 可選的持久化檢查點，Session 於首次存取時延遲載入
+        self.checkpoint = checkpoint
+        # 可選的共享 graph 快取，相同配置的 Agent 共用編譯結果
+        self.graph_cache = graph_cache
 
     @property
     def name(self) -> str:
@@ -39,40 +61,131 @@ class BaseAgent(ABC):
         pass
 
     @abstractmethod
-    async def process_message(self, message: str, context: Optional[Dict[str, Any]] = None) -> str:
+    async def process_message(
+        self,
+        message: str,
+        context: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None
+    ) -> str:
         """處理訊息"""
         pass
 
-    async def stream_response(self, message: str, context: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+    async def stream_response(
+        self,
+        message: str,
+        context: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None
+    ) -> AsyncGenerator[StreamEvent, None]:
         """流式回應"""
         # 預設實現，子類可覆寫
-        response = await self.process_message(message, context)
-        yield response
+        response = await self.process_message(message, context, session_id=session_id)
+        yield StreamEvent(type="final", content=response)
 
-    def get_available_tools(self) -> List[BaseTool]:
+    def get_available_tools(self, snapshot: Optional[ToolSnapshot] = None) -> List[BaseTool]:
         """取得可用工具"""
         if not self.tool_manager:
             return []
 
-        tool_names = self.config.tools
-        if not tool_names:
-            return self.tool_manager.get_all_tools()
+        # 套用 ToolManager 中設定的併發上限、逾時與同步工具執行緒池
+        return self.tool_manager.get_executable_tools(self.config.tools or None, snapshot=snapshot)
+
+    def _tools_changed(self) -> bool:
+        """工具註冊表是否在 graph 建立後變更"""
+        return self.tool_manager is not None and self.tool_manager.version != self._tool_version
+
+    # ------------------------------------------------------------------
+    # Session 管理
+    # ------------------------------------------------------------------
+
+    def _new_context_manager(self) -> ContextManager:
+        context_manager = ContextManager(
+            budget=self.config.context_token_budget,
+            policy=self.config.context_policy,
+            model=self.model
+        )
+        context_manager.reserved = context_manager.count_tokens(self.config.system_prompt)
+        return context_manager
+
+    def get_session(self, session_id: Optional[str] = None) -> AgentSession:
+        """取得 Session，不存在時建立"""
+        session_id = session_id or DEFAULT_SESSION_ID
+        session = self.session_store.get(session_id)
+        if session is None:
+            session = AgentSession(session_id, self._new_context_manager())
+            if self.checkpoint is not None:
+                session.add_native_messages(self.checkpoint.load(self._checkpoint_key(session_id)))
+                session.persisted_count = len(session.buffer)
+            self.session_store.put(session)
+        return session
+
+    def _checkpoint_key(self, session_id: str) -> str:
+        return f"{self.name}:{session_id}"
+
+    async def _save_session(self, session: AgentSession) -> None:
+        """只將本輪新增的訊息寫入檢查點"""
+        if self.checkpoint is not None:
+            new_messages = session.buffer[session.persisted_count:]
+            if new_messages:
+                session.persisted_count = len(session.buffer)
+                try:
+                    await asyncio.to_thread(
+                        self.checkpoint.append, self._checkpoint_key(session.session_id), new_messages
+                    )
+                except Exception as e:
+                    logger.error(f"寫入檢查點失敗 {session.session_id}: {e}")
+        self.session_store.touch(session)
 
-        return [self.tool_manager.get_tool(name) for name in tool_names if self.tool_manager.get_tool(name)]
+    @property
+    def state(self) -> AgentState:
+        """預設 Session 的狀態"""
+        return self.get_session().state
+
+    @property
+    def context_manager(self) -> ContextManager:
+        """預設 Session 的上下文管理器"""
+        return self.get_session().context_manager
 
-    def add_message(self, message: Message) -> None:
+    def add_message(self, message: Message, session_id: Optional[str] = None) -> None:
         """添加訊息到狀態"""
-        self.state.messages.append(message)
+        self.get_session(session_id).add_message(message)
+
+    def add_native_messages(self, messages: List[BaseMessage], session_id: Optional[str] = None) -> None:
+        """添加 LangChain 原生訊息到緩衝區與狀態（每則訊息只轉換一次）"""
+        self.get_session(session_id).add_native_messages(messages)
+
+    def get_context_messages(self, session_id: Optional[str] = None) -> List[BaseMessage]:
+        """取得本輪要送給模型的訊息（依 token 預算與策略裁剪）"""
+        session = self.get_session(session_id)
+        return session.context_manager.select(session.buffer)
 
-    def get_conversation_history(self, limit: Optional[int] = None) -> List[Message]:
+    def pin_message(self, index: int, session_id: Optional[str] = None) -> None:
+        """釘選對話歷史中的訊息，使其不被上下文裁剪"""
+        self.get_session(session_id).context_manager.pin(index)
+
+    def get_conversation_history(self, limit: Optional[int] = None, session_id: Optional[str] = None) -> List[Message]:
         """取得對話歷史"""
+        messages = self.get_session(session_id).state.messages
         if limit:
-            return self.state.messages[-limit:]
-        return self.state.messages
+            return messages[-limit:]
+        return messages
 
-    def reset_state(self) -> None:
+    def reset_state(self, session_id: Optional[str] = None) -> None:
         """重置狀態"""
-        self.state = AgentState()
+        session = self.get_session(session_id)
+        session.reset()
+        if self.checkpoint is not None:
+            self.checkpoint.reset(self._checkpoint_key(session.session_id))
+
+    async def discard_session(self, session_id: str) -> None:
+        """移除暫時性的 Session，連同檢查點中的紀錄一併清除"""
+        self.session_store.delete(session_id)
+        if self.checkpoint is not None:
+            key = self._checkpoint_key(session_id)
+            try:
+                await asyncio.to_thread(self.checkpoint.reset, key)
+                await asyncio.to_thread(self.checkpoint.compact, key)
+            except Exception as e:
+                logger.error(f"清除檢查點失敗 {session_id}: {e}")
 
 
 class ReactAgent(BaseAgent):
@@ -81,77 +194,276 @@ class ReactAgent(BaseAgent):
     async def initialize(self) -> None:
         """初始化 ReAct Agent"""
         try:
-            tools = self.get_available_tools()
+            snapshot = self.tool_manager.snapshot() if self.tool_manager else None
+            tools = self.get_available_tools(snapshot)
+
+            # 工具數超過 tool_top_k 時，每輪只綁定檢索出的工具；工具節點仍保有全部工具
+            top_k = self.config.tool_top_k
+            retrieval = bool(snapshot and top_k and len(tools) > top_k)
+            retrieval_key = (top_k, tuple(self.config.always_include_tools)) if retrieval else None
 
             # 使用 LangGraph 最新 API，直接傳入 prompt 參數
-            self._agent = create_react_agent(
-                model=self.model,
-                tools=tools,
-                prompt=self.config.system_prompt
-            )
+            def build():
+                # langgraph.prebuilt 載入較慢，延遲到首次建立 graph 時才匯入
+                from langgraph.prebuilt import create_react_agent
+
+                model = self.model
+                if retrieval:
+                    model = ToolSelector(
+                        self.model, tools, snapshot.index, top_k, self.config.always_include_tools
+                    )
+                return create_react_agent(
+                    model=model,
+                    tools=tools,
+                    prompt=self.config.system_prompt
+                )
+
+            if self.graph_cache is not None:
+                self._agent = self.graph_cache.get_or_build(
+                    self.model,
+                    tools,
+                    self.config.system_prompt,
+                    build,
+                    tool_version=snapshot.version if snapshot else None,
+                    extra=retrieval_key,
+                    tool_manager=self.tool_manager
+                )
+            else:
+                self._agent = build()
+            self._tool_version = snapshot.version if snapshot else None
             logger.info(f"成功初始化 {self.name} Agent，工具數量: {len(tools)}")
         except Exception as e:
             logger.error(f"初始化 {self.name} Agent 失敗: {e}")
             raise
 
-    async def process_message(self, message: str, context: Optional[Dict[str, Any]] = None) -> str:
-        """處理訊息"""
-        if not self._agent:
+    def _run_config(self) -> Dict[str, Any]:
+        """graph 執行設定：每次迭代包含模型與工具兩個步驟"""
+        return {"recursion_limit": 2 * self.config.max_iterations + 1}
+
+    def _deadline(self, timeout: Optional[float]) -> Optional[float]:
+        timeout = timeout if timeout is not None else self.config.max_execution_time
+        return time.monotonic() + timeout if timeout is not None else None
+
+    async def process_message(
+        self,
+        message: str,
+        context: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None
+    ) -> str:
+        """
+        處理訊息
+
+        不同 session_id 的對話共用同一個編譯好的 graph 並可同時執行；
+        同一 Session 的回合依序執行。需要結束狀態時請使用 run()。
+        """
+        result = await self.run(message, context, session_id=session_id)
+        return result.content or result.error or ""
+
+    async def run(
+        self,
+        message: str,
+        context: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> AgentResult:
+        """
+        執行一個回合並回傳結構化結果
+
+        迭代次數受 config.max_iterations 限制，執行時間受 timeout（未指定時為
+        config.max_execution_time）限制。達到限制時會取消進行中的模型與工具呼叫，
+        回傳 status 為 max_iterations 或 timeout 的部分結果。
+        """
+        if not self._agent or self._tools_changed():
             await self.initialize()
 
+        session = self.get_session(session_id)
+        async with session.lock:
+            try:
+                return await self._run_turn(session, message, self._deadline(timeout))
+            finally:
+                await self._save_session(session)
+
+    async def _run_turn(self, session: AgentSession, message: str, deadline: Optional[float]) -> AgentResult:
+        """在已取得 Session 鎖的情況下執行一個回合"""
+        start = time.monotonic()
+        new_messages: List[BaseMessage] = []
         try:
             # 創建訊息物件
             user_message = Message(role="user", content=message)
-            self.add_message(user_message)
+            session.add_message(user_message)
 
-            # 準備輸入
-            input_data = {
-                "messages": [{"role": msg.role, "content": msg.content} for msg in self.state.messages]
-            }
+            # 直接傳入原生訊息（依 token 預算裁剪），避免每輪重建整段歷史
+            input_data = {"messages": session.context_manager.select(session.buffer)}
 
-            # 調用 agent
-            result = await self._agent.ainvoke(input_data)
-
-            # 處理結果
-            if isinstance(result, dict) and "messages" in result:
-                last_message = result["messages"][-1]
-                response_content = getattr(last_message, "content", str(last_message))
-            else:
-                response_content = str(result)
-
-            # 添加回應到狀態
-            assistant_message = Message(role="assistant", content=response_content)
-            self.add_message(assistant_message)
-
-            return response_content
+            # updates 模式逐步回傳各節點輸出，達到限制時仍保有已完成的步驟
+            updates = self._agent.astream(input_data, config=self._run_config(), stream_mode="updates")
+            async for payload in _with_deadline(updates, deadline):
+                new_messages.extend(_update_messages(payload))
+            status, error = "completed", None
 
+        except GraphRecursionError:
+            status, error = "max_iterations", f"已達到最大迭代次數 ({self.config.max_iterations})，回應未完成"
+        except asyncio.TimeoutError:
+            status, error = "timeout", f"執行逾時 ({time.monotonic() - start:.1f} 秒)，回應未完成"
         except Exception as e:
             error_msg = f"處理訊息時發生錯誤: {e}"
             logger.error(error_msg)
-            return error_msg
-
-    async def stream_response(self, message: str, context: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
-        """流式回應"""
-        if not self._agent:
+            return AgentResult(status="error", error=error_msg, elapsed=time.monotonic() - start)
+
+        if status != "completed":
+            logger.warning(f"{self.name}: {error}")
+            new_messages = _complete_steps(new_messages)
+        session.add_native_messages(new_messages)
+        return self._result(status, new_messages, start, error)
+
+    @staticmethod
+    def _result(status: str, new_messages: List[BaseMessage], start: float, error: Optional[str] = None) -> AgentResult:
+        ai_messages = [m for m in new_messages if isinstance(m, AIMessage)]
+        if status == "completed":
+            content = content_to_text(new_messages[-1].content) if new_messages else ""
+        else:
+            # 部分結果：取最近一則有文字的助理訊息
+            texts = [content_to_text(m.content) for m in ai_messages]
+            content = next((text for text in reversed(texts) if text), "")
+        return AgentResult(
+            content=content,
+            status=status,
+            messages=[Message.from_langchain(m) for m in new_messages],
+            iterations=len(ai_messages),
+            elapsed=time.monotonic() - start,
+            error=error
+        )
+
+    async def stream_response(
+        self,
+        message: str,
+        context: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncGenerator[StreamEvent, None]:
+        """
+        流式回應
+
+        以 token 為單位輸出 StreamEvent：text_delta、tool_call_start、
+        tool_call_end，結束時輸出 final 並將回應寫入對話歷史。達到迭代或
+        時間限制時，final 的 metadata 會包含 status 與 error。
+        """
+        if not self._agent or self._tools_changed():
             await self.initialize()
 
+        session = self.get_session(session_id)
+        async with session.lock:
+            try:
+                async for event in self._stream_turn(session, message, self._deadline(timeout)):
+                    yield event
+            finally:
+                await self._save_session(session)
+
+    async def _stream_turn(
+        self,
+        session: AgentSession,
+        message: str,
+        deadline: Optional[float] = None
+    ) -> AsyncGenerator[StreamEvent, None]:
+        """在已取得 Session 鎖的情況下執行一個流式回合"""
+        start = time.monotonic()
+        new_messages: List[BaseMessage] = []
         try:
             user_message = Message(role="user", content=message)
-            self.add_message(user_message)
-
-            input_data = {
-                "messages": [{"role": msg.role, "content": msg.content} for msg in self.state.messages]
-            }
-
-            # 使用 astream 進行流式處理
-            async for chunk in self._agent.astream(input_data):
-                if isinstance(chunk, dict) and "messages" in chunk:
-                    last_message = chunk["messages"][-1]
-                    content = getattr(last_message, "content", "")
-                    if content:
-                        yield content
-
+            session.add_message(user_message)
+
+            input_data = {"messages": session.context_manager.select(session.buffer)}
+
+            # messages 模式提供 token 級別的增量，updates 模式提供各節點完整輸出
+            stream = self._agent.astream(input_data, config=self._run_config(), stream_mode=["messages", "updates"])
+            async for mode, payload in _with_deadline(stream, deadline):
+                if mode == "updates":
+                    new_messages.extend(_update_messages(payload))
+                    continue
+
+                chunk, _ = payload
+                if isinstance(chunk, AIMessageChunk):
+                    text = content_to_text(chunk.content)
+                    if text:
+                        yield StreamEvent(type="text_delta", content=text)
+                    for tool_chunk in chunk.tool_call_chunks or []:
+                        if tool_chunk.get("name"):
+                            yield StreamEvent(
+                                type="tool_call_start",
+                                tool_name=tool_chunk["name"],
+                                call_id=tool_chunk.get("id")
+                            )
+                elif isinstance(chunk, ToolMessage):
+                    yield StreamEvent(
+                        type="tool_call_end",
+                        content=content_to_text(chunk.content),
+                        tool_name=chunk.name,
+                        call_id=chunk.tool_call_id
+                    )
+
+            status, error = "completed", None
+
+        except GraphRecursionError:
+            status, error = "max_iterations", f"已達到最大迭代次數 ({self.config.max_iterations})，回應未完成"
+        except asyncio.TimeoutError:
+            status, error = "timeout", f"執行逾時 ({time.monotonic() - start:.1f} 秒)，回應未完成"
         except Exception as e:
             error_msg = f"流式處理時發生錯誤: {e}"
             logger.error(error_msg)
-            yield error_msg
+            yield StreamEvent(type="error", content=error_msg)
+            return
+
+        if status != "completed":
+            logger.warning(f"{self.name}: {error}")
+            new_messages = _complete_steps(new_messages)
+        session.add_native_messages(new_messages)
+        result = self._result(status, new_messages, start, error)
+        yield StreamEvent(
+            type="final",
+            content=result.content,
+            metadata={"status": result.status, "iterations": result.iterations, "error": result.error}
+        )
+
+
+def _update_messages(payload: Any) -> List[BaseMessage]:
+    """取出 updates 模式中各節點新增的訊息"""
+    messages: List[BaseMessage] = []
+    for update in (payload or {}).values():
+        if isinstance(update, dict):
+            messages.extend(update.get("messages", []))
+    return messages
+
+
+def _complete_steps(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """移除結尾尚未取得工具結果的工具調用，確保寫入歷史的對話格式正確"""
+    messages = list(messages)
+    while messages and isinstance(messages[-1], AIMessage) and messages[-1].tool_calls:
+        messages.pop()
+    return messages
+
+
+async def _with_deadline(stream: AsyncIterator[Any], deadline: Optional[float]) -> AsyncIterator[Any]:
+    """
+    逐項讀取 graph 串流，超過期限時拋出 asyncio.TimeoutError
+
+    逾時會取消正在等待的步驟，取消訊號會傳遞到進行中的模型與異步工具呼叫
+    （在執行緒中執行的同步工具無法中斷，只會被放棄）。
+    """
+    if deadline is None:
+        async for item in stream:
+            yield item
+        return
+
+    iterator = stream.__aiter__()
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            try:
+                item = await asyncio.wait_for(iterator.__anext__(), remaining)
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        await iterator.aclose()
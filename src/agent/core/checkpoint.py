@@ -0,0 +1,130 @@
+"""Session 持久化 - 只追加的 SQLite 檢查點"""
+
+import json
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointBackend(ABC):
+    """Session 檢查點介面"""
+
+    @abstractmethod
+    def load(self, session_id: str) -> List[BaseMessage]:
+        """載入 Session 的訊息（最後一次重置之後）"""
+
+    @abstractmethod
+    def append(self, session_id: str, messages: List[BaseMessage]) -> None:
+        """追加新訊息"""
+
+    @abstractmethod
+    def reset(self, session_id: str) -> None:
+        """重置 Session"""
+
+    def compact(self, session_id: Optional[str] = None) -> int:
+        """壓縮儲存，回傳移除的紀錄數"""
+        return 0
+
+    def close(self) -> None:
+        """釋放資源"""
+
+
+class SQLiteCheckpointBackend(CheckpointBackend):
+    """
+    只追加的 SQLite 檢查點
+
+    每輪只寫入新增的訊息；重置以追加一筆 reset 紀錄表示，不刪除舊資料。
+    compact() 移除最後一次重置之前的紀錄。
+
+    Args:
+        db_path: SQLite 檔案路徑
+        auto_compact_every: 每寫入多少次 reset 後自動壓縮（None 表示不自動）
+    """
+
+    def __init__(self, db_path: str, auto_compact_every: Optional[int] = 100):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.auto_compact_every = auto_compact_every
+        self._resets_since_compact = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoint_log ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "session_id TEXT NOT NULL, kind TEXT NOT NULL, data TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_checkpoint_session ON checkpoint_log(session_id, seq)")
+        self._db.commit()
+
+    def _last_reset_seq(self, session_id: str) -> int:
+        row = self._db.execute(
+            "SELECT MAX(seq) FROM checkpoint_log WHERE session_id = ? AND kind = 'reset'", (session_id,)
+        ).fetchone()
+        return row[0] or 0
+
+    def load(self, session_id: str) -> List[BaseMessage]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT data FROM checkpoint_log WHERE session_id = ? AND kind = 'message' AND seq > ? ORDER BY seq",
+                (session_id, self._last_reset_seq(session_id))
+            ).fetchall()
+        return messages_from_dict([json.loads(data) for (data,) in rows])
+
+    def append(self, session_id: str, messages: List[BaseMessage]) -> None:
+        if not messages:
+            return
+        rows = [
+            (session_id, "message", json.dumps(message_to_dict(message), ensure_ascii=False))
+            for message in messages
+        ]
+        with self._lock:
+            self._db.executemany("INSERT INTO checkpoint_log (session_id, kind, data) VALUES (?, ?, ?)", rows)
+            self._db.commit()
+
+    def reset(self, session_id: str) -> None:
+        with self._lock:
+            self._db.execute("INSERT INTO checkpoint_log (session_id, kind, data) VALUES (?, 'reset', NULL)", (session_id,))
+            self._db.commit()
+            self._resets_since_compact += 1
+            should_compact = bool(self.auto_compact_every) and self._resets_since_compact >= self.auto_compact_every
+        if should_compact:
+            self.compact()
+
+    def compact(self, session_id: Optional[str] = None) -> int:
+        with self._lock:
+            if session_id is None:
+                cursor = self._db.execute(
+                    "DELETE FROM checkpoint_log WHERE seq <= "
+                    "(SELECT MAX(r.seq) FROM checkpoint_log r "
+                    "WHERE r.session_id = checkpoint_log.session_id AND r.kind = 'reset')"
+                )
+            else:
+                cursor = self._db.execute(
+                    "DELETE FROM checkpoint_log WHERE session_id = ? AND seq <= ?",
+                    (session_id, self._last_reset_seq(session_id))
+                )
+            self._db.commit()
+            self._resets_since_compact = 0
+            removed = max(cursor.rowcount, 0)
+        if removed:
+            logger.info(f"檢查點壓縮完成，移除 {removed} 筆紀錄")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows, sessions = self._db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT session_id) FROM checkpoint_log"
+            ).fetchone()
+        return {"records": rows, "sessions": sessions, "db_path": self.db_path}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,249 @@
+"""上下文視窗管理 - 依 token 預算決定每輪送給模型的訊息"""
+
+import logging
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Set, Type
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from ..types.agent_types import content_to_text
+
+logger = logging.getLogger(__name__)
+
+TokenCounter = Callable[[str], int]
+
+# 每則訊息的角色與格式開銷（粗估）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+# ============================================================================
+# Token 計數
+# ============================================================================
+
+def estimate_tokens(text: str) -> int:
+    """粗估 token 數：CJK 字元約一字一 token，其他約四字元一 token"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+@lru_cache(maxsize=32)
+def get_token_counter(model_name: Optional[str] = None) -> TokenCounter:
+    """
+    取得指定模型的 token 計數器（依模型名稱快取）
+
+    已安裝 tiktoken 且編碼可載入時使用對應編碼，否則使用 estimate_tokens。
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return estimate_tokens
+
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model_name or "")
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"無法載入 tiktoken 編碼，改用估算: {e}")
+        return estimate_tokens
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def _model_name(model) -> Optional[str]:
+    for attr in ("model_name", "model", "deployment_name"):
+        value = getattr(model, attr, None)
+        if isinstance(value, str):
+            return value
+    return None
+
+
+# ============================================================================
+# 選取策略
+# ============================================================================
+
+class ContextPolicy(ABC):
+    """上下文選取策略"""
+
+    @abstractmethod
+    def select(
+        self,
+        messages: List[BaseMessage],
+        counts: List[int],
+        budget: int,
+        pinned: Set[int]
+    ) -> List[int]:
+        """回傳要送出的訊息索引（遞增順序）"""
+
+    @staticmethod
+    def _recent(messages: List[BaseMessage], counts: List[int], budget: int, exclude: Set[int]) -> List[int]:
+        """由新到舊選取放得進預算的訊息，且起點必須是使用者訊息"""
+        chosen: List[int] = []
+        used = 0
+        for index in range(len(messages) - 1, -1, -1):
+            if index in exclude:
+                continue
+            if used + counts[index] > budget and chosen:
+                break
+            chosen.append(index)
+            used += counts[index]
+        chosen.reverse()
+
+        # 避免以工具結果或孤立的助理訊息開頭；至少保留最後一則使用者訊息
+        while len(chosen) > 1 and not isinstance(messages[chosen[0]], HumanMessage):
+            chosen.pop(0)
+        if chosen and not isinstance(messages[chosen[0]], HumanMessage):
+            for index in range(chosen[0] - 1, -1, -1):
+                if isinstance(messages[index], HumanMessage):
+                    chosen = list(range(index, len(messages)))
+                    break
+        return chosen
+
+
+def _tool_group(messages: List[BaseMessage], index: int) -> Set[int]:
+    """
+    取得訊息所屬的工具呼叫組（含 tool_calls 的助理訊息與其後的工具結果）
+
+    provider 要求每個 tool_call 都有對應的工具結果、每個工具結果都有對應的
+    tool_call，因此同組訊息必須一起保留。找不到對應助理訊息的工具結果回傳空集合。
+    """
+    message = messages[index]
+    if isinstance(message, ToolMessage):
+        for i in range(index - 1, -1, -1):
+            candidate = messages[i]
+            if isinstance(candidate, AIMessage) and any(
+                call.get("id") == message.tool_call_id for call in candidate.tool_calls or []
+            ):
+                return _tool_group(messages, i)
+        return set()
+
+    group = {index}
+    call_ids = {call.get("id") for call in getattr(message, "tool_calls", None) or []}
+    if call_ids:
+        for i in range(index + 1, len(messages)):
+            if not isinstance(messages[i], ToolMessage):
+                break
+            if messages[i].tool_call_id in call_ids:
+                group.add(i)
+    return group
+
+
+class SlidingWindowPolicy(ContextPolicy):
+    """只保留預算內最新的訊息"""
+
+    def select(self, messages, counts, budget, pinned):
+        return self._recent(messages, counts, budget, set())
+
+
+class SystemRecentPolicy(ContextPolicy):
+    """保留所有系統訊息，其餘預算給最新的訊息"""
+
+    def select(self, messages, counts, budget, pinned):
+        keep = {i for i, m in enumerate(messages) if isinstance(m, SystemMessage)}
+        remaining = budget - sum(counts[i] for i in keep)
+        return sorted(keep | set(self._recent(messages, counts, remaining, keep)))
+
+
+class PinnedPolicy(ContextPolicy):
+    """保留系統訊息與釘選訊息，其餘預算給最新的訊息（釘選工具呼叫時保留整組呼叫與結果）"""
+
+    def select(self, messages, counts, budget, pinned):
+        keep = {i for i, m in enumerate(messages) if isinstance(m, SystemMessage)}
+        for index in pinned:
+            if index < len(messages):
+                keep |= _tool_group(messages, index)
+        remaining = budget - sum(counts[i] for i in keep)
+        return sorted(keep | set(self._recent(messages, counts, remaining, keep)))
+
+
+CONTEXT_POLICIES: Dict[str, Type[ContextPolicy]] = {
+    "sliding_window": SlidingWindowPolicy,
+    "system_recent": SystemRecentPolicy,
+    "pinned": PinnedPolicy,
+}
+
+
+def register_context_policy(name: str, policy_cls: Type[ContextPolicy]) -> None:
+    """註冊自定義上下文策略"""
+    CONTEXT_POLICIES[name] = policy_cls
+
+
+# ============================================================================
+# 上下文管理器
+# ============================================================================
+
+class ContextManager:
+    """
+    Token 預算上下文管理器
+
+    完整歷史保留在 Agent 的訊息緩衝區中；每則訊息的 token 數只計算一次並
+    快取，select() 依策略挑出本輪要送給模型的訊息。
+
+    Args:
+        budget: 每輪送出的 token 上限（None 表示不限制）
+        policy: 策略名稱或 ContextPolicy 實例
+        model: 用於選擇 tokenizer 的模型
+        reserved: 預留 token（例如系統提示詞）
+    """
+
+    def __init__(self, budget: Optional[int], policy="system_recent", model=None, reserved: int = 0):
+        self.budget = budget
+        if isinstance(policy, str):
+            if policy not in CONTEXT_POLICIES:
+                raise ValueError(f"未知的上下文策略: {policy}")
+            policy = CONTEXT_POLICIES[policy]()
+        self.policy: ContextPolicy = policy
+        # 未設定預算時不需要精確計數，避免載入 tokenizer
+        self.count_tokens = get_token_counter(_model_name(model)) if budget is not None else estimate_tokens
+        self.reserved = reserved
+        self.pinned: Set[int] = set()
+        self._counts: List[int] = []
+        self._total = 0
+
+    def count_message(self, message: BaseMessage) -> int:
+        """計算單則訊息的 token 數"""
+        tokens = self.count_tokens(content_to_text(message.content)) + MESSAGE_OVERHEAD_TOKENS
+        for call in getattr(message, "tool_calls", None) or []:
+            tokens += self.count_tokens(f"{call.get('name')}{call.get('args')}")
+        return tokens
+
+    def _sync_counts(self, messages: List[BaseMessage]) -> None:
+        """緩衝區只會追加，因此只計算新增的訊息"""
+        if len(self._counts) > len(messages):
+            self.reset()
+        for message in messages[len(self._counts):]:
+            tokens = self.count_message(message)
+            self._counts.append(tokens)
+            self._total += tokens
+
+    def pin(self, index: int) -> None:
+        """釘選訊息（PinnedPolicy 會永遠保留，工具呼叫連同其工具結果一起保留）"""
+        self.pinned.add(index)
+
+    def unpin(self, index: int) -> None:
+        self.pinned.discard(index)
+
+    def total_tokens(self, messages: List[BaseMessage]) -> int:
+        """完整歷史的 token 數"""
+        self._sync_counts(messages)
+        return self._total
+
+    def select(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """選出本輪要送出的訊息"""
+        if self.budget is None:
+            return list(messages)
+        self._sync_counts(messages)
+        budget = max(self.budget - self.reserved, 0)
+        if self._total <= budget:
+            return list(messages)
+        indices = self.policy.select(messages, self._counts, budget, self.pinned)
+        logger.debug(f"上下文裁剪: {len(messages)} -> {len(indices)} 則訊息")
+        return [messages[i] for i in indices]
+
+    def reset(self) -> None:
+        """清除快取的計數與釘選"""
+        self._counts = []
+        self._total = 0
+        self.pinned = set()
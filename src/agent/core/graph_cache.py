@@ -0,0 +1,89 @@
+"""編譯後 Agent graph 的共享快取"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from langchain_core.tools import BaseTool
+
+logger = logging.getLogger(__name__)
+
+
+class GraphCache:
+    """
+    編譯後 graph 快取
+
+    以 (模型實例, 工具管理器, 工具集合, 工具註冊表版本, 系統提示詞, 額外設定) 為鍵，
+    相同配置的 Agent 共用同一個編譯好的 graph，避免重複編譯與重算工具 schema。
+    不同的 ToolManager 即使工具名稱與版本號相同，工具實作也可能不同，因此不共用 graph。
+
+    Args:
+        maxsize: 最多保留的 graph 數量（LRU 淘汰）
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._graphs: "OrderedDict[Tuple[Hashable, ...], Tuple[Any, Any, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def make_key(
+        model: Any,
+        tools: List[BaseTool],
+        system_prompt: str,
+        tool_version: Optional[int] = None,
+        extra: Hashable = None,
+        tool_manager: Any = None
+    ) -> Tuple[Hashable, ...]:
+        return (
+            id(model),
+            id(tool_manager),
+            tuple(sorted(tool.name for tool in tools)),
+            tool_version,
+            system_prompt,
+            extra,
+        )
+
+    def get_or_build(
+        self,
+        model: Any,
+        tools: List[BaseTool],
+        system_prompt: str,
+        builder: Callable[[], Any],
+        tool_version: Optional[int] = None,
+        extra: Hashable = None,
+        tool_manager: Any = None
+    ) -> Any:
+        """
+        取得快取的 graph，不存在時以 builder 編譯
+
+        extra 用於區分其他影響 graph 的設定（例如工具檢索參數）；tool_manager 為
+        工具的來源，tool_version 是該管理器的版本號。
+        """
+        key = self.make_key(model, tools, system_prompt, tool_version, extra, tool_manager)
+        with self._lock:
+            entry = self._graphs.get(key)
+            # 以 id() 為鍵時需確認仍是同一個模型實例與工具管理器
+            if entry is not None and entry[0] is model and entry[1] is tool_manager:
+                self._graphs.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[2]
+            self._stats["misses"] += 1
+
+        graph = builder()
+        with self._lock:
+            self._graphs[key] = (model, tool_manager, graph)
+            self._graphs.move_to_end(key)
+            while len(self._graphs) > self.maxsize:
+                self._graphs.popitem(last=False)
+        return graph
+
+    def clear(self) -> None:
+        with self._lock:
+            self._graphs.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"size": len(self._graphs), **self._stats}
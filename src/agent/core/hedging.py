@@ -0,0 +1,253 @@
+"""對沖請求 - 主要模型過慢時向次要端點送出重複請求以降低尾延遲"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, Field
+
+from .resilience import _as_ai_chunk, _as_ai_message, _inner
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+# 延遲樣本種類：完整回應（_agenerate）與首個 chunk（_astream）分開統計
+COMPLETION = "completion"
+FIRST_CHUNK = "first_chunk"
+
+
+class HedgeStats:
+    """對沖統計與延遲樣本（bind_tools 後仍共享，樣本依種類分開保存）"""
+
+    def __init__(self, window: int = 200):
+        self.samples: Dict[str, deque] = {
+            COMPLETION: deque(maxlen=window),
+            FIRST_CHUNK: deque(maxlen=window),
+        }
+        self.requests = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.lock = threading.Lock()
+
+    def percentile(self, q: float, kind: str = COMPLETION) -> Optional[float]:
+        with self.lock:
+            if not self.samples[kind]:
+                return None
+            ordered = sorted(self.samples[kind])
+        index = min(int(round(q / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
+
+
+class HedgedChatModel(BaseChatModel):
+    """
+    對沖請求模型
+
+    主要模型在 hedge_percentile 延遲（首個 token 或完整回應）內沒有回應時，
+    向次要模型送出相同請求，先回應者勝出，另一個請求會被取消。對沖次數受
+    budget_ratio 限制（例如 0.05 表示最多多出 5% 請求）。僅異步呼叫會對沖，
+    同步呼叫直接使用主要模型。
+
+    Args:
+        primary: 主要模型
+        secondary: 次要模型（其他端點或 provider）
+        hedge_percentile: 觸發對沖的主要模型延遲百分位
+        initial_delay: 樣本不足時使用的對沖延遲（秒）
+        min_delay: 對沖延遲下限（秒）
+        budget_ratio: 對沖請求佔總請求的比例上限
+    """
+
+    primary: Any = Field(description="主要模型")
+    secondary: Any = Field(description="次要模型")
+    hedge_percentile: float = Field(default=95.0, description="對沖延遲百分位")
+    initial_delay: float = Field(default=2.0, description="初始對沖延遲（秒）")
+    min_delay: float = Field(default=0.05, description="對沖延遲下限（秒）")
+    min_samples: int = Field(default=20, description="使用百分位前所需的樣本數")
+    budget_ratio: float = Field(default=0.05, description="對沖預算比例")
+    hedge_stats: HedgeStats = Field(default_factory=HedgeStats, description="對沖統計")
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {
+            "primary": getattr(self.primary, "_identifying_params", str(self.primary)),
+            "secondary": getattr(self.secondary, "_identifying_params", str(self.secondary)),
+        }
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "HedgedChatModel":
+        """將工具綁定到主要與次要模型，統計維持共享"""
+        return self.model_copy(update={
+            "primary": self.primary.bind_tools(tools, **kwargs),
+            "secondary": self.secondary.bind_tools(tools, **kwargs),
+        })
+
+    # ------------------------------------------------------------------
+    # 對沖決策
+    # ------------------------------------------------------------------
+
+    def hedge_delay(self, kind: str = COMPLETION) -> float:
+        """目前的對沖延遲（秒），kind 為 COMPLETION 或 FIRST_CHUNK"""
+        delay = None
+        if len(self.hedge_stats.samples[kind]) >= self.min_samples:
+            delay = self.hedge_stats.percentile(self.hedge_percentile, kind)
+        return max(delay if delay is not None else self.initial_delay, self.min_delay)
+
+    def _acquire_hedge(self) -> bool:
+        stats = self.hedge_stats
+        with stats.lock:
+            if stats.hedges_fired + 1 > stats.requests * self.budget_ratio + 1:
+                return False
+            stats.hedges_fired += 1
+            return True
+
+    async def _race(
+        self,
+        primary: Callable[[], Awaitable[Any]],
+        secondary: Callable[[], Awaitable[Any]],
+        kind: str = COMPLETION
+    ) -> Tuple[int, Any]:
+        """
+        先啟動主要請求，逾時後在預算內啟動次要請求，回傳 (勝出索引, 結果)
+
+        對沖延遲與主要模型的延遲樣本都使用 kind 種類的統計。
+
+        失敗的一方不會勝出，除非兩者皆失敗；落敗或未完成的請求會被取消。
+        """
+        stats = self.hedge_stats
+        with stats.lock:
+            stats.requests += 1
+        start = time.monotonic()
+        tasks: Dict[asyncio.Future, int] = {asyncio.ensure_future(primary()): 0}
+        errors: List[BaseException] = []
+        try:
+            done, pending = await asyncio.wait(set(tasks), timeout=self.hedge_delay(kind))
+            if not done and self._acquire_hedge():
+                logger.debug("主要模型逾時，送出對沖請求")
+                tasks[asyncio.ensure_future(secondary())] = 1
+                pending = set(tasks)
+
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        index = tasks[task]
+                        if index == 0:
+                            with stats.lock:
+                                stats.samples[kind].append(time.monotonic() - start)
+                        elif index == 1:
+                            with stats.lock:
+                                stats.hedges_won += 1
+                        return index, task.result()
+                    errors.append(task.exception())
+                if not pending:
+                    raise errors[0]
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ------------------------------------------------------------------
+    # 呼叫
+    # ------------------------------------------------------------------
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        result = _inner(self.primary).invoke(messages, stop=stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=_as_ai_message(result))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        _, result = await self._race(
+            lambda: _inner(self.primary).ainvoke(messages, stop=stop, **kwargs),
+            lambda: _inner(self.secondary).ainvoke(messages, stop=stop, **kwargs),
+        )
+        return ChatResult(generations=[ChatGeneration(message=_as_ai_message(result))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for chunk in _inner(self.primary).stream(messages, stop=stop, **kwargs):
+            yield ChatGenerationChunk(message=_as_ai_chunk(chunk))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        streams = [
+            _inner(self.primary).astream(messages, stop=stop, **kwargs),
+            _inner(self.secondary).astream(messages, stop=stop, **kwargs),
+        ]
+
+        async def first_chunk(stream) -> Any:
+            try:
+                return await stream.__anext__()
+            except StopAsyncIteration:
+                return _END
+
+        try:
+            index, first = await self._race(
+                lambda: first_chunk(streams[0]),
+                lambda: first_chunk(streams[1]),
+                FIRST_CHUNK,
+            )
+        except BaseException:
+            for stream in streams:
+                await stream.aclose()
+            raise
+
+        # 關閉落敗的串流，繼續輸出勝出者
+        await streams[1 - index].aclose()
+        winner = streams[index]
+        try:
+            if first is _END:
+                return
+            yield ChatGenerationChunk(message=_as_ai_chunk(first))
+            async for chunk in winner:
+                yield ChatGenerationChunk(message=_as_ai_chunk(chunk))
+        finally:
+            await winner.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得對沖統計"""
+        stats = self.hedge_stats
+        with stats.lock:
+            requests, fired, won = stats.requests, stats.hedges_fired, stats.hedges_won
+        return {
+            "requests": requests,
+            "hedges_fired": fired,
+            "hedges_won": won,
+            "hedge_rate": fired / requests if requests else 0.0,
+            "hedge_win_rate": won / fired if fired else 0.0,
+            "hedge_delay": self.hedge_delay(COMPLETION),
+            "first_chunk_hedge_delay": self.hedge_delay(FIRST_CHUNK),
+        }
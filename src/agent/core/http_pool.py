@@ -0,0 +1,140 @@
+"""共享 HTTP 客戶端 - 可重設設定的同步客戶端與依事件迴圈分派的異步客戶端"""
+
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Any, Callable, List, Optional, Set
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class SharedHTTPClient(httpx.Client):
+    """
+    共享的同步 httpx 客戶端
+
+    交給 SDK 的是這個外層物件，請求轉送給內部實際持有連線的客戶端。
+    reset() 關閉內部客戶端，下次請求以新設定重新建立，已建立的模型不需
+    更換客戶端即可套用新的連線池設定。
+
+    Args:
+        factory: 建立內部客戶端的函數（讀取目前的連線池設定）
+        timeout: 預設逾時（build_request 時使用）
+    """
+
+    def __init__(self, factory: Callable[[], httpx.Client], timeout: Any = None):
+        super().__init__(timeout=timeout)
+        self._factory = factory
+        self._inner: Optional[httpx.Client] = None
+        self._inner_lock = threading.Lock()
+
+    def _current(self) -> httpx.Client:
+        with self._inner_lock:
+            if self._inner is None:
+                self._inner = self._factory()
+            return self._inner
+
+    def send(self, request: httpx.Request, **kwargs: Any) -> httpx.Response:
+        return self._current().send(request, **kwargs)
+
+    def reset(self, timeout: Any = None) -> None:
+        """關閉內部客戶端，之後的請求使用新建立的客戶端"""
+        with self._inner_lock:
+            inner, self._inner = self._inner, None
+            if timeout is not None:
+                self.timeout = timeout
+        if inner is not None:
+            inner.close()
+
+    def close(self) -> None:
+        self.reset()
+
+
+class SharedAsyncHTTPClient(httpx.AsyncClient):
+    """
+    依事件迴圈分派的共享異步 httpx 客戶端
+
+    httpx.AsyncClient 的連線綁定建立時的事件迴圈，在其他迴圈使用會出錯。
+    交給 SDK 的是這個外層物件，請求轉送給目前事件迴圈專用的內部客戶端；
+    事件迴圈關閉後，其客戶端在下一個迴圈建立客戶端時釋放。reset() 關閉所有內部客戶端：目前的
+    迴圈與其他執行中的迴圈排程 aclose()，已停止的迴圈無法再關閉連線，直接捨棄。
+
+    Args:
+        factory: 建立內部客戶端的函數（讀取目前的連線池設定）
+        timeout: 預設逾時（build_request 時使用）
+    """
+
+    def __init__(self, factory: Callable[[], httpx.AsyncClient], timeout: Any = None):
+        super().__init__(timeout=timeout)
+        self._factory = factory
+        self._inner: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._inner_lock = threading.Lock()
+        # 保留排程中的關閉工作，避免被回收
+        self._closing: Set[asyncio.Future] = set()
+
+    def _current(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._inner_lock:
+            client = self._inner.get(loop)
+            if client is None:
+                # 連線會反向參照事件迴圈，弱參照無法自動釋放，建立新客戶端時一併清除已關閉的迴圈
+                for closed in [other for other in self._inner if other.is_closed()]:
+                    del self._inner[closed]
+                client = self._inner[loop] = self._factory()
+            return client
+
+    async def send(self, request: httpx.Request, **kwargs: Any) -> httpx.Response:
+        return await self._current().send(request, **kwargs)
+
+    @property
+    def loop_count(self) -> int:
+        """目前持有內部客戶端且尚未關閉的事件迴圈數"""
+        with self._inner_lock:
+            return sum(1 for loop in self._inner if not loop.is_closed())
+
+    def _detach(self, timeout: Any = None) -> List[Any]:
+        with self._inner_lock:
+            clients = list(self._inner.items())
+            self._inner.clear()
+            if timeout is not None:
+                self.timeout = timeout
+        return clients
+
+    def _close_on(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        client: httpx.AsyncClient,
+        running: Optional[asyncio.AbstractEventLoop]
+    ) -> None:
+        """在客戶端所屬的事件迴圈排程 aclose()"""
+        if loop.is_closed() or not loop.is_running():
+            logger.debug("事件迴圈已停止，捨棄其 HTTP 客戶端")
+            return
+        if loop is running:
+            future = asyncio.ensure_future(client.aclose())
+        else:
+            future = asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        self._closing.add(future)
+        future.add_done_callback(self._closing.discard)
+
+    def reset(self, timeout: Any = None) -> None:
+        """關閉所有內部客戶端（可從任何執行緒呼叫），之後的請求使用新建立的客戶端"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for loop, client in self._detach(timeout):
+            self._close_on(loop, client, running)
+
+    async def aclose(self) -> None:
+        """關閉所有內部客戶端，目前事件迴圈的客戶端會等待關閉完成"""
+        running = asyncio.get_running_loop()
+        for loop, client in self._detach():
+            if loop is running:
+                await client.aclose()
+            else:
+                self._close_on(loop, client, running)
@@ -6,22 +6,208 @@ all in one LLM provider factory
 reference: 
 - https://python.langchain.com/docs/integrations/chat/
 '''
+import asyncio
 import os
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Union
+
 from dotenv import load_dotenv
 
-from langchain_ollama.chat_models import ChatOllama
-from langchain_anthropic import ChatAnthropic
-from langchain_openai import ChatOpenAI
-from langchain_openai.chat_models.azure import AzureChatOpenAI
-from langchain_google_genai.chat_models import ChatGoogleGenerativeAI
-from langchain_mistralai.chat_models import ChatMistralAI
-from langchain_deepseek import ChatDeepSeek
+from .model_pool import ModelPool, get_model_pool, make_pool_key
+from .resilience import ResilientChatModel, RetryPolicy
+
+if TYPE_CHECKING:
+    from .response_cache import ResponseCache
 
 
 env_path = os.path.join(os.path.dirname(__file__), '.env')
 load_dotenv(dotenv_path=env_path, override=True)
 
 
+# ============================================================================
+# Provider registry
+# ============================================================================
+#
+# Provider SDKs are heavy to import, and a process typically uses only one of
+# them. Each builder therefore imports its SDK inside the function body, so the
+# cost is paid the first time that provider is actually instantiated.
+
+ProviderBuilder = Callable[["LLM_Provider"], Any]
+
+_PROVIDER_REGISTRY: Dict[str, ProviderBuilder] = {}
+_PROVIDER_API_KEY_ENV: Dict[str, str] = {}
+
+
+def register_provider(
+    name: str,
+    builder: Optional[ProviderBuilder] = None,
+    override: bool = False,
+    api_key_env: Optional[str] = None
+):
+    """
+    Register a chat model builder under a provider name.
+
+    The builder receives the LLM_Provider instance and must return a LangChain
+    chat model. Import the provider SDK inside the builder to keep it lazy.
+    Can be used directly or as a decorator:
+
+        @register_provider("groq")
+        def build_groq(llm):
+            from langchain_groq import ChatGroq
+            return ChatGroq(model=llm.model_name, api_key=llm.api_key)
+
+    Args:
+        name (str): Provider name (case-insensitive)
+        builder (callable, optional): Builder function
+        override (bool): Replace an existing registration with the same name
+        api_key_env (str, optional): Environment variable holding the API key.
+            LLM_Provider resolves it before the model pool lookup, so
+            llm.api_key is set even when the pooled model is reused.
+
+    Raises:
+        ValueError: If the provider is already registered and override is False.
+    """
+    def decorator(func: ProviderBuilder) -> ProviderBuilder:
+        key = name.lower()
+        if key in _PROVIDER_REGISTRY and not override:
+            raise ValueError(f"Provider '{key}' already registered.")
+        _PROVIDER_REGISTRY[key] = func
+        if api_key_env:
+            _PROVIDER_API_KEY_ENV[key] = api_key_env
+        else:
+            _PROVIDER_API_KEY_ENV.pop(key, None)
+        return func
+
+    if builder is not None:
+        return decorator(builder)
+    return decorator
+
+
+def unregister_provider(name: str) -> bool:
+    """Remove a provider from the registry. Returns True if it was registered."""
+    _PROVIDER_API_KEY_ENV.pop(name.lower(), None)
+    return _PROVIDER_REGISTRY.pop(name.lower(), None) is not None
+
+
+def get_registered_providers() -> List[str]:
+    """Return the names of all registered providers."""
+    return list(_PROVIDER_REGISTRY.keys())
+
+
+def _require_api_key(llm: "LLM_Provider", env_var: str, label: str) -> str:
+    """Resolve the API key from the instance or environment, or raise."""
+    if not llm.api_key:
+        llm.api_key = os.getenv(env_var)
+    if not llm.api_key:
+        raise ValueError(f"{label} API key not found. Set api_key or {env_var}.")
+    return llm.api_key
+
+
+def _openai_http_kwargs(llm: "LLM_Provider") -> Dict[str, Any]:
+    """Shared httpx clients for OpenAI-compatible SDKs when pooling is enabled."""
+    if llm.model_pool is None:
+        return {}
+    return {
+        "http_client": llm.model_pool.http_client,
+        "http_async_client": llm.model_pool.http_async_client,
+    }
+
+
+@register_provider("ollama")
+def _build_ollama(llm: "LLM_Provider"):
+    from langchain_ollama.chat_models import ChatOllama
+    kwargs = dict(llm.model_kwargs)
+    if llm.model_pool is not None and "client_kwargs" not in kwargs:
+        kwargs["client_kwargs"] = {"limits": llm.model_pool.http_limits()}
+    return ChatOllama(
+        model=llm.model_name,
+        base_url=llm.base_url,
+        **kwargs
+    )
+
+
+@register_provider("anthropic", api_key_env="ANTHROPIC_API_KEY")
+def _build_anthropic(llm: "LLM_Provider"):
+    api_key = _require_api_key(llm, "ANTHROPIC_API_KEY", "Anthropic")
+    from langchain_anthropic import ChatAnthropic
+    return ChatAnthropic(
+        api_key=api_key,
+        model=llm.model_name,
+        **llm.model_kwargs
+    )
+
+
+@register_provider("openai", api_key_env="OPENAI_API_KEY")
+def _build_openai(llm: "LLM_Provider"):
+    api_key = _require_api_key(llm, "OPENAI_API_KEY", "OpenAI")
+    from langchain_openai import ChatOpenAI
+    openai_endpoint = llm.base_url or os.getenv("OPENAI_ENDPOINT")
+    return ChatOpenAI(
+        api_key=api_key,
+        model=llm.model_name,
+        base_url=openai_endpoint,
+        **_openai_http_kwargs(llm),
+        **llm.model_kwargs
+    )
+
+
+@register_provider("azure", api_key_env="AZURE_OPENAI_API_KEY")
+def _build_azure(llm: "LLM_Provider"):
+    api_key = _require_api_key(llm, "AZURE_OPENAI_API_KEY", "Azure OpenAI")
+    azure_endpoint = llm.base_url or os.getenv("AZURE_OPENAI_ENDPOINT")
+    azure_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT", llm.model_name)
+    api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2023-12-01-preview")
+    if not azure_endpoint:
+        raise ValueError("Azure OpenAI endpoint not found. Set base_url or AZURE_OPENAI_ENDPOINT.")
+    from langchain_openai.chat_models.azure import AzureChatOpenAI
+    return AzureChatOpenAI(
+        api_key=api_key,
+        azure_endpoint=azure_endpoint,
+        azure_deployment=azure_deployment,
+        api_version=api_version,
+        model=llm.model_name,
+        **_openai_http_kwargs(llm),
+        **llm.model_kwargs
+    )
+
+
+@register_provider("google", api_key_env="GOOGLE_API_KEY")
+def _build_google(llm: "LLM_Provider"):
+    api_key = _require_api_key(llm, "GOOGLE_API_KEY", "Google")
+    from langchain_google_genai.chat_models import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
+        google_api_key=api_key,
+        model=llm.model_name,
+        **llm.model_kwargs
+    )
+
+
+@register_provider("deepseek", api_key_env="DEEPSEEK_API_KEY")
+def _build_deepseek(llm: "LLM_Provider"):
+    api_key = _require_api_key(llm, "DEEPSEEK_API_KEY", "DeepSeek")
+    from langchain_deepseek import ChatDeepSeek
+    deepseek_endpoint = llm.base_url or os.getenv("DEEPSEEK_ENDPOINT")
+    return ChatDeepSeek(
+        api_key=api_key,
+        model=llm.model_name,
+        base_url=deepseek_endpoint,
+        **_openai_http_kwargs(llm),
+        **llm.model_kwargs
+    )
+
+
+@register_provider("mistral", api_key_env="MISTRAL_API_KEY")
+def _build_mistral(llm: "LLM_Provider"):
+    api_key = _require_api_key(llm, "MISTRAL_API_KEY", "Mistral")
+    from langchain_mistralai.chat_models import ChatMistralAI
+    mistral_endpoint = llm.base_url or os.getenv("MISTRAL_ENDPOINT")
+    return ChatMistralAI(
+        api_key=api_key,
+        model=llm.model_name,
+        base_url=mistral_endpoint,
+        **llm.model_kwargs
+    )
+
+
 class LLM_Provider:
     """
     LLM Provider Factory
@@ -35,16 +221,48 @@ class LLM_Provider:
         - deepseek:    (DeepSeek)
         - mistral:     (Mistral AI)
 
+    Additional providers can be added with `register_provider`.
+
+    By default the underlying chat model is taken from the process-wide
+    ModelPool, so identical (provider, model, base_url, params, api_key) share
+    one instance. Only the OpenAI-compatible providers (openai, azure,
+    deepseek) also share the pool's keep-alive httpx clients; ollama gets the
+    pool's connection limits on its own client, and anthropic, google and
+    mistral keep the HTTP clients their SDKs create.
+
     Args:
         model (str): Model name or deployment (see provider docs)
         provider (str): Provider name
         base_url (str, optional): Custom endpoint (if supported)
         api_key (str, optional): API key (if not set in env)
+        pooled (bool): Reuse a shared model instance from the model pool
+        model_pool (ModelPool, optional): Pool to use instead of the default one
+        cache (ResponseCache, optional): Response cache attached to the chat model.
+            Skipped when temperature is unset or > 0, unless the cache opts in.
+        retry_policy (RetryPolicy, optional): Retry transient errors with jittered backoff
+        fallbacks (list of LLM_Provider, optional): Ordered failover chain
+        **model_kwargs: Extra parameters passed to the chat model (e.g. temperature)
+
+    Resilience is opt-in: without retry_policy or fallbacks the chat model is
+    used as-is, and provider errors (including 429) are raised to the caller
+    on the first failure.
 
     Raises:
         ValueError: If required credentials/config are missing or provider is not supported.
     """
-    def __init__(self, model: str, provider: str, base_url: str = None, api_key: str = None):
+    def __init__(
+        self,
+        model: str,
+        provider: str,
+        base_url: str = None,
+        api_key: str = None,
+        pooled: bool = True,
+        model_pool: Optional[ModelPool] = None,
+        cache: Optional["ResponseCache"] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        fallbacks: Optional[Sequence["LLM_Provider"]] = None,
+        **model_kwargs: Any
+    ):
         """
         Initialize the LLM_Provider with the specified model and provider.
         Args:
@@ -52,6 +270,12 @@ class LLM_Provider:
             provider (str): Provider name
             base_url (str, optional): Custom endpoint (if supported)
             api_key (str, optional): API key (if not set in env)
+            pooled (bool): Reuse a shared model instance from the model pool
+            model_pool (ModelPool, optional): Pool to use instead of the default one
+            cache (ResponseCache, optional): Response cache attached to the chat model
+            retry_policy (RetryPolicy, optional): Retry transient errors with jittered backoff
+            fallbacks (list of LLM_Provider, optional): Ordered failover chain
+            **model_kwargs: Extra parameters passed to the chat model
         Raises:
             ValueError: If required credentials/config are missing or provider is not supported.
         """
@@ -59,83 +283,36 @@ class LLM_Provider:
         self.provider = provider.lower()
         self.base_url = base_url
         self.api_key = api_key
+        self.cache = None
+        if cache is not None and cache.accepts(model_kwargs.get("temperature")):
+            self.cache = cache
+            model_kwargs["cache"] = cache
+        self.model_kwargs = model_kwargs
+        self.model_pool = (model_pool or get_model_pool()) if pooled else None
+        self.pool_key = None
+        if not self.api_key and self.provider in _PROVIDER_API_KEY_ENV:
+            self.api_key = os.getenv(_PROVIDER_API_KEY_ENV[self.provider])
 
         # Initialize the LLM provider
-        if self.provider == "ollama":
-            self.model = ChatOllama(
-                model=self.model_name,
-                base_url=self.base_url
-            )
-        elif self.provider == "anthropic":
-            if not self.api_key:
-                self.api_key = os.getenv("ANTHROPIC_API_KEY")
-            if not self.api_key:
-                raise ValueError("Anthropic API key not found. Set api_key or ANTHROPIC_API_KEY.")
-            self.model = ChatAnthropic(
-                api_key=self.api_key,
-                model=self.model_name
-            )
-        elif self.provider == "openai":
-            if not self.api_key:
-                self.api_key = os.getenv("OPENAI_API_KEY")
-            if not self.api_key:
-                raise ValueError("OpenAI API key not found. Set api_key or OPENAI_API_KEY.")
-            openai_endpoint = self.base_url or os.getenv("OPENAI_ENDPOINT")
-            self.model = ChatOpenAI(
-                api_key=self.api_key,
-                model=self.model_name,
-                base_url=openai_endpoint
-            )
-        elif self.provider == "azure":
-            if not self.api_key:
-                self.api_key = os.getenv("AZURE_OPENAI_API_KEY")
-            if not self.api_key:
-                raise ValueError("Azure OpenAI API key not found. Set api_key or AZURE_OPENAI_API_KEY.")
-            azure_endpoint = self.base_url or os.getenv("AZURE_OPENAI_ENDPOINT")
-            azure_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT", self.model_name)
-            api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2023-12-01-preview")
-            if not azure_endpoint:
-                raise ValueError("Azure OpenAI endpoint not found. Set base_url or AZURE_OPENAI_ENDPOINT.")
-            self.model = AzureChatOpenAI(
-                api_key=self.api_key,
-                azure_endpoint=azure_endpoint,
-                azure_deployment=azure_deployment,
-                api_version=api_version,
-                model=self.model_name
-            )
-        elif self.provider == "google":
-            if not self.api_key:
-                self.api_key = os.getenv("GOOGLE_API_KEY")
-            if not self.api_key:
-                raise ValueError("Google API key not found. Set api_key or GOOGLE_API_KEY.")
-            self.model = ChatGoogleGenerativeAI(
-                google_api_key=self.api_key,
-                model=self.model_name
-            )
-        elif self.provider == "deepseek":
-            if not self.api_key:
-                self.api_key = os.getenv("DEEPSEEK_API_KEY")
-            if not self.api_key:
-                raise ValueError("DeepSeek API key not found. Set api_key or DEEPSEEK_API_KEY.")
-            deepseek_endpoint = self.base_url or os.getenv("DEEPSEEK_ENDPOINT")
-            self.model = ChatDeepSeek(
-                api_key=self.api_key,
-                model=self.model_name,
-                base_url=deepseek_endpoint
-            )
-        elif self.provider == "mistral":
-            if not self.api_key:
-                self.api_key = os.getenv("MISTRAL_API_KEY")
-            if not self.api_key:
-                raise ValueError("Mistral API key not found. Set api_key or MISTRAL_API_KEY.")
-            mistral_endpoint = self.base_url or os.getenv("MISTRAL_ENDPOINT")
-            self.model = ChatMistralAI(
-                api_key=self.api_key,
-                model=self.model_name,
-                base_url=mistral_endpoint
-            )
-        else:
+        builder = _PROVIDER_REGISTRY.get(self.provider)
+        if builder is None:
             raise ValueError(f"Provider '{self.provider}' not supported.")
+        if self.model_pool is None:
+            self.model = builder(self)
+        else:
+            self.pool_key = make_pool_key(self.provider, self.model_name, self.base_url, model_kwargs, self.api_key)
+            self.model = self.model_pool.get_or_create(self.pool_key, lambda: builder(self))
+
+        # Wrap with retry / circuit breaker / failover when requested
+        self.base_model = self.model
+        self.breaker_name = f"{self.provider}@{self.base_url}" if self.base_url else self.provider
+        if retry_policy is not None or fallbacks:
+            chain = [self, *(fallbacks or [])]
+            self.model = ResilientChatModel(
+                models=[llm.base_model for llm in chain],
+                names=[llm.breaker_name for llm in chain],
+                retry_policy=retry_policy or RetryPolicy()
+            )
 
 
     def invoke_chat(self, prompt: str) -> str:
@@ -145,12 +322,13 @@ class LLM_Provider:
             prompt (str): Input prompt.
         Returns:
             str: LLM response.
+        Raises:
+            Exception: Errors from the provider are raised, not returned as text.
+                With retry_policy/fallbacks set, this happens only after retries
+                and failover are exhausted (AllProvidersFailedError).
         """
-        try:
-            result = self.model.invoke(prompt)
-            return getattr(result, "content", str(result))
-        except Exception as exc:
-            return f"[LLM invocation error: {exc}]"
+        result = self.model.invoke(prompt)
+        return getattr(result, "content", str(result))
 
     def stream_chat(self, prompt: str):
         """
@@ -159,11 +337,66 @@ class LLM_Provider:
             prompt (str): Input prompt.
         Returns:
             Generator or stream object from the provider.
+        Raises:
+            Exception: Errors from the provider are raised, not yielded as text.
+        """
+        yield from self.model.stream(prompt)
+
+    async def ainvoke_chat(self, prompt: str) -> str:
         """
-        try:
-            return self.model.stream(prompt)
-        except Exception as exc:
-            yield f"[LLM streaming error: {exc}]"
+        Async chat with the LLM provider.
+        Args:
+            prompt (str): Input prompt.
+        Returns:
+            str: LLM response.
+        Raises:
+            Exception: Errors from the provider are raised, not returned as text.
+                With retry_policy/fallbacks set, this happens only after retries
+                and failover are exhausted (AllProvidersFailedError).
+        """
+        result = await self.model.ainvoke(prompt)
+        return getattr(result, "content", str(result))
+
+    async def astream_chat(self, prompt: str) -> AsyncIterator[Any]:
+        """
+        Async stream chat with the LLM provider.
+        Args:
+            prompt (str): Input prompt.
+        Yields:
+            Message chunks from the provider.
+        Raises:
+            Exception: Errors from the provider are raised, not yielded as text.
+        """
+        async for chunk in self.model.astream(prompt):
+            yield chunk
+
+    async def abatch_chat(
+        self,
+        prompts: Sequence[str],
+        max_concurrency: int = 8
+    ) -> List[Union[str, Exception]]:
+        """
+        Run many prompts concurrently with a bounded concurrency limit.
+        Args:
+            prompts (Sequence[str]): Input prompts.
+            max_concurrency (int): Maximum number of in-flight requests.
+        Returns:
+            list: One entry per prompt, in input order. Each entry is the
+            response text, or the exception raised for that prompt.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_one(prompt: str) -> Union[str, Exception]:
+            async with semaphore:
+                try:
+                    result = await self.model.ainvoke(prompt)
+                    return getattr(result, "content", str(result))
+                except Exception as exc:
+                    return exc
+
+        return await asyncio.gather(*(run_one(prompt) for prompt in prompts))
 
 
 if __name__ == '__main__':
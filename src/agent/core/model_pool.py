@@ -0,0 +1,226 @@
+"""模型池 - 行程內共享的 Chat Model 實例與 HTTP 連線池"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _freeze(value: Any) -> Hashable:
+    """將參數轉換為可雜湊的形式，用於組成池鍵"""
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+def make_pool_key(
+    provider: str,
+    model: str,
+    base_url: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    api_key: Optional[str] = None
+) -> Tuple[Hashable, ...]:
+    """建立池鍵 (provider, model, base_url, params, api_key)"""
+    return (provider.lower(), model, base_url, _freeze(params or {}), api_key)
+
+
+@dataclass
+class HTTPPoolConfig:
+    """共享 HTTP 連線池配置"""
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    timeout: Optional[float] = 60.0
+
+
+@dataclass
+class _PoolEntry:
+    """池中的單一模型實例"""
+    model: Any
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    hits: int = 0
+
+
+class ModelPool:
+    """
+    行程內模型池
+
+    功能：
+    1. 相同 (provider, model, base_url, params, api_key) 只建立一個模型實例
+    2. OpenAI 相容的 provider（openai、azure、deepseek）共用同一組 keep-alive
+       HTTP 連線池；ollama 只套用連線數上限，anthropic、google、mistral 使用 SDK
+       自行建立的連線
+    3. 閒置超過 idle_timeout 的實例會被淘汰
+    """
+
+    def __init__(self, http_config: Optional[HTTPPoolConfig] = None, idle_timeout: Optional[float] = 600.0):
+        self.http_config = http_config or HTTPPoolConfig()
+        self.idle_timeout = idle_timeout
+        self._entries: Dict[Tuple[Hashable, ...], _PoolEntry] = {}
+        self._lock = threading.RLock()
+        self._http_client = None
+        self._http_async_client = None
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    # ------------------------------------------------------------------
+    # HTTP 連線池
+    # ------------------------------------------------------------------
+
+    def http_limits(self):
+        """取得 httpx 連線限制設定"""
+        import httpx
+        return httpx.Limits(
+            max_connections=self.http_config.max_connections,
+            max_keepalive_connections=self.http_config.max_keepalive_connections,
+            keepalive_expiry=self.http_config.keepalive_expiry
+        )
+
+    @property
+    def http_client(self):
+        """共享的同步 httpx 客戶端（延遲建立）"""
+        with self._lock:
+            if self._http_client is None:
+                import httpx
+
+                from .http_pool import SharedHTTPClient
+                self._http_client = SharedHTTPClient(
+                    lambda: httpx.Client(limits=self.http_limits(), timeout=self.http_config.timeout),
+                    timeout=self.http_config.timeout
+                )
+            return self._http_client
+
+    @property
+    def http_async_client(self):
+        """共享的異步 httpx 客戶端（延遲建立，每個事件迴圈使用各自的連線池）"""
+        with self._lock:
+            if self._http_async_client is None:
+                import httpx
+
+                from .http_pool import SharedAsyncHTTPClient
+                self._http_async_client = SharedAsyncHTTPClient(
+                    lambda: httpx.AsyncClient(limits=self.http_limits(), timeout=self.http_config.timeout),
+                    timeout=self.http_config.timeout
+                )
+            return self._http_async_client
+
+    def _reset_http(self) -> None:
+        """關閉目前的連線（呼叫端需持有鎖），客戶端物件保留，下次請求以目前設定重新連線"""
+        if self._http_client is not None:
+            self._http_client.reset(self.http_config.timeout)
+        if self._http_async_client is not None:
+            self._http_async_client.reset(self.http_config.timeout)
+
+    def configure_http(self, **kwargs: Any) -> None:
+        """
+        調整 HTTP 連線池設定
+
+        舊設定建立的連線會被關閉；已發出的模型持有的共享客戶端不變，
+        下次請求即以新設定重新建立連線。
+        """
+        with self._lock:
+            for key, value in kwargs.items():
+                if not hasattr(self.http_config, key):
+                    raise ValueError(f"未知的 HTTP 連線池設定: {key}")
+                setattr(self.http_config, key, value)
+            self._reset_http()
+            self._entries.clear()
+        logger.info(f"已更新 HTTP 連線池設定: {kwargs}")
+
+    # ------------------------------------------------------------------
+    # 模型實例
+    # ------------------------------------------------------------------
+
+    def get_or_create(self, key: Tuple[Hashable, ...], factory: Callable[[], Any]) -> Any:
+        """
+        取得共享模型實例，不存在時以 factory 建立
+
+        Args:
+            key: 由 make_pool_key 產生的池鍵
+            factory: 建立模型的無參數函數
+        """
+        with self._lock:
+            self._evict_idle()
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.last_used = time.monotonic()
+                entry.hits += 1
+                self._stats["hits"] += 1
+                return entry.model
+
+            self._stats["misses"] += 1
+            model = factory()
+            self._entries[key] = _PoolEntry(model=model)
+            logger.debug(f"模型池新增實例: {key[:3]}")
+            return model
+
+    def _evict_idle(self) -> None:
+        """淘汰閒置過久的實例（呼叫端需持有鎖）"""
+        if not self.idle_timeout:
+            return
+        now = time.monotonic()
+        expired = [k for k, e in self._entries.items() if now - e.last_used > self.idle_timeout]
+        for key in expired:
+            del self._entries[key]
+            self._stats["evictions"] += 1
+        if expired:
+            logger.debug(f"模型池淘汰 {len(expired)} 個閒置實例")
+
+    def evict_idle(self) -> None:
+        """手動觸發閒置淘汰"""
+        with self._lock:
+            self._evict_idle()
+
+    def clear(self) -> None:
+        """清空模型池並關閉 HTTP 連線（異步客戶端在各自的事件迴圈中關閉）"""
+        with self._lock:
+            self._entries.clear()
+            self._reset_http()
+            self._http_client = None
+            self._http_async_client = None
+
+    async def aclose(self) -> None:
+        """清空模型池並關閉 HTTP 連線，等待目前事件迴圈的異步客戶端關閉完成"""
+        with self._lock:
+            async_client = self._http_async_client
+            self._http_async_client = None
+        if async_client is not None:
+            await async_client.aclose()
+        self.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得模型池統計"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "idle_timeout": self.idle_timeout,
+                "http": {
+                    "event_loops": self._http_async_client.loop_count if self._http_async_client else 0,
+                    "max_connections": self.http_config.max_connections,
+                    "max_keepalive_connections": self.http_config.max_keepalive_connections,
+                    "keepalive_expiry": self.http_config.keepalive_expiry,
+                },
+                **self._stats,
+            }
+
+
+_default_pool: Optional[ModelPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_model_pool() -> ModelPool:
+    """取得行程內預設模型池"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ModelPool()
+        return _default_pool
@@ -0,0 +1,427 @@
+"""彈性呼叫 - 重試分類、退避、熔斷器與跨 provider 容錯切換"""
+
+import asyncio
+import datetime
+import email.utils
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, Field
+from tenacity import (AsyncRetrying, Retrying, retry_if_exception,
+                      stop_after_attempt, stop_after_delay, wait_random_exponential)
+from tenacity.wait import wait_base
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+RETRYABLE_ERROR_NAMES = {
+    "RateLimitError",
+    "APITimeoutError",
+    "APIConnectionError",
+    "InternalServerError",
+    "OverloadedError",
+    "ServiceUnavailableError",
+    "ResourceExhausted",
+    "DeadlineExceeded",
+    "ConnectError",
+    "ReadTimeout",
+    "ConnectTimeout",
+    "RemoteProtocolError",
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """熔斷器開啟時拒絕請求"""
+
+
+class AllProvidersFailedError(RuntimeError):
+    """容錯鏈中所有 provider 皆失敗"""
+
+    def __init__(self, errors: Dict[str, BaseException]):
+        self.errors = errors
+        summary = "; ".join(f"{name}: {exc}" for name, exc in errors.items())
+        super().__init__(f"所有 provider 皆失敗: {summary}")
+
+
+# ============================================================================
+# 錯誤分類
+# ============================================================================
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    """從 SDK 例外中取出 HTTP 狀態碼"""
+    for attr in ("status_code", "status", "http_status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """判斷例外是否為可重試的暫時性錯誤"""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(exc).__mro__)
+
+
+def get_retry_after(exc: BaseException) -> Optional[float]:
+    """從例外的回應標頭解析 Retry-After（秒）"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            seconds = float(value) / 1000.0
+        except (TypeError, ValueError):
+            seconds = None
+        if seconds is not None and math.isfinite(seconds):
+            return max(seconds, 0.0)
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        # HTTP-date 格式；無法解析時 Python 3.10 以後拋出 ValueError，舊版回傳 None
+        try:
+            parsed = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if parsed is None:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+        return max(parsed.timestamp() - time.time(), 0.0)
+    return max(seconds, 0.0) if math.isfinite(seconds) else None
+
+
+# ============================================================================
+# 重試策略
+# ============================================================================
+
+@dataclass
+class RetryPolicy:
+    """重試策略配置"""
+    max_attempts: int = 3
+    initial_wait: float = 0.5
+    max_wait: float = 20.0
+    max_delay: Optional[float] = 60.0
+
+
+class wait_retry_after(wait_base):
+    """帶抖動的指數退避，若伺服器回傳 Retry-After 則優先採用"""
+
+    def __init__(self, initial: float, maximum: float):
+        self.maximum = maximum
+        self.fallback = wait_random_exponential(multiplier=initial, max=maximum)
+
+    def __call__(self, retry_state) -> float:
+        exc = retry_state.outcome.exception() if retry_state.outcome else None
+        retry_after = get_retry_after(exc) if exc is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.maximum)
+        return self.fallback(retry_state)
+
+
+def _retry_kwargs(policy: RetryPolicy) -> Dict[str, Any]:
+    stop = stop_after_attempt(policy.max_attempts)
+    if policy.max_delay:
+        stop = stop | stop_after_delay(policy.max_delay)
+    return {
+        "stop": stop,
+        "wait": wait_retry_after(policy.initial_wait, policy.max_wait),
+        "retry": retry_if_exception(is_retryable),
+        "reraise": True,
+    }
+
+
+def build_retrying(policy: RetryPolicy) -> Retrying:
+    """建立同步 tenacity 重試器"""
+    return Retrying(**_retry_kwargs(policy))
+
+
+def build_async_retrying(policy: RetryPolicy) -> AsyncRetrying:
+    """建立異步 tenacity 重試器"""
+    return AsyncRetrying(**_retry_kwargs(policy))
+
+
+# ============================================================================
+# 熔斷器
+# ============================================================================
+
+class CircuitBreaker:
+    """
+    單一 provider 的熔斷器
+
+    連續 failure_threshold 次可重試錯誤後開啟，recovery_timeout 秒後進入
+    半開狀態並放行一個探測請求，成功則關閉，失敗則重新開啟。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """判斷是否放行請求"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"熔斷器開啟: {self.name}")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def get_info(self) -> Dict[str, Any]:
+        return {"name": self.name, "state": self.state, "failures": self._failures}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str, **kwargs: Any) -> CircuitBreaker:
+    """取得行程內共享的熔斷器，不存在時以 kwargs 建立"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, **kwargs)
+            _breakers[name] = breaker
+        return breaker
+
+
+# ============================================================================
+# 容錯模型
+# ============================================================================
+
+def _as_ai_message(result: Any) -> AIMessage:
+    if isinstance(result, AIMessage):
+        return result
+    return AIMessage(content=getattr(result, "content", str(result)))
+
+
+def _as_ai_chunk(chunk: Any) -> AIMessageChunk:
+    if isinstance(chunk, AIMessageChunk):
+        return chunk
+    return AIMessageChunk(content=getattr(chunk, "content", str(chunk)))
+
+
+def _inner(model: Any) -> Any:
+    """
+    包裝模型呼叫內層模型時使用
+
+    內層模型會繼承 graph 的 callbacks，LangGraph 的 messages 串流因此會同時
+    收到內層與外層兩次執行的 token；加上 nostream 標籤後只由外層模型輸出。
+    """
+    return model.with_config(tags=["nostream"])
+
+
+class ResilientChatModel(BaseChatModel):
+    """
+    具重試、熔斷與容錯切換的 Chat Model
+
+    依序嘗試 models 中的模型；每個模型在可重試錯誤下依 retry_policy 重試，
+    重試用盡或熔斷器開啟時切換到下一個模型。不可重試的錯誤直接拋出。
+    可用於任何接受 BaseChatModel 的地方（包含 AgentFactory.create_agent）。
+    """
+
+    models: List[Any] = Field(description="依優先順序排列的模型")
+    names: List[str] = Field(description="對應的熔斷器名稱")
+    retry_policy: RetryPolicy = Field(default_factory=RetryPolicy, description="重試策略")
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    @property
+    def _llm_type(self) -> str:
+        return "resilient"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"names": self.names}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "ResilientChatModel":
+        """將工具綁定到鏈中的每個模型"""
+        return self.model_copy(update={"models": [m.bind_tools(tools, **kwargs) for m in self.models]})
+
+    def _candidates(self):
+        for name, model in zip(self.names, self.models):
+            breaker = get_circuit_breaker(name)
+            if not breaker.allow_request():
+                yield name, model, breaker, CircuitOpenError(f"熔斷器開啟: {name}")
+            else:
+                yield name, model, breaker, None
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        errors: Dict[str, BaseException] = {}
+        for name, model, breaker, rejected in self._candidates():
+            if rejected:
+                errors[name] = rejected
+                continue
+            try:
+                for attempt in build_retrying(self.retry_policy):
+                    with attempt:
+                        result = _inner(model).invoke(messages, stop=stop, **kwargs)
+            except Exception as exc:
+                if not is_retryable(exc):
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                errors[name] = exc
+                logger.warning(f"{name} 呼叫失敗，切換下一個 provider: {exc}")
+                continue
+            breaker.record_success()
+            return ChatResult(generations=[ChatGeneration(message=_as_ai_message(result))])
+        raise AllProvidersFailedError(errors)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        errors: Dict[str, BaseException] = {}
+        for name, model, breaker, rejected in self._candidates():
+            if rejected:
+                errors[name] = rejected
+                continue
+            try:
+                async for attempt in build_async_retrying(self.retry_policy):
+                    with attempt:
+                        result = await _inner(model).ainvoke(messages, stop=stop, **kwargs)
+            except Exception as exc:
+                if not is_retryable(exc):
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                errors[name] = exc
+                logger.warning(f"{name} 呼叫失敗，切換下一個 provider: {exc}")
+                continue
+            breaker.record_success()
+            return ChatResult(generations=[ChatGeneration(message=_as_ai_message(result))])
+        raise AllProvidersFailedError(errors)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        # 串流僅在第一個 chunk 產生前切換 provider，已輸出的內容無法撤回
+        errors: Dict[str, BaseException] = {}
+        for name, model, breaker, rejected in self._candidates():
+            if rejected:
+                errors[name] = rejected
+                continue
+            started = False
+            try:
+                for chunk in _inner(model).stream(messages, stop=stop, **kwargs):
+                    started = True
+                    yield ChatGenerationChunk(message=_as_ai_chunk(chunk))
+            except Exception as exc:
+                retryable = is_retryable(exc)
+                if retryable:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if started or not retryable:
+                    raise
+                errors[name] = exc
+                continue
+            breaker.record_success()
+            return
+        raise AllProvidersFailedError(errors)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        errors: Dict[str, BaseException] = {}
+        for name, model, breaker, rejected in self._candidates():
+            if rejected:
+                errors[name] = rejected
+                continue
+            started = False
+            try:
+                async for chunk in _inner(model).astream(messages, stop=stop, **kwargs):
+                    started = True
+                    yield ChatGenerationChunk(message=_as_ai_chunk(chunk))
+            except Exception as exc:
+                retryable = is_retryable(exc)
+                if retryable:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if started or not retryable:
+                    raise
+                errors[name] = exc
+                continue
+            breaker.record_success()
+            return
+        raise AllProvidersFailedError(errors)
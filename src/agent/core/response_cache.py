@@ -0,0 +1,216 @@
+"""回應快取 - 記憶體 LRU 與 SQLite 持久化兩層快取"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+logger = logging.getLogger(__name__)
+
+
+def _serialize(generations: Sequence[Generation]) -> str:
+    """將 generations 轉為 JSON 字串"""
+    items = []
+    for gen in generations:
+        if isinstance(gen, ChatGeneration):
+            items.append({"type": "chat", "message": message_to_dict(gen.message)})
+        else:
+            items.append({"type": "text", "text": gen.text})
+    return json.dumps(items, ensure_ascii=False)
+
+
+def _deserialize(value: str) -> RETURN_VAL_TYPE:
+    """從 JSON 字串還原 generations"""
+    generations = []
+    for item in json.loads(value):
+        if item["type"] == "chat":
+            message = messages_from_dict([item["message"]])[0]
+            generations.append(ChatGeneration(message=message))
+        else:
+            generations.append(Generation(text=item["text"]))
+    return generations
+
+
+class ResponseCache(BaseCache):
+    """
+    LLM 回應快取
+
+    作為 LangChain BaseCache 掛在模型上，因此 LLM_Provider 與使用該模型的
+    Agent 都會經過快取。快取鍵為正規化後的訊息加上模型、provider 與取樣參數。
+
+    Args:
+        maxsize: 記憶體 LRU 層的最大項目數
+        db_path: SQLite 檔案路徑，None 表示僅使用記憶體層
+        ttl: 項目存活秒數，None 表示不過期
+        max_db_entries: SQLite 層最大項目數，超過時淘汰最久未使用的項目
+        cache_nondeterministic: 是否快取 temperature 非 0 的模型
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        db_path: Optional[str] = None,
+        ttl: Optional[float] = None,
+        max_db_entries: int = 10000,
+        cache_nondeterministic: bool = False
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_db_entries = max_db_entries
+        self.cache_nondeterministic = cache_nondeterministic
+        self._memory: "OrderedDict[str, Tuple[Optional[float], RETURN_VAL_TYPE]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        self._db: Optional[sqlite3.Connection] = None
+        # SQLite 層的項目數，開啟時計數一次，之後隨寫入與刪除維護
+        self._db_count = 0
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+            self._db.commit()
+            self._db_count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def accepts(self, temperature: Optional[float]) -> bool:
+        """判斷指定 temperature 的模型是否應使用快取（未設定視為非確定性）"""
+        if self.cache_nondeterministic:
+            return True
+        return temperature is not None and temperature <= 0
+
+    @staticmethod
+    def _make_key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def _expires_at(self) -> Optional[float]:
+        return time.time() + self.ttl if self.ttl else None
+
+    def _remember(self, key: str, expires_at: Optional[float], value: RETURN_VAL_TYPE) -> None:
+        """寫入記憶體層（呼叫端需持有鎖）"""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """查詢快取"""
+        key = self._make_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["hits"] += 1
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value_json, expires_at = row
+                    if expires_at is None or expires_at > now:
+                        self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        value = _deserialize(value_json)
+                        self._remember(key, expires_at, value)
+                        self._stats["hits"] += 1
+                        self._stats["disk_hits"] += 1
+                        return value
+                    cursor = self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db_count -= max(cursor.rowcount, 0)
+                    self._db.commit()
+
+            self._stats["misses"] += 1
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """寫入快取"""
+        key = self._make_key(prompt, llm_string)
+        expires_at = self._expires_at()
+        with self._lock:
+            self._remember(key, expires_at, return_val)
+            self._stats["writes"] += 1
+            if self._db is not None:
+                exists = self._db.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, _serialize(return_val), expires_at, time.time())
+                )
+                if exists is None:
+                    self._db_count += 1
+                if self._db_count > self.max_db_entries:
+                    self._prune_db()
+                self._db.commit()
+
+    def _prune_db(self) -> None:
+        """
+        淘汰過期與超出容量的 SQLite 項目（呼叫端需持有鎖）
+
+        只在項目數超過 max_db_entries 時執行，項目數由記憶體中的計數判斷，
+        不需每次寫入都以 COUNT(*) 掃描整個資料表。
+        """
+        now = time.time()
+        cursor = self._db.execute(
+            "DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+        )
+        evicted = max(cursor.rowcount, 0)
+        overflow = self._db_count - evicted - self.max_db_entries
+        if overflow > 0:
+            cursor = self._db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,)
+            )
+            evicted += max(cursor.rowcount, 0)
+        self._stats["evictions"] += evicted
+        self._db_count -= evicted
+
+    def clear(self, **kwargs: Any) -> None:
+        """清空所有快取"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+                self._db_count = 0
+
+    def close(self) -> None:
+        """關閉 SQLite 連線"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得快取統計"""
+        with self._lock:
+            disk_size = None
+            if self._db is not None:
+                disk_size = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+                "memory_size": len(self._memory),
+                "disk_size": disk_size,
+            }
@@ -0,0 +1,311 @@
+"""延遲感知路由 - 在多個端點間分配請求的 Chat Model"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, Field, PrivateAttr
+
+from .resilience import AllProvidersFailedError, _as_ai_chunk, _as_ai_message, _inner, is_retryable
+
+logger = logging.getLogger(__name__)
+
+
+class EndpointStats:
+    """
+    單一端點的路由統計
+
+    以 EWMA 追蹤延遲與錯誤率，並記錄進行中的請求數。延遲明顯高於最佳端點
+    或錯誤率過高時暫時剔除，eject_duration 秒後放行一個探測請求。
+    """
+
+    def __init__(self, name: str, alpha: float = 0.3):
+        self.name = name
+        self.alpha = alpha
+        self.ewma_latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.ejected_until = 0.0
+        self.probing = False
+
+    def score(self) -> float:
+        """越低越好；尚無延遲資料的端點優先被嘗試"""
+        latency = self.ewma_latency if self.ewma_latency is not None else 0.0
+        return latency * (self.in_flight + 1) / max(1.0 - self.error_rate, 0.05)
+
+    def record(self, latency: Optional[float], error: bool) -> None:
+        self.requests += 1
+        if error:
+            self.errors += 1
+        self.error_rate = self.alpha * (1.0 if error else 0.0) + (1 - self.alpha) * self.error_rate
+        if latency is not None:
+            if self.ewma_latency is None:
+                self.ewma_latency = latency
+            else:
+                self.ewma_latency = self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "ewma_latency": self.ewma_latency,
+            "error_rate": round(self.error_rate, 4),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejected": self.ejected_until > time.monotonic(),
+        }
+
+
+class RouterChatModel(BaseChatModel):
+    """
+    延遲感知的多端點路由模型
+
+    在健康的端點中以 power-of-two-choices 選出分數較低者（EWMA 延遲 ×
+    進行中請求數，並依錯誤率加權）。可重試錯誤會改送其他端點。可用於任何
+    接受 BaseChatModel 的地方，包含 AgentFactory.create_agent。
+
+    Args:
+        models: 端點模型（BaseChatModel 或 LLM_Provider）
+        names: 端點名稱，預設為 endpoint-0, endpoint-1 ...
+        slow_factor: 延遲超過最佳端點此倍數時剔除
+        max_error_rate: 錯誤率超過此值時剔除
+        eject_duration: 剔除後多久重新探測（秒）
+    """
+
+    models: List[Any] = Field(description="端點模型")
+    names: List[str] = Field(default_factory=list, description="端點名稱")
+    slow_factor: float = Field(default=3.0, description="慢速剔除倍數")
+    max_error_rate: float = Field(default=0.5, description="錯誤率剔除門檻")
+    eject_duration: float = Field(default=30.0, description="剔除時間（秒）")
+    ewma_alpha: float = Field(default=0.3, description="EWMA 平滑係數")
+    stats: List[EndpointStats] = Field(default_factory=list, description="端點統計（bind_tools 後仍共享）")
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def __init__(self, **data: Any):
+        models = [getattr(m, "model", m) if not isinstance(m, BaseChatModel) else m for m in data.get("models", [])]
+        if not models:
+            raise ValueError("RouterChatModel 至少需要一個端點")
+        data["models"] = models
+        if not data.get("names"):
+            data["names"] = [f"endpoint-{i}" for i in range(len(models))]
+        super().__init__(**data)
+        if not self.stats:
+            self.stats = [EndpointStats(name, self.ewma_alpha) for name in self.names]
+
+    @property
+    def _llm_type(self) -> str:
+        return "router"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"names": self.names}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "RouterChatModel":
+        """將工具綁定到每個端點，統計資料維持共享"""
+        return self.model_copy(update={"models": [m.bind_tools(tools, **kwargs) for m in self.models]})
+
+    # ------------------------------------------------------------------
+    # 端點選擇
+    # ------------------------------------------------------------------
+
+    def _maybe_eject(self, index: int) -> None:
+        """依延遲與錯誤率決定是否剔除端點（呼叫端需持有鎖）"""
+        stats = self.stats[index]
+        now = time.monotonic()
+        latencies = [s.ewma_latency for s in self.stats if s.ewma_latency is not None and s.ejected_until <= now]
+        best = min(latencies) if latencies else None
+        too_slow = (
+            best is not None
+            and stats.ewma_latency is not None
+            and len(latencies) > 1
+            and stats.ewma_latency > best * self.slow_factor
+        )
+        too_many_errors = stats.requests >= 3 and stats.error_rate > self.max_error_rate
+        if too_slow or too_many_errors:
+            stats.ejected_until = now + self.eject_duration
+            logger.warning(f"路由剔除端點 {stats.name}（延遲: {stats.ewma_latency}, 錯誤率: {stats.error_rate:.2f}）")
+
+    def _choose(self, exclude: set) -> Optional[int]:
+        """選出下一個端點並標記為進行中"""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [i for i in range(len(self.models)) if i not in exclude]
+            if not candidates:
+                return None
+
+            # 剔除期滿的端點放行一個探測請求
+            for i in candidates:
+                stats = self.stats[i]
+                if 0 < stats.ejected_until <= now and not stats.probing:
+                    stats.probing = True
+                    stats.in_flight += 1
+                    return i
+
+            healthy = [i for i in candidates if self.stats[i].ejected_until <= now]
+            pool = healthy or candidates
+            if len(pool) == 1:
+                choice = pool[0]
+            else:
+                a, b = random.sample(pool, 2)
+                choice = a if self.stats[a].score() <= self.stats[b].score() else b
+            self.stats[choice].in_flight += 1
+            return choice
+
+    def _finish(self, index: int, latency: Optional[float], error: bool) -> None:
+        with self._lock:
+            stats = self.stats[index]
+            stats.in_flight -= 1
+            stats.record(latency, error)
+            if stats.probing:
+                stats.probing = False
+                if not error:
+                    stats.ejected_until = 0.0
+                    logger.info(f"路由端點恢復: {stats.name}")
+            self._maybe_eject(index)
+
+    def _fail(self, index: int, exc: BaseException) -> bool:
+        """
+        記錄失敗的請求並回傳是否可重試
+
+        不可重試的錯誤（請求本身有誤，例如 400、401、超過上下文長度）代表端點
+        有正常回應，不計入錯誤率，避免錯誤的請求把健康端點剔除。
+        """
+        retryable = is_retryable(exc)
+        self._finish(index, None, retryable)
+        return retryable
+
+    def _release(self, index: int) -> None:
+        """請求被取消時釋放端點，不計入統計"""
+        with self._lock:
+            self.stats[index].in_flight -= 1
+            self.stats[index].probing = False
+
+    # ------------------------------------------------------------------
+    # 呼叫
+    # ------------------------------------------------------------------
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        errors: Dict[str, BaseException] = {}
+        tried: set = set()
+        while (index := self._choose(tried)) is not None:
+            tried.add(index)
+            start = time.monotonic()
+            try:
+                result = _inner(self.models[index]).invoke(messages, stop=stop, **kwargs)
+            except Exception as exc:
+                if not self._fail(index, exc):
+                    raise
+                errors[self.names[index]] = exc
+                continue
+            except BaseException:
+                self._release(index)
+                raise
+            self._finish(index, time.monotonic() - start, False)
+            return ChatResult(generations=[ChatGeneration(message=_as_ai_message(result))])
+        raise AllProvidersFailedError(errors)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        errors: Dict[str, BaseException] = {}
+        tried: set = set()
+        while (index := self._choose(tried)) is not None:
+            tried.add(index)
+            start = time.monotonic()
+            try:
+                result = await _inner(self.models[index]).ainvoke(messages, stop=stop, **kwargs)
+            except Exception as exc:
+                if not self._fail(index, exc):
+                    raise
+                errors[self.names[index]] = exc
+                continue
+            except BaseException:
+                self._release(index)
+                raise
+            self._finish(index, time.monotonic() - start, False)
+            return ChatResult(generations=[ChatGeneration(message=_as_ai_message(result))])
+        raise AllProvidersFailedError(errors)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        errors: Dict[str, BaseException] = {}
+        tried: set = set()
+        while (index := self._choose(tried)) is not None:
+            tried.add(index)
+            start = time.monotonic()
+            started = False
+            try:
+                for chunk in _inner(self.models[index]).stream(messages, stop=stop, **kwargs):
+                    started = True
+                    yield ChatGenerationChunk(message=_as_ai_chunk(chunk))
+            except Exception as exc:
+                if not self._fail(index, exc) or started:
+                    raise
+                errors[self.names[index]] = exc
+                continue
+            except BaseException:
+                self._release(index)
+                raise
+            self._finish(index, time.monotonic() - start, False)
+            return
+        raise AllProvidersFailedError(errors)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        errors: Dict[str, BaseException] = {}
+        tried: set = set()
+        while (index := self._choose(tried)) is not None:
+            tried.add(index)
+            start = time.monotonic()
+            started = False
+            try:
+                async for chunk in _inner(self.models[index]).astream(messages, stop=stop, **kwargs):
+                    started = True
+                    yield ChatGenerationChunk(message=_as_ai_chunk(chunk))
+            except Exception as exc:
+                if not self._fail(index, exc) or started:
+                    raise
+                errors[self.names[index]] = exc
+                continue
+            except BaseException:
+                self._release(index)
+                raise
+            self._finish(index, time.monotonic() - start, False)
+            return
+        raise AllProvidersFailedError(errors)
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """取得各端點路由統計"""
+        with self._lock:
+            return [stats.get_info() for stats in self.stats]
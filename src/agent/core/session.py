@@ -0,0 +1,188 @@
+"""對話 Session 與 Session 儲存"""
+
+import asyncio
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage
+
+from ..types.agent_types import AgentState, Message
+from .context_manager import ContextManager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_ID = "default"
+
+
+class AgentSession:
+    """
+    單一對話的狀態
+
+    包含對話歷史（AgentState）、直接傳入 graph 的原生訊息緩衝區、
+    上下文管理器，以及確保同一 Session 的回合依序執行的鎖。
+    """
+
+    def __init__(self, session_id: str, context_manager: ContextManager):
+        self.session_id = session_id
+        self.state = AgentState()
+        self.buffer: List[BaseMessage] = []
+        self.context_manager = context_manager
+        self.lock = asyncio.Lock()
+        self.created_at = time.monotonic()
+        self.last_access = self.created_at
+        # 已寫入檢查點的訊息數
+        self.persisted_count = 0
+
+    def touch(self) -> None:
+        self.last_access = time.monotonic()
+
+    def add_message(self, message: Message) -> None:
+        """添加訊息到狀態與緩衝區"""
+        self.state.messages.append(message)
+        self.buffer.append(message.to_langchain())
+
+    def add_native_messages(self, messages: List[BaseMessage]) -> None:
+        """添加 LangChain 原生訊息到緩衝區與狀態（每則訊息只轉換一次）"""
+        for message in messages:
+            self.buffer.append(message)
+            self.state.messages.append(Message.from_langchain(message))
+
+    def reset(self) -> None:
+        """清空對話"""
+        self.state = AgentState()
+        self.buffer = []
+        self.persisted_count = 0
+        self.context_manager.reset()
+
+    @property
+    def size(self) -> int:
+        """訊息數，用於記憶體上限計算"""
+        return len(self.buffer)
+
+
+class SessionStore(ABC):
+    """Session 儲存介面"""
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[AgentSession]:
+        """取得 Session，不存在時回傳 None"""
+
+    @abstractmethod
+    def put(self, session: AgentSession) -> None:
+        """儲存 Session"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """刪除 Session"""
+
+    @abstractmethod
+    def session_ids(self) -> List[str]:
+        """列出所有 Session ID"""
+
+    def touch(self, session: AgentSession) -> None:
+        """回合結束時呼叫，可在此執行淘汰"""
+        session.touch()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"sessions": len(self.session_ids())}
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    記憶體 Session 儲存
+
+    以 LRU 順序保存 Session，並依下列條件淘汰（進行中的 Session 不會被淘汰）：
+    - max_sessions: Session 數量上限
+    - idle_timeout: 閒置秒數上限
+    - max_total_messages: 所有 Session 的訊息總數上限
+
+    Args:
+        on_evict: 淘汰時的回呼，可用於持久化
+    """
+
+    def __init__(
+        self,
+        max_sessions: Optional[int] = 10000,
+        idle_timeout: Optional[float] = 3600.0,
+        max_total_messages: Optional[int] = None,
+        on_evict: Optional[Callable[[AgentSession], None]] = None
+    ):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_total_messages = max_total_messages
+        self.on_evict = on_evict
+        self._sessions: "OrderedDict[str, AgentSession]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._evictions = 0
+
+    def get(self, session_id: str) -> Optional[AgentSession]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                session.touch()
+            return session
+
+    def put(self, session: AgentSession) -> None:
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._sessions.move_to_end(session.session_id)
+            self._evict()
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def session_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._sessions.keys())
+
+    def touch(self, session: AgentSession) -> None:
+        with self._lock:
+            session.touch()
+            if session.session_id in self._sessions:
+                self._sessions.move_to_end(session.session_id)
+            self._evict()
+
+    def _evict(self) -> None:
+        """依閒置時間、數量與訊息總數淘汰（呼叫端需持有鎖）"""
+        now = time.monotonic()
+        victims: List[str] = []
+        idle_cutoff = now - self.idle_timeout if self.idle_timeout else None
+        total = sum(s.size for s in self._sessions.values()) if self.max_total_messages else 0
+        count = len(self._sessions)
+
+        for session_id, session in self._sessions.items():
+            if session.lock.locked():
+                continue
+            over_count = self.max_sessions is not None and count - len(victims) > self.max_sessions
+            over_size = self.max_total_messages is not None and total > self.max_total_messages
+            idle = idle_cutoff is not None and session.last_access < idle_cutoff
+            if not (over_count or over_size or idle):
+                # LRU 順序，之後的 Session 較新，不會符合淘汰條件
+                break
+            victims.append(session_id)
+            total -= session.size
+
+        for session_id in victims:
+            session = self._sessions.pop(session_id)
+            self._evictions += 1
+            if self.on_evict:
+                try:
+                    self.on_evict(session)
+                except Exception as e:
+                    logger.error(f"Session 淘汰回呼失敗 {session_id}: {e}")
+        if victims:
+            logger.debug(f"淘汰 {len(victims)} 個 Session")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "total_messages": sum(s.size for s in self._sessions.values()),
+                "evictions": self._evictions,
+            }
@@ -0,0 +1,234 @@
+"""多 Agent 團隊流程 - 以 DAG 描述步驟相依，獨立分支同時執行"""
+
+import asyncio
+import logging
+import string
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+from ..core.base_agent import BaseAgent
+from ..types.agent_types import TeamResult, TeamStep, TeamStepResult
+
+logger = logging.getLogger(__name__)
+
+# 相依步驟為這些狀態時，後續步驟不執行
+_FAILED = ("error", "skipped")
+
+
+class AgentTeam:
+    """
+    以 DAG 描述的多 Agent 協作流程
+
+    沒有相依關係的步驟同時執行（總數受 max_concurrency 限制），步驟完成後
+    其輸出會填入相依步驟的提示詞。相依步驟失敗或被略過時，後續步驟標記為
+    skipped；因逾時或迭代上限提前結束的步驟仍會傳遞其部分輸出。總執行時間
+    約為關鍵路徑的長度，而非所有步驟的總和。
+
+    每個步驟使用獨立的 Session，同一個 Agent 可同時執行多個步驟。
+
+    Args:
+        agents: 成員 ID -> Agent
+        steps: 流程步驟
+        max_concurrency: 同時執行的步驟數上限（None 表示不限制）
+    """
+
+    def __init__(
+        self,
+        agents: Dict[str, BaseAgent],
+        steps: Sequence[TeamStep],
+        max_concurrency: Optional[int] = None
+    ):
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency 必須大於 0")
+        self.agents = agents
+        self.steps: Dict[str, TeamStep] = {step.id: step for step in steps}
+        if len(self.steps) != len(steps):
+            raise ValueError("團隊流程的步驟 ID 重複")
+        self.max_concurrency = max_concurrency
+        self.order = self._validate()
+
+    def _validate(self) -> List[str]:
+        """檢查成員與相依步驟是否存在、是否有循環相依，回傳拓撲排序"""
+        for step in self.steps.values():
+            if step.agent not in self.agents:
+                raise ValueError(f"步驟 {step.id} 的成員不存在: {step.agent}")
+            for dependency in step.depends_on:
+                if dependency not in self.steps:
+                    raise ValueError(f"步驟 {step.id} 的相依步驟不存在: {dependency}")
+            if step.prompt is not None:
+                fields = {field for _, field, _, _ in string.Formatter().parse(step.prompt) if field}
+                unknown = fields - {"input", *step.depends_on}
+                if unknown:
+                    raise ValueError(f"步驟 {step.id} 的提示詞模板包含未知欄位: {sorted(unknown)}")
+
+        remaining = {step_id: len(set(step.depends_on)) for step_id, step in self.steps.items()}
+        dependents: Dict[str, List[str]] = {step_id: [] for step_id in self.steps}
+        for step in self.steps.values():
+            for dependency in set(step.depends_on):
+                dependents[dependency].append(step.id)
+
+        order = [step_id for step_id, count in remaining.items() if count == 0]
+        for step_id in order:
+            for dependent in dependents[step_id]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    order.append(dependent)
+        if len(order) != len(self.steps):
+            cycle = [step_id for step_id, count in remaining.items() if count > 0]
+            raise ValueError(f"團隊流程包含循環相依: {cycle}")
+        return order
+
+    @property
+    def sinks(self) -> List[str]:
+        """沒有其他步驟相依的最終步驟"""
+        used = {dependency for step in self.steps.values() for dependency in step.depends_on}
+        return [step_id for step_id in self.order if step_id not in used]
+
+    def _render(self, step: TeamStep, input: str, results: Dict[str, TeamStepResult]) -> str:
+        outputs = {dependency: results[dependency].content for dependency in step.depends_on}
+        if step.prompt is not None:
+            return step.prompt.format(input=input, **outputs)
+        sections = [input] + [f"[{dependency}]\n{content}" for dependency, content in outputs.items()]
+        return "\n\n".join(sections)
+
+    async def run(
+        self,
+        input: str,
+        session_id: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> TeamResult:
+        """
+        執行團隊流程
+
+        Args:
+            input: 流程輸入（提示詞模板中的 {input}）
+            session_id: 各步驟 Session 的前綴；指定時保留各步驟的對話歷史，
+                供下次以相同 session_id 執行時延續
+            timeout: 整個流程的最長執行時間（秒），逾時的步驟回傳部分結果
+
+        Returns:
+            TeamResult，包含各步驟的輸出與計時
+        """
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        run_id = session_id or f"team-{uuid.uuid4().hex}"
+        slots = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency else None
+        results: Dict[str, TeamStepResult] = {}
+        finished = {step_id: asyncio.Event() for step_id in self.steps}
+
+        async def run_step(step: TeamStep) -> None:
+            try:
+                for dependency in step.depends_on:
+                    await finished[dependency].wait()
+                results[step.id] = await self._run_step(step, input, results, slots, start, deadline, run_id)
+            finally:
+                finished[step.id].set()
+
+        await asyncio.gather(*(run_step(self.steps[step_id]) for step_id in self.order))
+
+        if session_id is None:
+            # 暫時性的執行不保留各步驟的對話歷史（包含檢查點中的紀錄）
+            await asyncio.gather(*(
+                self.agents[step.agent].discard_session(f"{run_id}:{step.id}") for step in self.steps.values()
+            ))
+
+        result = self._result(results, time.monotonic() - start)
+        logger.info(
+            f"團隊流程完成: {len(results)} 個步驟，耗時 {result.elapsed:.2f} 秒"
+            f"（關鍵路徑: {' → '.join(result.critical_path)}）"
+        )
+        return result
+
+    async def _run_step(
+        self,
+        step: TeamStep,
+        input: str,
+        results: Dict[str, TeamStepResult],
+        slots: Optional[asyncio.Semaphore],
+        start: float,
+        deadline: Optional[float],
+        run_id: str
+    ) -> TeamStepResult:
+        ready_at = time.monotonic() - start
+        failed = [dependency for dependency in step.depends_on if results[dependency].status in _FAILED]
+        if failed:
+            return TeamStepResult(
+                step_id=step.id, agent=step.agent, status="skipped",
+                error=f"相依步驟未完成: {', '.join(failed)}",
+                started_at=ready_at, finished_at=ready_at,
+            )
+
+        if slots is not None:
+            await slots.acquire()
+        try:
+            started_at = time.monotonic() - start
+            step_timeout = step.timeout
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # 流程已逾時（例如在等待執行名額時），不再啟動步驟
+                    return TeamStepResult(
+                        step_id=step.id, agent=step.agent, status="timeout",
+                        error="團隊流程已逾時，步驟未執行",
+                        started_at=started_at, finished_at=started_at, queued=started_at - ready_at,
+                    )
+                step_timeout = remaining if step_timeout is None else min(step_timeout, remaining)
+
+            try:
+                prompt = self._render(step, input, results)
+                agent_result = await self.agents[step.agent].run(
+                    prompt, session_id=f"{run_id}:{step.id}", timeout=step_timeout
+                )
+                status, content, error = agent_result.status, agent_result.content, agent_result.error
+                iterations = agent_result.iterations
+            except Exception as e:
+                logger.error(f"團隊步驟 {step.id} 執行失敗: {e}")
+                status, content, error, iterations = "error", "", str(e), 0
+        finally:
+            if slots is not None:
+                slots.release()
+
+        finished_at = time.monotonic() - start
+        logger.debug(f"團隊步驟 {step.id} 結束: {status}，耗時 {finished_at - started_at:.2f} 秒")
+        return TeamStepResult(
+            step_id=step.id,
+            agent=step.agent,
+            status=status,
+            content=content,
+            error=error,
+            started_at=started_at,
+            finished_at=finished_at,
+            queued=started_at - ready_at,
+            duration=finished_at - started_at,
+            iterations=iterations,
+        )
+
+    def _result(self, results: Dict[str, TeamStepResult], elapsed: float) -> TeamResult:
+        sinks = self.sinks
+        outputs = [results[step_id] for step_id in sinks if results[step_id].status not in _FAILED]
+        if len(sinks) == 1:
+            content = outputs[0].content if outputs else ""
+        else:
+            content = "\n\n".join(f"[{step.step_id}]\n{step.content}" for step in outputs)
+
+        if all(step.status == "completed" for step in results.values()):
+            status = "completed"
+        elif outputs:
+            status = "partial"
+        else:
+            status = "error"
+
+        # 從最晚結束的最終步驟沿著最晚結束的相依步驟回溯
+        critical_path: List[str] = []
+        current = max(sinks, key=lambda step_id: results[step_id].finished_at, default=None)
+        while current is not None:
+            critical_path.append(current)
+            dependencies = self.steps[current].depends_on
+            current = max(dependencies, key=lambda step_id: results[step_id].finished_at, default=None)
+        critical_path.reverse()
+
+        ordered = dict(sorted(results.items(), key=lambda item: item[1].finished_at))
+        return TeamResult(
+            content=content, status=status, steps=ordered, elapsed=elapsed, critical_path=critical_path
+        )
@@ -2,43 +2,133 @@
 
 import asyncio
 import logging
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Dict, Iterable, List, Optional
 
-import nest_asyncio
 from langchain_core.tools import BaseTool
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
 
+from .mcp_pool import MCPSessionPool, PooledSessionProxy, list_all_tools
+from .mcp_schema_cache import MCPSchemaCache, dump_tool, server_config_key
+from .mcp_supervisor import POLICY_KEYS, MCPSupervisor, SupervisorPolicy
 from .tool_manager import ToolManager
 
-nest_asyncio.apply()
 logger = logging.getLogger(__name__)
 
+# 伺服器配置中由本服務使用、不傳給 MCP 連線的鍵
+SERVICE_KEYS = (
+    "tool_max_concurrency", "tool_timeout", "tool_cache_ttl", "startup_timeout",
+    "pool_size", "health_check_interval", "lazy", "idle_timeout",
+) + POLICY_KEYS
+
+# 單一伺服器的預設啟動逾時（秒）
+DEFAULT_STARTUP_TIMEOUT = 30.0
+
 
 class MCPClientService:
     """
     MCP 客戶端服務包裝器，用於管理工具初始化和訪問
+
+    以 ``await MCPClientService.create(...)`` 或 ``async with`` 建立，伺服器的
+    啟動、工具呼叫與關閉都在呼叫端的事件迴圈中進行：
+
+        async with MCPClientService(config, tool_manager) as mcp_client:
+            ...
+
+    各伺服器同時啟動，並各自套用啟動逾時（伺服器配置的 startup_timeout）。
+    先完成的伺服器立即註冊工具；啟動時最多等待 startup_wait 秒，
+    尚未完成的伺服器在背景繼續啟動，完成後再加入工具管理器。
+
+    工具呼叫透過每個伺服器的長連線池（MCPSessionPool）執行，不會每次呼叫
+    都啟動新的子行程；連線池大小與健康檢查間隔由伺服器配置的 pool_size 與
+    health_check_interval 設定。啟動時取得工具定義的連線也保留在連線池中。
+
+    指定 schema_cache_path 時，工具定義會依伺服器配置雜湊快取到磁碟；
+    配置未變更的伺服器在建構時直接以快取註冊工具，不需等待伺服器啟動，
+    伺服器連線後再於背景比對工具列表並更新。
+
+    不常使用的伺服器可設定 lazy：有快取工具定義時只註冊工具、不啟動
+    子行程，直到第一次工具呼叫才啟動；沒有快取時啟動一次取得工具定義
+    後即關閉。搭配 idle_timeout，閒置的伺服器子行程會被關閉並在下次呼叫
+    時重新啟動；pool_size 為每個伺服器同時存在的子行程數上限。三者皆可在
+    伺服器配置中個別覆寫。
+
+    指定 supervisor_interval 時，MCPSupervisor 會定期檢查各伺服器子行程的
+    RSS、CPU 與 ping 回應，超過伺服器配置的 max_rss_mb、max_cpu_percent
+    或 watchdog_timeout 時重新啟動該伺服器，呼叫中的請求會先完成。
     """
 
-    def __init__(self, config: Dict[str, Any], tool_manager: Optional[ToolManager] = None):
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        tool_manager: Optional[ToolManager] = None,
+        startup_wait: Optional[float] = 10.0,
+        schema_cache_path: Optional[str] = None,
+        lazy: bool = False,
+        idle_timeout: Optional[float] = None,
+        pool_size: int = 2,
+        supervisor_interval: Optional[float] = None
+    ):
         """
-        初始化 MCP 客戶端服務並強制初始化工具
+        初始化 MCP 客戶端服務（不啟動伺服器，需再呼叫 start()）
 
         Args:
             config: MCP 客戶端配置
             tool_manager: 工具管理器實例
+            startup_wait: start() 等待伺服器啟動的秒數（None 表示等待全部完成）
+            schema_cache_path: 工具定義快取檔案路徑（None 表示不快取）
+            lazy: 預設是否延遲到第一次工具呼叫才啟動伺服器
+            idle_timeout: 預設的閒置關閉秒數（None 表示保持開啟）
+            pool_size: 預設每個伺服器的子行程數上限
+            supervisor_interval: 資源監控的檢查間隔秒數（None 表示不自動檢查）
         """
         self.config = config
-        self.client: Optional[MultiServerMCPClient] = None
         self.tools: List[BaseTool] = []
         self.tool_manager = tool_manager
+        self.startup_wait = startup_wait
+        self.lazy = lazy
+        self.idle_timeout = idle_timeout
+        self.pool_size = pool_size
+        self.supervisor_interval = supervisor_interval
         self._initialized = False
+        self._started = False
+        self._server_tools: Dict[str, List[BaseTool]] = {}
+        self._server_schemas: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._server_status: Dict[str, Dict[str, Any]] = {}
+        self._startup_tasks: Dict[str, asyncio.Task] = {}
+        self._pools: Dict[str, MCPSessionPool] = {}
+        self._config_keys: Dict[str, str] = {}
+        self.schema_cache = MCPSchemaCache(schema_cache_path) if schema_cache_path else None
 
-        # 強制同步初始化工具
         self._init_tools()
+        self.supervisor = MCPSupervisor(
+            self._pools,
+            {name: SupervisorPolicy.from_config(self.config[name]) for name in self._pools},
+            interval=supervisor_interval or 10.0
+        )
+
+    @classmethod
+    async def create(
+        cls,
+        config: Dict[str, Any],
+        tool_manager: Optional[ToolManager] = None,
+        startup_wait: Optional[float] = 10.0,
+        schema_cache_path: Optional[str] = None,
+        **options: Any
+    ) -> "MCPClientService":
+        """建立服務並啟動所有伺服器（options 同建構子的其餘參數）"""
+        service = cls(config, tool_manager, startup_wait=startup_wait, schema_cache_path=schema_cache_path, **options)
+        return await service.start()
+
+    async def __aenter__(self) -> "MCPClientService":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
 
     def _init_tools(self) -> None:
         """
-        強制同步初始化工具
+        檢查伺服器配置、建立連線池，並以快取的工具定義註冊工具
         """
         try:
             logger.info("正在初始化 MCP 客戶端...")
@@ -50,7 +140,9 @@ class MCPClientService:
                 try:
                     logger.info(f"檢查伺服器 {server_name}: {server_config}")
                     if "command" in server_config and "transport" in server_config:
-                        valid_configs[server_name] = server_config
+                        valid_configs[server_name] = {
+                            key: value for key, value in server_config.items() if key not in SERVICE_KEYS
+                        }
                         logger.info(f"伺服器 {server_name} 配置有效")
                     else:
                         logger.warning(f"伺服器 {server_name} 配置無效，跳過")
@@ -59,57 +151,234 @@ class MCPClientService:
 
             if not valid_configs:
                 logger.warning("沒有有效的 MCP 伺服器配置")
-                self._initialized = True
                 return
 
-            logger.info(f"嘗試連接 {len(valid_configs)} 個有效伺服器")
+            for server_name, connection in valid_configs.items():
+                server_config = self.config[server_name]
+                self._pools[server_name] = MCPSessionPool(
+                    server_name,
+                    connection,
+                    max_sessions=server_config.get("pool_size", self.pool_size),
+                    health_check_interval=server_config.get("health_check_interval", 30.0),
+                    idle_timeout=server_config.get("idle_timeout", self.idle_timeout)
+                )
 
-            # 使用同步方式初始化工具
-            def run_async_init():
-                try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    try:
-                        self.client = MultiServerMCPClient(valid_configs)
-                        # 嘗試獲取工具，但設置超時
-                        self.tools = loop.run_until_complete(
-                            asyncio.wait_for(self.client.get_tools(), timeout=30.0)
-                        )
-
-                        # 如果有工具管理器，將工具註冊到管理器
-                        if self.tool_manager and self.tools:
-                            self.tool_manager.register_tools(self.tools, category="mcp")
-
-                        self._initialized = True
-                        logger.info(f"成功初始化 {len(self.tools)} 個 MCP 工具")
-
-                    except asyncio.TimeoutError:
-                        logger.error("MCP 工具初始化超時")
-                        self.tools = []
-                        self._initialized = True
-                    finally:
-                        loop.close()
-                except Exception as e:
-                    logger.error(f"異步初始化失敗: {e}")
-                    self.tools = []
-                    self._initialized = False
-
-            # 檢查當前是否在事件循環中
-            try:
-                current_loop = asyncio.get_running_loop()
-                # 在事件循環中，使用線程運行
-                import threading
-                thread = threading.Thread(target=run_async_init)
-                thread.start()
-                thread.join()
-            except RuntimeError:
-                # 不在事件循環中，直接運行
-                run_async_init()
+            # 配置未變更的伺服器直接以快取的工具定義註冊
+            cached_servers = 0
+            for server_name, connection in valid_configs.items():
+                self._server_status[server_name] = {"status": "starting", "tool_count": 0, "startup_time": None}
+                self._config_keys[server_name] = server_config_key(connection)
+                cached = self.schema_cache.get(server_name, self._config_keys[server_name]) if self.schema_cache else None
+                if cached is not None:
+                    self._apply_server_tools(server_name, cached)
+                    status = "lazy" if self._is_lazy(server_name) else "cached"
+                    self._server_status[server_name].update(status=status, tool_count=len(cached))
+                    cached_servers += 1
+            if cached_servers:
+                logger.info(f"已從快取註冊 {cached_servers} 個伺服器的工具")
 
         except Exception as e:
-            logger.error(f"強制初始化工具時發生錯誤: {e}")
+            logger.error(f"初始化 MCP 客戶端時發生錯誤: {e}")
             self.tools = []
-            self._initialized = False
+
+    def _is_lazy(self, server_name: str) -> bool:
+        return bool(self.config.get(server_name, {}).get("lazy", self.lazy))
+
+    async def start(self) -> "MCPClientService":
+        """
+        在目前的事件迴圈中同時啟動各伺服器
+
+        只等待沒有快取的伺服器（最多 startup_wait 秒）；有快取的伺服器與
+        逾時未完成的伺服器在背景繼續啟動，已從快取註冊的 lazy 伺服器則
+        不啟動。重複呼叫不會重新啟動。
+        """
+        if self._started:
+            return self
+        self._started = True
+
+        for server_name in self._pools:
+            if self._server_status[server_name]["status"] == "lazy":
+                continue
+            self._startup_tasks[server_name] = asyncio.ensure_future(self._load_server(server_name))
+
+        waiting = [
+            task for name, task in self._startup_tasks.items()
+            if self._server_status[name]["status"] != "cached"
+        ]
+        pending = set()
+        if waiting:
+            _, pending = await asyncio.wait(waiting, timeout=self.startup_wait)
+
+        if self.supervisor_interval:
+            self.supervisor.start()
+
+        self._initialized = True
+        ready = sum(1 for status in self._server_status.values() if status["status"] == "ready")
+        logger.info(f"成功初始化 {len(self.tools)} 個 MCP 工具（{ready}/{len(self._pools)} 個伺服器就緒）")
+        if pending:
+            logger.info(f"{len(pending)} 個伺服器仍在背景啟動中")
+        return self
+
+    async def _load_server(self, server_name: str) -> Optional[Dict[str, int]]:
+        """連線伺服器、取得工具定義並以差異更新工具，回傳變更數量（失敗時回傳 None）"""
+        timeout = self.config.get(server_name, {}).get("startup_timeout", DEFAULT_STARTUP_TIMEOUT)
+        status = self._server_status[server_name]
+        start = time.monotonic()
+        task = asyncio.ensure_future(list_all_tools(PooledSessionProxy(self._pools[server_name])))
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        if not done:
+            status.update(status="timeout", error=f"啟動逾時 ({timeout} 秒)", startup_time=time.monotonic() - start)
+            if server_name in self._server_tools:
+                # 仍保留快取的工具，呼叫時由連線池重新連線
+                status.update(status="cached")
+            logger.error(f"MCP 伺服器 {server_name} 啟動逾時 ({timeout} 秒)")
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return None
+        try:
+            mcp_tools = task.result()
+        except Exception as e:
+            status.update(status="failed", error=str(e), startup_time=time.monotonic() - start)
+            logger.error(f"MCP 伺服器 {server_name} 啟動失敗: {e}")
+            return None
+
+        if self.schema_cache is not None:
+            self.schema_cache.put(server_name, self._config_keys[server_name], mcp_tools)
+        changes = self._apply_server_tools(server_name, mcp_tools)
+        if self._is_lazy(server_name):
+            # 只為取得工具定義而啟動，第一次工具呼叫時再重新啟動
+            await self._pools[server_name].close_idle()
+
+        status.pop("error", None)
+        status.update(status="ready", tool_count=len(mcp_tools), startup_time=time.monotonic() - start)
+        logger.info(f"MCP 伺服器 {server_name} 就緒: {len(mcp_tools)} 個工具，耗時 {status['startup_time']:.2f} 秒")
+        return changes
+
+    def _apply_server_tools(self, server_name: str, mcp_tools: List[Any]) -> Dict[str, int]:
+        """
+        以差異更新伺服器的工具：定義未變更的工具沿用原本的實例，只轉換與註冊
+        新增或變更的工具，並從工具管理器移除已不存在的工具
+        """
+        schemas = {tool.name: dump_tool(tool) for tool in mcp_tools}
+        previous_schemas = self._server_schemas.get(server_name, {})
+        previous_tools = {tool.name: tool for tool in self._server_tools.get(server_name, [])}
+        proxy = PooledSessionProxy(self._pools[server_name])
+
+        tools: List[BaseTool] = []
+        changed: List[BaseTool] = []
+        for mcp_tool in mcp_tools:
+            existing = previous_tools.get(mcp_tool.name)
+            if existing is not None and previous_schemas.get(mcp_tool.name) == schemas[mcp_tool.name]:
+                tools.append(existing)
+                continue
+            tool = convert_mcp_tool_to_langchain_tool(proxy, mcp_tool)
+            tools.append(tool)
+            changed.append(tool)
+        removed = [name for name in previous_tools if name not in schemas]
+
+        self._server_tools[server_name] = tools
+        self._server_schemas[server_name] = schemas
+        self.tools = [tool for server_tools in self._server_tools.values() for tool in server_tools]
+
+        # 如果有工具管理器，將差異同步到管理器
+        if self.tool_manager:
+            for name in removed:
+                self.tool_manager.remove_tool(name)
+            if changed:
+                self._register_server_tools(server_name, changed)
+
+        added = sum(1 for tool in changed if tool.name not in previous_tools)
+        return {"added": added, "updated": len(changed) - added, "removed": len(removed)}
+
+    def _register_server_tools(self, server_name: str, tools: List[BaseTool]) -> None:
+        """
+        以伺服器名稱為群組註冊工具，並套用配置中的 tool_max_concurrency、
+        tool_timeout 與 tool_cache_ttl（僅適用於冪等的伺服器，例如 fetch）
+        """
+        server_config = self.config.get(server_name, {})
+        max_concurrency = server_config.get("tool_max_concurrency")
+        timeout = server_config.get("tool_timeout")
+        if max_concurrency is not None or timeout is not None:
+            self.tool_manager.set_group_limits(server_name, max_concurrency=max_concurrency, timeout=timeout)
+        self.tool_manager.register_tools(tools, category="mcp", group=server_name)
+        cache_ttl = server_config.get("tool_cache_ttl")
+        if cache_ttl:
+            for tool in tools:
+                self.tool_manager.set_cache_ttl(tool.name, cache_ttl)
+
+    async def refresh(self, server_names: Optional[Iterable[str]] = None) -> Dict[str, Optional[Dict[str, int]]]:
+        """
+        重新取得工具列表並以差異更新工具管理器
+
+        透過既有的長連線查詢，不會重新啟動伺服器；只有新增、變更或移除的
+        工具會影響工具管理器。仍在啟動中的伺服器會被略過。
+
+        Args:
+            server_names: 要重新整理的伺服器（None 表示全部）
+
+        Returns:
+            伺服器名稱 -> {"added", "updated", "removed"}（失敗時為 None）
+        """
+        names = [
+            name for name in (server_names if server_names is not None else self._pools)
+            if name in self._pools
+            and not (name in self._startup_tasks and not self._startup_tasks[name].done())
+        ]
+        results = await asyncio.gather(*(self._load_server(name) for name in names))
+        return dict(zip(names, results))
+
+    async def refresh_tools(self) -> List[BaseTool]:
+        """
+        重新整理所有伺服器的工具
+
+        Returns:
+            更新後的工具列表
+        """
+        logger.info("正在重新整理 MCP 工具...")
+        await self.refresh()
+        return self.tools
+
+    async def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """等待背景啟動中的伺服器完成，回傳是否全部完成"""
+        tasks = [task for task in self._startup_tasks.values() if not task.done()]
+        if not tasks:
+            return True
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        return not pending
+
+    def get_server_status(self) -> Dict[str, Dict[str, Any]]:
+        """
+        取得各伺服器的啟動狀態（starting / cached / lazy / ready / timeout / failed）、
+        啟動耗時與目前的子行程數
+        """
+        return {
+            name: {**status, "processes": self._pools[name].get_stats()["open_sessions"]}
+            for name, status in self._server_status.items()
+        }
+
+    async def health_check(self) -> Dict[str, bool]:
+        """檢查各伺服器連線池的閒置連線，失效連線會在下次呼叫時重新建立"""
+        names = list(self._pools)
+        results = await asyncio.gather(*(self._pools[name].health_check() for name in names))
+        return dict(zip(names, results))
+
+    async def restart_server(self, server_name: str, reason: str = "手動重新啟動") -> bool:
+        """重新啟動伺服器，呼叫中的請求完成後才關閉舊的子行程"""
+        pool = self._pools.get(server_name)
+        if pool is None:
+            return False
+        return await pool.restart(reason, self.supervisor.policies[server_name].drain_timeout)
+
+    async def aclose(self) -> None:
+        """取消仍在啟動的伺服器並關閉所有長連線（結束子行程）"""
+        await self.supervisor.stop()
+        tasks = [task for task in self._startup_tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.gather(*(pool.close() for pool in self._pools.values()), return_exceptions=True)
+        self._started = False
+        logger.info("已關閉 MCP 客戶端")
 
     def get_tools(self) -> List[BaseTool]:
         """
@@ -145,19 +414,6 @@ class MCPClientService:
         """檢查是否已初始化"""
         return self._initialized
 
-    def refresh_tools(self) -> List[BaseTool]:
-        """
-        重新獲取和初始化工具
-
-        Returns:
-            更新後的工具列表
-        """
-        logger.info("正在重新整理 MCP 工具...")
-        self._initialized = False
-        self.tools = []
-        self._force_init_tools()
-        return self.tools
-
     def get_client_info(self) -> Dict[str, Any]:
         """
         取得客戶端資訊
@@ -168,5 +424,8 @@ class MCPClientService:
         return {
             "initialized": self._initialized,
             "tool_count": len(self.tools) if self.tools else 0,
-            "config_servers": len(self.config) if isinstance(self.config, dict) else 0
+            "config_servers": len(self.config) if isinstance(self.config, dict) else 0,
+            "servers": self.get_server_status(),
+            "pools": {name: pool.get_stats() for name, pool in self._pools.items()},
+            "resources": self.supervisor.get_stats()
         }
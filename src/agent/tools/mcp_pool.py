@@ -0,0 +1,458 @@
+"""MCP 長連線 Session 池 - 工具呼叫重用已啟動的伺服器連線"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+import anyio
+from langchain_mcp_adapters.sessions import create_session
+from mcp.shared.exceptions import McpError
+
+logger = logging.getLogger(__name__)
+
+# 沒有副作用、傳輸錯誤後可重送的請求
+_IDEMPOTENT_METHODS = frozenset({"list_tools", "send_ping"})
+# 寫入請求時串流已關閉：請求確定尚未送達伺服器，任何請求都可重送
+_NOT_SENT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError)
+
+
+class PooledSession:
+    """
+    單一長連線 Session
+
+    MCP 連線（例如 stdio 子行程）必須在同一個 task 中進入與離開，因此由
+    持有 task 開啟連線並等待關閉訊號，其他 task 透過 session 送出請求。
+    """
+
+    def __init__(self, connection: Dict[str, Any]):
+        self.connection = connection
+        self.session: Any = None
+        self.alive = False
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self._stop: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def open(self, timeout: float) -> "PooledSession":
+        loop = asyncio.get_running_loop()
+        ready: asyncio.Future = loop.create_future()
+        self._stop = asyncio.Event()
+        self._task = asyncio.ensure_future(self._hold(ready))
+        try:
+            self.session = await asyncio.wait_for(asyncio.shield(ready), timeout)
+        except BaseException:
+            if not ready.done():
+                ready.cancel()
+            elif not ready.cancelled():
+                ready.exception()
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            raise
+        self.alive = True
+        return self
+
+    async def _hold(self, ready: asyncio.Future) -> None:
+        try:
+            async with create_session(self.connection) as session:
+                await session.initialize()
+                ready.set_result(session)
+                await self._stop.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+            elif not isinstance(e, asyncio.CancelledError) and not self._stop.is_set():
+                logger.warning(f"MCP 連線中斷: {e}")
+        finally:
+            self.alive = False
+
+    async def ping(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout)
+            return True
+        except Exception as e:
+            logger.warning(f"MCP 連線健康檢查失敗: {str(e) or type(e).__name__}")
+            return False
+
+    async def send(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        送出請求；連線在回應前被關閉時取消等待並拋出 ConnectionError
+
+        連線被強制關閉時 MCP session 不一定會通知等待中的請求，因此同時等待
+        關閉訊號與持有 task，避免呼叫端永遠等不到回應。
+        """
+        call = asyncio.ensure_future(getattr(self.session, method)(*args, **kwargs))
+        stopped = asyncio.ensure_future(self._stop.wait())
+        try:
+            await asyncio.wait({call, stopped, self._task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stopped.cancel()
+            if not call.done():
+                call.cancel()
+                await asyncio.gather(call, return_exceptions=True)
+        if call.cancelled():
+            raise ConnectionError("MCP 連線已關閉，請求未收到回應")
+        return call.result()
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """通知持有 task 離開連線（結束子行程），逾時則取消"""
+        self.alive = False
+        if self._task is None or self._task.done():
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        except Exception:
+            pass
+
+
+class MCPSessionPool:
+    """
+    單一 MCP 伺服器的長連線 Session 池
+
+    連線在首次呼叫時於呼叫端的事件迴圈中建立並保持開啟，之後的工具呼叫
+    只需 IPC，不再每次啟動子行程。最多同時開啟 max_sessions 個連線（即
+    子行程數上限）以支援併發呼叫；閒置超過 health_check_interval 的連線在
+    取用前先 ping，失敗或傳輸錯誤時自動重新連線。設定 idle_timeout 時，
+    閒置超過該秒數的連線會被關閉以釋放子行程，下次呼叫再重新啟動。
+    restart() 以新連線取代舊連線，使用中的連線等呼叫完成後才關閉。
+
+    Args:
+        server_name: 伺服器名稱
+        connection: langchain_mcp_adapters 的連線配置
+        max_sessions: 連線數上限
+        health_check_interval: 取用前需要健康檢查的閒置秒數
+        connect_timeout: 建立連線的逾時秒數
+        ping_timeout: 健康檢查的逾時秒數
+        idle_timeout: 閒置連線的關閉秒數（None 表示保持開啟）
+    """
+
+    def __init__(
+        self,
+        server_name: str,
+        connection: Dict[str, Any],
+        max_sessions: int = 2,
+        health_check_interval: float = 30.0,
+        connect_timeout: float = 30.0,
+        ping_timeout: float = 5.0,
+        idle_timeout: Optional[float] = None
+    ):
+        self.server_name = server_name
+        self.connection = connection
+        self.max_sessions = max_sessions
+        self.health_check_interval = health_check_interval
+        self.connect_timeout = connect_timeout
+        self.ping_timeout = ping_timeout
+        self.idle_timeout = idle_timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._idle: Deque[PooledSession] = deque()
+        self._sessions: Set[PooledSession] = set()
+        self._idle_timer: Optional[asyncio.TimerHandle] = None
+        self._closing: Set[asyncio.Task] = set()
+        # 重新啟動時等待呼叫完成後關閉的連線
+        self._retiring: Set[PooledSession] = set()
+        self._drained: Optional[asyncio.Event] = None
+        self._restarting = False
+        self._stats = {
+            "calls": 0, "errors": 0, "connects": 0, "reconnects": 0,
+            "health_check_failures": 0, "idle_shutdowns": 0,
+            "restarts": 0, "watchdog_failures": 0,
+        }
+        self._total_latency = 0.0
+        self._latencies: Deque[float] = deque(maxlen=256)
+
+    def _bind_loop(self) -> None:
+        """連線綁定建立時的事件迴圈；換到新的事件迴圈時捨棄舊連線"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self._sessions:
+            logger.warning(f"MCP 伺服器 {self.server_name} 的連線池改用新的事件迴圈，捨棄舊連線")
+            self._abandon(self._loop)
+        self._cancel_idle_timer()
+        self._loop = loop
+        self._slots = asyncio.Semaphore(self.max_sessions)
+        self._idle.clear()
+        self._sessions.clear()
+        self._retiring.clear()
+
+    def _abandon(self, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        sessions = list(self._sessions)
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            for pooled in sessions:
+                asyncio.run_coroutine_threadsafe(pooled.close(), loop)
+
+    async def _connect(self) -> PooledSession:
+        pooled = await PooledSession(self.connection).open(self.connect_timeout)
+        self._sessions.add(pooled)
+        self._stats["connects"] += 1
+        logger.debug(f"MCP 伺服器 {self.server_name} 建立新連線（共 {len(self._sessions)} 個）")
+        return pooled
+
+    async def _discard(self, pooled: PooledSession) -> None:
+        self._sessions.discard(pooled)
+        await pooled.close()
+
+    async def acquire(self) -> PooledSession:
+        """取得可用連線（呼叫端需以 release() 歸還）"""
+        self._bind_loop()
+        await self._slots.acquire()
+        try:
+            while self._idle:
+                pooled = self._idle.pop()
+                if not pooled.alive:
+                    await self._discard(pooled)
+                    continue
+                if time.monotonic() - pooled.last_used > self.health_check_interval:
+                    if not await pooled.ping(self.ping_timeout):
+                        self._stats["health_check_failures"] += 1
+                        await self._discard(pooled)
+                        continue
+                return pooled
+            return await self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _forget(self, pooled: PooledSession) -> None:
+        """將連線移出連線池；重新啟動中的連線全部移出時通知等待者"""
+        self._sessions.discard(pooled)
+        if pooled in self._retiring:
+            self._retiring.discard(pooled)
+            if not self._retiring and self._drained is not None:
+                self._drained.set()
+
+    def release(self, pooled: PooledSession) -> None:
+        pooled.last_used = time.monotonic()
+        if pooled in self._retiring:
+            # 重新啟動前開啟的連線，呼叫完成後關閉
+            self._forget(pooled)
+            self._close_later([pooled])
+        elif pooled.alive and pooled in self._sessions:
+            self._idle.append(pooled)
+            if self.idle_timeout is not None and self._idle_timer is None:
+                self._idle_timer = self._loop.call_later(self.idle_timeout, self._reap_idle)
+        else:
+            self._sessions.discard(pooled)
+        self._slots.release()
+
+    def _reap_idle(self) -> None:
+        """關閉閒置逾時的連線，並為其餘閒置連線重新排程"""
+        self._idle_timer = None
+        now = time.monotonic()
+        expired = [pooled for pooled in self._idle if now - pooled.last_used >= self.idle_timeout]
+        for pooled in expired:
+            self._idle.remove(pooled)
+            self._sessions.discard(pooled)
+        if expired:
+            self._stats["idle_shutdowns"] += len(expired)
+            logger.info(f"MCP 伺服器 {self.server_name} 閒置逾時，關閉 {len(expired)} 個連線")
+            self._close_later(expired)
+        if self._idle:
+            delay = self.idle_timeout - (now - min(pooled.last_used for pooled in self._idle))
+            self._idle_timer = self._loop.call_later(max(delay, 0.0), self._reap_idle)
+
+    def _cancel_idle_timer(self) -> None:
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    @staticmethod
+    async def _close_sessions(sessions: List[PooledSession]) -> None:
+        await asyncio.gather(*(pooled.close() for pooled in sessions), return_exceptions=True)
+
+    def _close_later(self, sessions: List[PooledSession]) -> None:
+        """在背景關閉連線（close() 會等待這些 task 完成）"""
+        task = self._loop.create_task(self._close_sessions(sessions))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def close_idle(self) -> int:
+        """立即關閉所有閒置連線（使用中的連線不受影響），回傳關閉的數量"""
+        sessions = list(self._idle)
+        self._idle.clear()
+        for pooled in sessions:
+            self._sessions.discard(pooled)
+        self._cancel_idle_timer()
+        await self._close_sessions(sessions)
+        return len(sessions)
+
+    async def _request(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        透過連線池送出請求
+
+        MCP 協定錯誤（McpError）直接拋出；傳輸錯誤時捨棄連線，並在請求可安全
+        重送時（無副作用的請求，或請求確定尚未送出）以新連線重試一次。工具
+        呼叫可能有副作用，送出後才中斷的呼叫不重試，避免伺服器執行兩次。
+        """
+        for attempt in range(2):
+            pooled = await self.acquire()
+            try:
+                result = await pooled.send(method, *args, **kwargs)
+            except McpError:
+                self.release(pooled)
+                raise
+            except Exception as e:
+                self._forget(pooled)
+                self._slots.release()
+                await pooled.close()
+                if attempt or not (method in _IDEMPOTENT_METHODS or isinstance(e, _NOT_SENT_ERRORS)):
+                    raise
+                self._stats["reconnects"] += 1
+                logger.warning(f"MCP 伺服器 {self.server_name} 連線錯誤，重新連線: {str(e) or type(e).__name__}")
+            except BaseException:
+                self.release(pooled)
+                raise
+            else:
+                self.release(pooled)
+                return result
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None, *args: Any, **kwargs: Any) -> Any:
+        self._stats["calls"] += 1
+        start = time.monotonic()
+        try:
+            return await self._request("call_tool", name, arguments, *args, **kwargs)
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            self._total_latency += elapsed
+            self._latencies.append(elapsed)
+
+    async def list_tools(self, *args: Any, **kwargs: Any) -> Any:
+        return await self._request("list_tools", *args, **kwargs)
+
+    async def health_check(self) -> bool:
+        """檢查所有閒置連線，移除失效者；沒有任何連線時回傳 True"""
+        self._bind_loop()
+        healthy = True
+        for pooled in list(self._idle):
+            if not pooled.alive or not await pooled.ping(self.ping_timeout):
+                self._stats["health_check_failures"] += 1
+                healthy = False
+                if pooled in self._idle:
+                    self._idle.remove(pooled)
+                await self._discard(pooled)
+        return healthy
+
+    async def watchdog(self, timeout: float) -> bool:
+        """
+        以 ping 檢查所有連線（包含呼叫中的連線），任一連線逾時即回傳 False
+
+        MCP 連線可同時處理多個請求，呼叫中的連線仍應回應 ping；無回應表示
+        伺服器已卡住。尚未建立連線時回傳 True。
+        """
+        if self._loop is not asyncio.get_running_loop():
+            return True
+        sessions = [pooled for pooled in self._sessions if pooled.alive and pooled not in self._retiring]
+        results = await asyncio.gather(*(pooled.ping(timeout) for pooled in sessions))
+        if all(results):
+            return True
+        self._stats["watchdog_failures"] += 1
+        return False
+
+    async def restart(self, reason: str, drain_timeout: float = 30.0) -> bool:
+        """
+        重新啟動伺服器，回傳是否執行（已在重新啟動中時回傳 False）
+
+        閒置連線立即關閉；呼叫中的連線等待呼叫完成後關閉，超過 drain_timeout
+        秒則強制關閉。被強制關閉的工具呼叫以錯誤結束且不會重送（請求已送出，
+        伺服器可能已執行，呼叫端需自行確認是否完成）。新的呼叫立即改用新連線，
+        原本有連線時會先建立一個新連線。
+        """
+        if self._restarting:
+            return False
+        self._bind_loop()
+        self._restarting = True
+        self._stats["restarts"] += 1
+        logger.warning(f"重新啟動 MCP 伺服器 {self.server_name}: {reason}")
+        try:
+            had_sessions = bool(self._sessions)
+            self._cancel_idle_timer()
+            idle = list(self._idle)
+            self._idle.clear()
+            for pooled in idle:
+                self._sessions.discard(pooled)
+            self._retiring.update(self._sessions)
+            await self._close_sessions(idle)
+
+            if self._retiring:
+                self._drained = asyncio.Event()
+                try:
+                    await asyncio.wait_for(self._drained.wait(), drain_timeout)
+                except asyncio.TimeoutError:
+                    stuck = list(self._retiring)
+                    logger.warning(
+                        f"MCP 伺服器 {self.server_name} 有 {len(stuck)} 個呼叫未在 {drain_timeout} 秒內完成，強制關閉"
+                    )
+                    for pooled in stuck:
+                        self._forget(pooled)
+                    await self._close_sessions(stuck)
+                finally:
+                    self._drained = None
+
+            if had_sessions:
+                try:
+                    self.release(await self.acquire())
+                except Exception as e:
+                    logger.error(f"MCP 伺服器 {self.server_name} 重新啟動失敗: {e}")
+            return True
+        finally:
+            self._restarting = False
+
+    async def close(self) -> None:
+        """關閉所有連線並結束子行程"""
+        self._cancel_idle_timer()
+        sessions = list(self._sessions)
+        self._sessions.clear()
+        self._idle.clear()
+        self._retiring.clear()
+        if self._drained is not None:
+            self._drained.set()
+        await self._close_sessions(sessions)
+        await asyncio.gather(*self._closing, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        calls = self._stats["calls"]
+        latencies = sorted(self._latencies)
+        return {
+            **self._stats,
+            "open_sessions": len(self._sessions),
+            "idle_sessions": len(self._idle),
+            "retiring_sessions": len(self._retiring),
+            "avg_latency": self._total_latency / calls if calls else 0.0,
+            "p50_latency": latencies[len(latencies) // 2] if latencies else 0.0,
+            "p95_latency": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            "max_latency": latencies[-1] if latencies else 0.0,
+        }
+
+
+class PooledSessionProxy:
+    """以 ClientSession 介面包裝連線池，供 langchain_mcp_adapters 轉換工具使用"""
+
+    def __init__(self, pool: MCPSessionPool):
+        self.pool = pool
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None, *args: Any, **kwargs: Any) -> Any:
+        return await self.pool.call_tool(name, arguments, *args, **kwargs)
+
+    async def list_tools(self, *args: Any, **kwargs: Any) -> Any:
+        return await self.pool.list_tools(*args, **kwargs)
+
+
+async def list_all_tools(session: Any) -> List[Any]:
+    """取得伺服器的所有工具定義（處理分頁）"""
+    tools: List[Any] = []
+    cursor = None
+    while True:
+        page = await session.list_tools(cursor) if cursor else await session.list_tools()
+        tools.extend(page.tools)
+        cursor = getattr(page, "nextCursor", None)
+        if not cursor:
+            return tools
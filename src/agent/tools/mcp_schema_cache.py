@@ -0,0 +1,102 @@
+"""MCP 工具定義的磁碟快取 - 冷啟動時不需等待伺服器即可註冊工具"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from mcp.types import Tool as MCPTool
+
+logger = logging.getLogger(__name__)
+
+# 影響伺服器提供哪些工具的連線配置欄位
+_KEY_FIELDS = ("transport", "command", "args", "env", "cwd", "url")
+
+
+def server_config_key(connection: Dict[str, Any]) -> str:
+    """以伺服器的指令、參數與環境變數等配置計算雜湊（不儲存配置本身）"""
+    fields = {name: connection.get(name) for name in _KEY_FIELDS}
+    payload = json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def dump_tool(tool: MCPTool) -> Dict[str, Any]:
+    """將工具定義序列化為可比較、可存檔的 dict"""
+    return tool.model_dump(mode="json", by_alias=True, exclude_none=True)
+
+
+class MCPSchemaCache:
+    """
+    MCP 工具定義快取
+
+    以 JSON 檔案保存各伺服器的工具定義，並以連線配置雜湊驗證：配置變更後
+    舊的快取不會被使用。
+
+    Args:
+        path: 快取檔案路徑
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, Any]] = self._read()
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"無法讀取 MCP 工具定義快取 {self.path}: {e}")
+            return {}
+
+    def _write(self) -> None:
+        """先寫入暫存檔再替換，避免中斷時留下損毀的快取（呼叫端需持有鎖）"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get(self, server_name: str, config_key: str) -> Optional[List[MCPTool]]:
+        """取得快取的工具定義，配置雜湊不符時回傳 None"""
+        with self._lock:
+            entry = self._data.get(server_name)
+        if not entry or entry.get("key") != config_key:
+            return None
+        try:
+            return [MCPTool.model_validate(tool) for tool in entry.get("tools", [])]
+        except Exception as e:
+            logger.warning(f"MCP 工具定義快取格式錯誤 {server_name}: {e}")
+            return None
+
+    def put(self, server_name: str, config_key: str, tools: List[MCPTool]) -> bool:
+        """寫入工具定義，回傳內容是否有變更"""
+        dumped = [dump_tool(tool) for tool in tools]
+        with self._lock:
+            entry = self._data.get(server_name)
+            if entry and entry.get("key") == config_key and entry.get("tools") == dumped:
+                return False
+            self._data[server_name] = {"key": config_key, "tools": dumped, "updated_at": time.time()}
+            try:
+                self._write()
+            except Exception as e:
+                logger.warning(f"無法寫入 MCP 工具定義快取 {self.path}: {e}")
+        return True
+
+    def invalidate(self, server_name: Optional[str] = None) -> None:
+        with self._lock:
+            if server_name is None:
+                self._data.clear()
+            else:
+                self._data.pop(server_name, None)
+            try:
+                self._write()
+            except Exception as e:
+                logger.warning(f"無法寫入 MCP 工具定義快取 {self.path}: {e}")
@@ -0,0 +1,224 @@
+"""MCP 伺服器資源監控 - 子行程的記憶體、CPU 取樣與自動重新啟動"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+from .mcp_pool import MCPSessionPool
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+@dataclass
+class SupervisorPolicy:
+    """
+    單一伺服器的重新啟動門檻（可在伺服器配置中以同名鍵設定）
+
+    Args:
+        max_rss_mb: 行程樹的常駐記憶體上限（MB），超過即重新啟動
+        max_cpu_percent: CPU 使用率上限（%），連續 cpu_strikes 次取樣超過即重新啟動
+        cpu_strikes: CPU 超過上限的連續取樣次數
+        watchdog_timeout: ping 逾時秒數，逾時視為伺服器卡住並重新啟動（None 表示不檢查）
+        drain_timeout: 重新啟動時等待呼叫完成的秒數
+    """
+
+    max_rss_mb: Optional[float] = None
+    max_cpu_percent: Optional[float] = None
+    cpu_strikes: int = 3
+    watchdog_timeout: Optional[float] = 10.0
+    drain_timeout: float = 30.0
+
+    @classmethod
+    def from_config(cls, server_config: Dict[str, Any]) -> "SupervisorPolicy":
+        return cls(**{f.name: server_config[f.name] for f in fields(cls) if f.name in server_config})
+
+
+# 伺服器配置中屬於監控門檻的鍵
+POLICY_KEYS = tuple(f.name for f in fields(SupervisorPolicy))
+
+
+def _process_table() -> Dict[int, Tuple[int, int, float]]:
+    """取得所有行程的 pid -> (ppid, RSS 位元組, CPU 秒數)；優先使用 psutil，否則讀取 /proc"""
+    table: Dict[int, Tuple[int, int, float]] = {}
+    if psutil is not None:
+        for proc in psutil.process_iter(["ppid", "memory_info", "cpu_times"]):
+            info = proc.info
+            if info.get("memory_info") is None or info.get("cpu_times") is None:
+                continue
+            cpu = info["cpu_times"].user + info["cpu_times"].system
+            table[proc.pid] = (info["ppid"], info["memory_info"].rss, cpu)
+        return table
+
+    if not os.path.isdir("/proc"):
+        return table
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                data = f.read()
+        except OSError:
+            continue
+        # 行程名稱可能包含空白，從最後一個 ")" 之後解析
+        values = data[data.rfind(b")") + 2:].split()
+        try:
+            cpu = (int(values[11]) + int(values[12])) / _CLOCK_TICKS
+            table[int(entry)] = (int(values[1]), int(values[21]) * _PAGE_SIZE, cpu)
+        except (IndexError, ValueError):
+            continue
+    return table
+
+
+def _cmdline(pid: int) -> List[str]:
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).cmdline()
+        except psutil.Error:
+            return []
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return [part.decode("utf-8", "replace") for part in f.read().split(b"\0") if part]
+    except OSError:
+        return []
+
+
+def _matches(cmdline: List[str], connection: Dict[str, Any]) -> bool:
+    """子行程的命令列是否對應伺服器配置（允許 shebang 腳本由直譯器啟動，例如 npx）"""
+    command = connection.get("command")
+    args = [str(arg) for arg in connection.get("args") or []]
+    if not cmdline or not command:
+        return False
+    if args and cmdline[-len(args):] != args:
+        return False
+    name = os.path.basename(command)
+    return any(os.path.basename(part) == name for part in cmdline[:len(cmdline) - len(args)])
+
+
+class MCPSupervisor:
+    """
+    MCP 伺服器子行程監控
+
+    定期取樣各伺服器行程樹（伺服器子行程及其後代，例如 npx 啟動的 node）
+    的 RSS 與 CPU 使用率，並以 ping 檢查連線是否卡住；超過 SupervisorPolicy
+    的門檻時重新啟動該伺服器的連線池，呼叫中的請求會先完成再關閉舊行程。
+
+    Args:
+        pools: 伺服器名稱 -> 連線池
+        policies: 伺服器名稱 -> 重新啟動門檻
+        interval: 檢查間隔秒數
+    """
+
+    def __init__(
+        self,
+        pools: Dict[str, MCPSessionPool],
+        policies: Dict[str, SupervisorPolicy],
+        interval: float = 10.0
+    ):
+        self.pools = pools
+        self.policies = policies
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._usage: Dict[str, Dict[str, Any]] = {
+            name: {"pids": [], "rss_mb": 0.0, "cpu_percent": 0.0, "last_restart_reason": None, "last_restart_at": None}
+            for name in pools
+        }
+        self._last_cpu: Dict[str, Tuple[float, float]] = {}
+        self._strikes: Dict[str, int] = {name: 0 for name in pools}
+        self._cmdlines: Dict[int, List[str]] = {}
+
+    def _sample(self) -> None:
+        """
+        取樣各伺服器行程樹的 RSS 與 CPU 使用率（CPU 為距上次取樣的平均值）
+
+        會掃描行程表且更新 CPU 基準，只由 check() 在執行緒中呼叫。
+        """
+        table = _process_table()
+        children: Dict[int, List[int]] = defaultdict(list)
+        for pid, (ppid, _, _) in table.items():
+            children[ppid].append(pid)
+
+        roots = children.get(os.getpid(), [])
+        self._cmdlines = {pid: self._cmdlines.get(pid) or _cmdline(pid) for pid in roots}
+        now = time.monotonic()
+        for name, pool in self.pools.items():
+            pids = [pid for pid in roots if _matches(self._cmdlines[pid], pool.connection)]
+            tree, stack = [], list(pids)
+            while stack:
+                pid = stack.pop()
+                tree.append(pid)
+                stack.extend(children.get(pid, []))
+            rss = sum(table[pid][1] for pid in tree)
+            cpu = sum(table[pid][2] for pid in tree)
+
+            cpu_percent = 0.0
+            previous = self._last_cpu.get(name)
+            if previous is not None and now > previous[1]:
+                cpu_percent = max(cpu - previous[0], 0.0) / (now - previous[1]) * 100
+            self._last_cpu[name] = (cpu, now)
+            self._usage[name].update(pids=pids, rss_mb=rss / 2 ** 20, cpu_percent=cpu_percent)
+
+    async def check(self) -> Dict[str, Optional[str]]:
+        """取樣並依門檻檢查各伺服器，回傳各伺服器重新啟動的原因（未重新啟動為 None）"""
+        await asyncio.to_thread(self._sample)
+        names = list(self.pools)
+        reasons = await asyncio.gather(*(self._check_server(name) for name in names))
+        return dict(zip(names, reasons))
+
+    async def _check_server(self, server_name: str) -> Optional[str]:
+        pool = self.pools[server_name]
+        policy = self.policies.get(server_name) or SupervisorPolicy()
+        usage = self._usage[server_name]
+
+        reason = None
+        if policy.max_rss_mb is not None and usage["rss_mb"] > policy.max_rss_mb:
+            reason = f"記憶體 {usage['rss_mb']:.0f} MB 超過上限 {policy.max_rss_mb} MB"
+        if policy.max_cpu_percent is not None:
+            over = usage["cpu_percent"] > policy.max_cpu_percent
+            self._strikes[server_name] = self._strikes[server_name] + 1 if over else 0
+            if reason is None and self._strikes[server_name] >= policy.cpu_strikes:
+                reason = f"CPU 使用率連續 {policy.cpu_strikes} 次超過 {policy.max_cpu_percent}%"
+        if reason is None and policy.watchdog_timeout is not None:
+            if not await pool.watchdog(policy.watchdog_timeout):
+                reason = f"watchdog ping 逾時 ({policy.watchdog_timeout} 秒)"
+        if reason is None:
+            return None
+
+        if await pool.restart(reason, policy.drain_timeout):
+            self._strikes[server_name] = 0
+            usage.update(last_restart_reason=reason, last_restart_at=time.time())
+        return reason
+
+    def start(self) -> None:
+        """在目前的事件迴圈中啟動定期檢查"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.warning(f"MCP 伺服器監控檢查失敗: {e}")
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """最近一次檢查的取樣結果（不重新取樣）"""
+        return {name: {**usage, "pids": list(usage["pids"])} for name, usage in self._usage.items()}
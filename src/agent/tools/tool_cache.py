@@ -0,0 +1,168 @@
+"""冪等工具的結果快取與相同呼叫合併"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from langchain_core.messages import ToolMessage
+
+logger = logging.getLogger(__name__)
+
+
+def make_call_key(tool_name: str, input: Any) -> Tuple[Hashable, ...]:
+    """以工具名稱與正規化參數建立快取鍵；工具調用與直接呼叫的回傳型別不同，分開快取"""
+    is_call = isinstance(input, dict) and input.get("type") == "tool_call"
+    args = input.get("args", {}) if is_call else input
+    canonical = json.dumps(args, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return (tool_name, is_call, canonical)
+
+
+def _cacheable(result: Any) -> bool:
+    return not (isinstance(result, ToolMessage) and result.status == "error")
+
+
+def _for_call(result: Any, input: Any) -> Any:
+    """快取的 ToolMessage 需改為對應本次調用的 tool_call_id"""
+    if isinstance(result, ToolMessage) and isinstance(input, dict) and input.get("id"):
+        return result.model_copy(update={"tool_call_id": input["id"], "id": None})
+    return result
+
+
+class ToolResultCache:
+    """
+    工具結果 TTL 快取
+
+    相同工具與參數的呼叫在 TTL 內直接回傳快取結果；同時進行中的相同呼叫
+    只會執行一次，其餘呼叫等待並共用其結果。錯誤結果與例外不會被快取。
+
+    Args:
+        maxsize: 快取的結果數上限（LRU 淘汰）
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple[Hashable, ...], asyncio.Future] = {}
+        self._inflight_sync: Dict[Tuple[Hashable, ...], Future] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, tool_name: str, field: str) -> None:
+        stats = self._stats.setdefault(tool_name, {"hits": 0, "misses": 0, "coalesced": 0})
+        stats[field] += 1
+
+    def _lookup(self, key: Tuple[Hashable, ...]) -> Tuple[bool, Any]:
+        """回傳 (是否命中, 結果)（呼叫端需持有鎖）"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, result = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, result
+
+    def _store(self, key: Tuple[Hashable, ...], result: Any, ttl: float) -> None:
+        if not _cacheable(result):
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    async def aget_or_run(
+        self,
+        tool_name: str,
+        input: Any,
+        ttl: float,
+        run: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """異步版本：命中時回傳快取，否則執行或加入進行中的相同呼叫"""
+        key = make_call_key(tool_name, input)
+        with self._lock:
+            hit, result = self._lookup(key)
+            if hit:
+                self._count(tool_name, "hits")
+                return _for_call(result, input)
+            task = self._inflight.get(key)
+            if task is not None and task.get_loop() is asyncio.get_running_loop():
+                self._count(tool_name, "coalesced")
+            else:
+                self._count(tool_name, "misses")
+                # 以獨立 task 執行，避免第一個呼叫者被取消時影響其他等待者
+                task = self._inflight[key] = asyncio.ensure_future(run())
+                task.add_done_callback(lambda done: self._finish(key, done, ttl))
+        return _for_call(await asyncio.shield(task), input)
+
+    def _finish(self, key: Tuple[Hashable, ...], task: asyncio.Future, ttl: float) -> None:
+        with self._lock:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+        if not task.cancelled() and task.exception() is None:
+            self._store(key, task.result(), ttl)
+
+    def get_or_run(self, tool_name: str, input: Any, ttl: float, run: Callable[[], Any]) -> Any:
+        """同步版本"""
+        key = make_call_key(tool_name, input)
+        with self._lock:
+            hit, result = self._lookup(key)
+            if hit:
+                self._count(tool_name, "hits")
+                return _for_call(result, input)
+            future = self._inflight_sync.get(key)
+            leader = future is None
+            if leader:
+                self._count(tool_name, "misses")
+                future = self._inflight_sync[key] = Future()
+            else:
+                self._count(tool_name, "coalesced")
+
+        if not leader:
+            return _for_call(future.result(), input)
+
+        try:
+            result = run()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self._store(key, result, ttl)
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight_sync.pop(key, None)
+
+    def invalidate(self, tool_name: Optional[str] = None) -> None:
+        """清除快取（指定工具或全部）"""
+        with self._lock:
+            if tool_name is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == tool_name]:
+                    del self._entries[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            per_tool = {name: dict(stats) for name, stats in self._stats.items()}
+            size = len(self._entries)
+            inflight = len(self._inflight) + len(self._inflight_sync)
+        totals = {
+            field: sum(stats[field] for stats in per_tool.values())
+            for field in ("hits", "misses", "coalesced")
+        }
+        requests = sum(totals.values())
+        return {
+            **totals,
+            "hit_rate": (totals["hits"] + totals["coalesced"]) / requests if requests else 0.0,
+            "size": size,
+            "inflight": inflight,
+            "tools": per_tool,
+        }
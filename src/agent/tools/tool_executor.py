@@ -0,0 +1,174 @@
+"""工具執行控制 - 併發上限、逾時與同步工具的執行緒池"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import Executor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+from pydantic import ConfigDict
+
+if TYPE_CHECKING:
+    from .tool_manager import ToolManager
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ToolLimits:
+    """
+    工具或工具群組（例如同一個 MCP 伺服器）的執行限制
+
+    Args:
+        max_concurrency: 同時執行的呼叫數上限（None 表示不限制）
+        timeout: 單次呼叫的逾時秒數（None 表示不限制）
+    """
+
+    max_concurrency: Optional[int] = None
+    timeout: Optional[float] = None
+    _async_slots: Optional[asyncio.Semaphore] = field(default=None, init=False, repr=False)
+    _sync_slots: Optional[threading.BoundedSemaphore] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.max_concurrency is not None:
+            if self.max_concurrency < 1:
+                raise ValueError("max_concurrency 必須大於 0")
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+            self._sync_slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    @asynccontextmanager
+    async def aslot(self):
+        if self._async_slots is None:
+            yield
+            return
+        async with self._async_slots:
+            yield
+
+    @contextmanager
+    def slot(self):
+        if self._sync_slots is None:
+            yield
+            return
+        with self._sync_slots:
+            yield
+
+    def to_dict(self) -> dict:
+        return {"max_concurrency": self.max_concurrency, "timeout": self.timeout}
+
+
+def is_async_tool(tool: BaseTool) -> bool:
+    """工具是否有原生的異步實作"""
+    if isinstance(tool, StructuredTool):
+        return tool.coroutine is not None
+    return type(tool)._arun is not BaseTool._arun
+
+
+def _is_tool_call(value: Any) -> bool:
+    return isinstance(value, dict) and value.get("type") == "tool_call"
+
+
+class ManagedTool(BaseTool):
+    """
+    套用 ToolManager 執行限制的工具包裝
+
+    設定了快取 TTL 的工具先查詢結果快取（命中時不佔用併發名額）。
+    呼叫時依序取得工具與群組的併發名額並套用逾時；沒有異步實作的工具
+    改在 ToolManager 的有界執行緒池中執行，避免阻塞事件迴圈。限制在每次
+    呼叫時向 ToolManager 查詢，因此調整限制不需要重建 graph。逾時的工具
+    調用會回傳 status 為 error 的 ToolMessage，讓模型得知結果並繼續。
+    """
+
+    tool: BaseTool
+    manager: Any
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    @classmethod
+    def wrap(cls, tool: BaseTool, manager: "ToolManager") -> "ManagedTool":
+        return cls(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            return_direct=tool.return_direct,
+            response_format=tool.response_format,
+            tags=tool.tags,
+            metadata=tool.metadata,
+            tool=tool,
+            manager=manager,
+        )
+
+    def _limits(self) -> Tuple[List[ToolLimits], Optional[float]]:
+        return self.manager.get_execution_limits(self.name)
+
+    def _timeout_result(self, input: Any, timeout: float) -> ToolMessage:
+        message = f"工具 {self.name} 執行逾時 ({timeout} 秒)"
+        logger.warning(message)
+        if _is_tool_call(input):
+            return ToolMessage(content=message, name=self.name, tool_call_id=input["id"], status="error")
+        raise ToolException(message)
+
+    # ------------------------------------------------------------------
+    # 呼叫
+    # ------------------------------------------------------------------
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        ttl = self.manager.get_cache_ttl(self.name)
+        if ttl:
+            return self.manager.result_cache.get_or_run(
+                self.name, input, ttl, lambda: self._invoke_limited(input, config, **kwargs)
+            )
+        return self._invoke_limited(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        ttl = self.manager.get_cache_ttl(self.name)
+        if ttl:
+            return await self.manager.result_cache.aget_or_run(
+                self.name, input, ttl, lambda: self._ainvoke_limited(input, config, **kwargs)
+            )
+        return await self._ainvoke_limited(input, config, **kwargs)
+
+    def _invoke_limited(self, input: Any, config: Optional[RunnableConfig], **kwargs: Any) -> Any:
+        limits, timeout = self._limits()
+        with ExitStack() as stack:
+            for limit in limits:
+                stack.enter_context(limit.slot())
+            if timeout is None:
+                return self.tool.invoke(input, config, **kwargs)
+            context = contextvars.copy_context()
+            future = self.manager.executor.submit(context.run, self.tool.invoke, input, config, **kwargs)
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                return self._timeout_result(input, timeout)
+
+    async def _ainvoke_limited(self, input: Any, config: Optional[RunnableConfig], **kwargs: Any) -> Any:
+        limits, timeout = self._limits()
+        async with AsyncExitStack() as stack:
+            for limit in limits:
+                await stack.enter_async_context(limit.aslot())
+            try:
+                return await asyncio.wait_for(self._ainvoke_tool(input, config, **kwargs), timeout)
+            except asyncio.TimeoutError:
+                # 同步工具的執行緒無法中斷，只會放棄等待其結果
+                return self._timeout_result(input, timeout)
+
+    async def _ainvoke_tool(self, input: Any, config: Optional[RunnableConfig], **kwargs: Any) -> Any:
+        if is_async_tool(self.tool):
+            return await self.tool.ainvoke(input, config, **kwargs)
+        executor: Executor = self.manager.executor
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, self.tool.invoke, input, config, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        # invoke/ainvoke 已覆寫，直接轉交給原工具
+        return self.tool._run(*args, **kwargs)
@@ -1,35 +1,217 @@
 """工具管理器"""
 
 import logging
-from typing import Any, Dict, List, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cached_property
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
 
 from langchain_core.tools import BaseTool
 
+from .tool_cache import ToolResultCache
+from .tool_executor import ManagedTool, ToolLimits
+from .tool_retriever import BM25Index
+
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class ToolSnapshot:
+    """
+    工具註冊表的不可變快照
+
+    同一版本的快照只建立一次，Agent 可低成本地持有，並以 version 判斷
+    工具集合是否已變更。
+    """
+
+    version: int
+    tools: Mapping[str, BaseTool]
+    categories: Mapping[str, Tuple[str, ...]]
+
+    def get(self, name: str) -> Optional[BaseTool]:
+        return self.tools.get(name)
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return tuple(self.tools)
+
+    @cached_property
+    def index(self) -> BM25Index:
+        """工具名稱與描述的檢索索引（每個版本建立一次）"""
+        return BM25Index.from_tools(self.tools.values())
+
+    def search(self, query: str, top_k: int = 8) -> List[str]:
+        """檢索與查詢最相關的工具名稱"""
+        return self.index.search(query, top_k)
+
+
 class ToolManager:
-    """統一的工具管理器"""
+    """
+    統一的工具管理器
 
-    def __init__(self):
+    除了工具註冊之外，也保存各工具與工具群組（例如同一個 MCP 伺服器）的
+    併發上限與逾時。Agent 透過 get_executable_tools() 取得套用這些限制的工具，
+    同一步驟中的多個工具調用會並行執行，同步工具在有界執行緒池中執行。
+
+    標記為可快取（cache_ttl）的冪等工具，相同參數的呼叫在 TTL 內共用結果，
+    同時進行中的相同呼叫只執行一次。
+
+    Args:
+        max_sync_workers: 執行同步工具的執行緒數上限
+        cache_size: 工具結果快取的項目數上限
+    """
+
+    def __init__(self, max_sync_workers: int = 8, cache_size: int = 1024):
         self._tools: Dict[str, BaseTool] = {}
-        self._tool_categories: Dict[str, List[str]] = {}
+        # 類別 -> 工具名稱（以 dict 作為有序集合，新增與移除皆為 O(1)）
+        self._tool_categories: Dict[str, Dict[str, None]] = {}
+        # 工具名稱 -> 所屬類別的反向索引
+        self._tool_index: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+        # 工具集合變更時遞增，供快取判斷是否需要重建
+        self._version = 0
+        self._snapshot: Optional[ToolSnapshot] = None
+        self.max_sync_workers = max_sync_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tool_limits: Dict[str, ToolLimits] = {}
+        self._tool_groups: Dict[str, str] = {}
+        self._group_limits: Dict[str, ToolLimits] = {}
+        self._managed: Dict[str, ManagedTool] = {}
+        self._cache_ttls: Dict[str, float] = {}
+        self.result_cache = ToolResultCache(maxsize=cache_size)
+
+    def register_tool(
+        self,
+        tool: BaseTool,
+        category: str = "general",
+        group: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        cache_ttl: Optional[float] = None
+    ) -> None:
+        """
+        註冊工具
+
+        Args:
+            group: 工具群組（例如 MCP 伺服器名稱），群組限制由所有成員共享
+            max_concurrency: 此工具同時執行的呼叫數上限
+            timeout: 此工具單次呼叫的逾時秒數（未設定時使用群組逾時）
+            cache_ttl: 結果快取秒數，僅用於冪等工具（None 表示不快取）
+        """
+        with self._lock:
+            self._add(tool, category, group)
+            self._bump()
+        if cache_ttl is not None:
+            self.set_cache_ttl(tool.name, cache_ttl)
+        if max_concurrency is not None or timeout is not None:
+            self.set_tool_limits(tool.name, max_concurrency=max_concurrency, timeout=timeout)
+
+        logger.info(f"已註冊工具: {tool.name} (類別: {category})")
+
+    def register_tools(
+        self,
+        tools: List[BaseTool],
+        category: str = "general",
+        group: Optional[str] = None
+    ) -> None:
+        """批量註冊工具（整批只遞增一次版本）"""
+        if not tools:
+            return
+        with self._lock:
+            for tool in tools:
+                self._add(tool, category, group)
+            self._bump()
+        logger.info(f"已註冊 {len(tools)} 個工具 (類別: {category})")
+
+    def replace_tools(
+        self,
+        tools: List[BaseTool],
+        category: str,
+        group: Optional[str] = None
+    ) -> None:
+        """
+        以新的工具列表取代某類別的工具（例如 MCP 工具重新整理）
 
-    def register_tool(self, tool: BaseTool, category: str = "general") -> None:
-        """註冊工具"""
+        只新增與移除有差異的工具，整批只遞增一次版本。
+        """
+        with self._lock:
+            new_names = {tool.name for tool in tools}
+            stale = [name for name in self._tool_categories.get(category, {}) if name not in new_names]
+            for name in stale:
+                self._discard(name, category)
+            changed = bool(stale)
+            for tool in tools:
+                if self._tools.get(tool.name) is not tool or category not in self._tool_index.get(tool.name, ()):
+                    self._add(tool, category, group)
+                    changed = True
+            if changed:
+                self._bump()
+        if changed:
+            logger.info(f"已更新類別 {category} 的工具: {len(tools)} 個（移除 {len(stale)} 個）")
+
+    def _add(self, tool: BaseTool, category: str, group: Optional[str]) -> None:
+        """新增或更新工具（呼叫端需持有鎖）"""
         tool_name = tool.name
-        self._tools[tool_name] = tool
+        if self._tools.get(tool_name) is not tool:
+            self._tools[tool_name] = tool
+            self._managed.pop(tool_name, None)
+            self.result_cache.invalidate(tool_name)
+        if group is not None:
+            self._tool_groups[tool_name] = group
+        self._tool_categories.setdefault(category, {})[tool_name] = None
+        self._tool_index.setdefault(tool_name, set()).add(category)
+
+    def _discard(self, name: str, category: Optional[str] = None) -> None:
+        """
+        從類別移除工具（呼叫端需持有鎖）
+
+        category 為 None 或工具已不屬於任何類別時，完全移除工具。
+        """
+        categories = self._tool_index.get(name, set())
+        for cat in ([category] if category is not None else list(categories)):
+            members = self._tool_categories.get(cat)
+            if members is not None:
+                members.pop(name, None)
+                if not members:
+                    del self._tool_categories[cat]
+            categories.discard(cat)
+        if categories:
+            return
+        self._tool_index.pop(name, None)
+        self._tools.pop(name, None)
+        self._managed.pop(name, None)
+        self._tool_limits.pop(name, None)
+        self._tool_groups.pop(name, None)
+        self._cache_ttls.pop(name, None)
+        self.result_cache.invalidate(name)
 
-        if category not in self._tool_categories:
-            self._tool_categories[category] = []
-        self._tool_categories[category].append(tool_name)
+    def _bump(self) -> None:
+        """遞增版本並使快照失效（呼叫端需持有鎖）"""
+        self._version += 1
+        self._snapshot = None
 
-        logger.info(f"已註冊工具: {tool_name} (類別: {category})")
+    @property
+    def version(self) -> int:
+        """註冊表版本，工具集合每次變更時遞增"""
+        return self._version
 
-    def register_tools(self, tools: List[BaseTool], category: str = "general") -> None:
-        """批量註冊工具"""
-        for tool in tools:
-            self.register_tool(tool, category)
+    def snapshot(self) -> ToolSnapshot:
+        """取得目前註冊表的不可變快照（同一版本共用同一個快照）"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = ToolSnapshot(
+                    version=self._version,
+                    tools=MappingProxyType(dict(self._tools)),
+                    categories=MappingProxyType({
+                        category: tuple(names) for category, names in self._tool_categories.items()
+                    })
+                )
+            return self._snapshot
 
     def get_tool(self, name: str) -> Optional[BaseTool]:
         """取得指定工具"""
@@ -37,57 +219,165 @@ class ToolManager:
 
     def get_tools_by_category(self, category: str) -> List[BaseTool]:
         """取得指定類別的工具"""
-        tool_names = self._tool_categories.get(category, [])
-        return [self._tools[name] for name in tool_names if name in self._tools]
+        snapshot = self.snapshot()
+        return [snapshot.tools[name] for name in snapshot.categories.get(category, ())]
 
     def get_all_tools(self) -> List[BaseTool]:
         """取得所有工具"""
-        return list(self._tools.values())
+        return list(self.snapshot().tools.values())
 
     def get_tool_names(self) -> List[str]:
         """取得所有工具名稱"""
-        return list(self._tools.keys())
+        return list(self.snapshot().names)
+
+    def get_executable_tools(
+        self,
+        names: Optional[List[str]] = None,
+        snapshot: Optional[ToolSnapshot] = None
+    ) -> List[BaseTool]:
+        """
+        取得套用執行限制的工具（供 Agent 建立 graph 使用）
+
+        Args:
+            names: 工具名稱列表，None 表示所有工具；不存在的名稱會被忽略
+            snapshot: 要使用的註冊表快照，未指定時使用目前的快照
+        """
+        snapshot = snapshot or self.snapshot()
+        if names is None:
+            names = snapshot.names
+        executable = []
+        for name in names:
+            tool = snapshot.get(name)
+            if tool is None:
+                continue
+            managed = self._managed.get(name)
+            if managed is None or managed.tool is not tool:
+                managed = self._managed[name] = ManagedTool.wrap(tool, self)
+            executable.append(managed)
+        return executable
+
+    # ------------------------------------------------------------------
+    # 執行限制
+    # ------------------------------------------------------------------
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """執行同步工具的有界執行緒池"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_sync_workers, thread_name_prefix="tool-worker"
+            )
+        return self._executor
+
+    def set_tool_limits(
+        self,
+        name: str,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> None:
+        """設定單一工具的併發上限與逾時"""
+        self._tool_limits[name] = ToolLimits(max_concurrency=max_concurrency, timeout=timeout)
+
+    def set_group_limits(
+        self,
+        group: str,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> None:
+        """設定工具群組（例如 MCP 伺服器）的共享併發上限與逾時"""
+        self._group_limits[group] = ToolLimits(max_concurrency=max_concurrency, timeout=timeout)
+
+    def get_execution_limits(self, name: str) -> Tuple[List[ToolLimits], Optional[float]]:
+        """回傳 (依序取得的限制, 生效的逾時)，工具逾時優先於群組逾時"""
+        limits = []
+        timeout = None
+        tool_limits = self._tool_limits.get(name)
+        group = self._tool_groups.get(name)
+        group_limits = self._group_limits.get(group) if group is not None else None
+        for item in (tool_limits, group_limits):
+            if item is not None:
+                limits.append(item)
+                if timeout is None:
+                    timeout = item.timeout
+        return limits, timeout
+
+    # ------------------------------------------------------------------
+    # 結果快取
+    # ------------------------------------------------------------------
+
+    def set_cache_ttl(self, name: str, ttl: Optional[float]) -> None:
+        """將工具標記為可快取（ttl 為 None 或 0 時取消）"""
+        if ttl:
+            self._cache_ttls[name] = ttl
+        else:
+            self._cache_ttls.pop(name, None)
+            self.result_cache.invalidate(name)
+
+    def get_cache_ttl(self, name: str) -> Optional[float]:
+        return self._cache_ttls.get(name)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """取得工具結果快取統計（命中、未命中、合併的呼叫數）"""
+        return self.result_cache.get_stats()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """關閉同步工具執行緒池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
 
     def get_categories(self) -> List[str]:
         """取得所有類別"""
-        return list(self._tool_categories.keys())
+        return list(self.snapshot().categories)
 
     def remove_tool(self, name: str) -> bool:
         """移除工具"""
-        if name in self._tools:
-            del self._tools[name]
-
-            # 從類別中移除
-            for category, tool_names in self._tool_categories.items():
-                if name in tool_names:
-                    tool_names.remove(name)
-
-            logger.info(f"已移除工具: {name}")
-            return True
-        return False
+        with self._lock:
+            if name not in self._tools:
+                return False
+            self._discard(name)
+            self._bump()
+        logger.info(f"已移除工具: {name}")
+        return True
 
     def clear_tools(self) -> None:
         """清空所有工具"""
-        self._tools.clear()
-        self._tool_categories.clear()
+        with self._lock:
+            self._tools.clear()
+            self._tool_categories.clear()
+            self._tool_index.clear()
+            self._managed.clear()
+            self._tool_limits.clear()
+            self._tool_groups.clear()
+            self._cache_ttls.clear()
+            self.result_cache.invalidate()
+            self._bump()
         logger.info("已清空所有工具")
 
     def get_tool_info(self, name: str) -> Optional[Dict[str, Any]]:
         """取得工具資訊"""
-        tool = self.get_tool(name)
-        if not tool:
-            return None
+        with self._lock:
+            tool = self.get_tool(name)
+            if not tool:
+                return None
 
-        return {
-            "name": tool.name,
-            "description": tool.description,
-            "args": getattr(tool, "args", {}),
-            "return_direct": getattr(tool, "return_direct", False)
-        }
+            limits, timeout = self.get_execution_limits(name)
+            return {
+                "name": tool.name,
+                "description": tool.description,
+                "args": getattr(tool, "args", {}),
+                "return_direct": getattr(tool, "return_direct", False),
+                "group": self._tool_groups.get(name),
+                "max_concurrency": [limit.max_concurrency for limit in limits if limit.max_concurrency],
+                "timeout": timeout,
+                "cache_ttl": self._cache_ttls.get(name),
+                "cache": self.result_cache.get_stats()["tools"].get(name)
+            }
 
     def list_tools(self) -> Dict[str, Dict[str, Any]]:
-        """列出所有工具資訊"""
-        return {
-            name: self.get_tool_info(name)
-            for name in self._tools.keys()
-        }
+        """列出所有工具資訊（持有鎖，註冊或移除工具時不會讀到不一致的註冊表）"""
+        with self._lock:
+            return {
+                name: self.get_tool_info(name)
+                for name in self._tools.keys()
+            }
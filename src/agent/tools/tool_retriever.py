@@ -0,0 +1,179 @@
+"""工具檢索 - 依每輪訊息挑選最相關的工具，縮小送給模型的工具 schema"""
+
+import logging
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import HumanMessage
+from langchain_core.tools import BaseTool
+
+from ..types.agent_types import content_to_text
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[a-z0-9]+|[\u2e80-\u9fff\uf900-\ufaff]+")
+_CAMEL_RE = re.compile(r"([a-z0-9])([A-Z])")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how i in is it me my of on or please the this that to what with you".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """英數字以單字切分（含 snake_case 與 camelCase，略過單一字元），CJK 以單字與雙字切分"""
+    tokens: List[str] = []
+    for word in _WORD_RE.findall(_CAMEL_RE.sub(r"\1 \2", text or "").lower()):
+        if word[0].isascii():
+            # 單一英數字元多為所有格或縮寫的殘留（例如 user's 的 s），不具區辨力
+            if len(word) > 1 and word not in _STOPWORDS:
+                tokens.append(word)
+        else:
+            tokens.extend(word)
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+class BM25Index:
+    """
+    工具名稱與描述的 BM25 索引
+
+    Args:
+        documents: 工具名稱 -> 索引文字
+        k1: 詞頻飽和參數
+        b: 文件長度正規化參數
+    """
+
+    def __init__(self, documents: Dict[str, str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.names: List[str] = list(documents)
+        self._lengths: List[int] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_id, name in enumerate(self.names):
+            counts = Counter(tokenize(documents[name]))
+            self._lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self._postings.setdefault(term, []).append((doc_id, tf))
+        total = len(self.names)
+        self._avg_length = (sum(self._lengths) / total) if total else 0.0
+        self._idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    @classmethod
+    def from_tools(cls, tools: Iterable[BaseTool]) -> "BM25Index":
+        # 名稱重複一次以提高名稱比對的權重
+        return cls({tool.name: f"{tool.name} {tool.name} {tool.description or ''}" for tool in tools})
+
+    def search(self, query: str, top_k: int, allowed: Optional[Iterable[str]] = None) -> List[str]:
+        """回傳分數最高的工具名稱（依分數遞減）"""
+        return [name for name, _ in self.scored_search(query, top_k, allowed)]
+
+    def scored_search(
+        self,
+        query: str,
+        top_k: int,
+        allowed: Optional[Iterable[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """回傳分數最高的 (工具名稱, BM25 分數)（依分數遞減，不含沒有任何詞命中的工具）"""
+        allowed_set = set(allowed) if allowed is not None else None
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self._postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / (self._avg_length or 1))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        results = []
+        for doc_id, score in ranked:
+            name = self.names[doc_id]
+            if allowed_set is None or name in allowed_set:
+                results.append((name, score))
+                if len(results) >= top_k:
+                    break
+        return results
+
+
+def _last_user_text(messages: Sequence[Any]) -> str:
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return content_to_text(message.content)
+    return ""
+
+
+class ToolSelector:
+    """
+    每輪動態綁定工具的模型選擇器
+
+    作為 create_react_agent 的動態模型使用：graph 的工具節點保有所有工具，
+    每次呼叫模型前依最後一則使用者訊息從索引挑出 top_k 個工具（加上
+    always_include）綁定到模型。相同工具組合的綁定結果會被快取。
+
+    檢索沒有結果或最高分低於 min_score 時（例如描述為英文、訊息為中文，或
+    訊息沒有提到工具相關的字詞），改為綁定全部工具，避免模型在沒有工具的
+    情況下回答。
+
+    Args:
+        model: 基礎模型
+        tools: 可用工具（graph 的工具節點所使用的工具）
+        index: 工具索引（通常為 ToolSnapshot.index）
+        top_k: 每輪綁定的檢索工具數
+        always_include: 永遠綁定的工具名稱
+        min_score: 檢索結果可信的最低 BM25 分數，低於此值時綁定全部工具
+        cache_size: 綁定模型的快取數量
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        tools: List[BaseTool],
+        index: BM25Index,
+        top_k: int,
+        always_include: Sequence[str] = (),
+        min_score: float = 1.0,
+        cache_size: int = 128
+    ):
+        self.model = model
+        self.tools = {tool.name: tool for tool in tools}
+        self.index = index
+        self.top_k = top_k
+        self.always_include = [name for name in always_include if name in self.tools]
+        self.min_score = min_score
+        self.cache_size = cache_size
+        self._bound: "OrderedDict[Tuple[str, ...], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def select(self, query: str) -> List[str]:
+        """挑選本輪要綁定的工具名稱"""
+        candidates = [name for name in self.tools if name not in self.always_include]
+        ranked = self.index.scored_search(query, self.top_k, allowed=candidates) if query else []
+        if not ranked or ranked[0][1] < self.min_score:
+            logger.debug(f"工具檢索沒有足夠相關的結果，綁定全部工具: {query[:50]!r}")
+            return self.always_include + candidates
+        return self.always_include + [name for name, _ in ranked]
+
+    def bind(self, names: List[str]) -> Any:
+        """取得綁定指定工具的模型（依工具組合快取）"""
+        key = tuple(sorted(names))
+        with self._lock:
+            model = self._bound.get(key)
+            if model is not None:
+                self._bound.move_to_end(key)
+                return model
+        model = self.model.bind_tools([self.tools[name] for name in key]) if key else self.model
+        with self._lock:
+            self._bound[key] = model
+            while len(self._bound) > self.cache_size:
+                self._bound.popitem(last=False)
+        return model
+
+    def __call__(self, state: Any, runtime: Any = None) -> Any:
+        messages = state["messages"] if isinstance(state, dict) else getattr(state, "messages", [])
+        names = self.select(_last_user_text(messages))
+        logger.debug(f"本輪綁定工具: {names}")
+        return self.bind(names)
@@ -1,10 +1,25 @@
 """Agent framework type definitions."""
 
-from .agent_types import AgentConfig, AgentState, Message, ToolCall
+from .agent_types import (
+    AgentConfig,
+    AgentResult,
+    AgentState,
+    Message,
+    StreamEvent,
+    TeamResult,
+    TeamStep,
+    TeamStepResult,
+    ToolCall,
+)
 
 __all__ = [
     "AgentConfig",
+    "AgentResult",
     "AgentState",
     "Message",
+    "StreamEvent",
+    "TeamResult",
+    "TeamStep",
+    "TeamStepResult",
     "ToolCall",
 ]
@@ -3,9 +3,25 @@
 from datetime import datetime
 from typing import Any, Dict, List, Literal, Optional
 
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
 from pydantic import BaseModel, Field
 
 
+def content_to_text(content: Any) -> str:
+    """將訊息內容（字串或內容區塊列表）轉為純文字"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for block in content:
+            if isinstance(block, str):
+                parts.append(block)
+            elif isinstance(block, dict) and block.get("type") == "text":
+                parts.append(block.get("text", ""))
+        return "".join(parts)
+    return str(content) if content else ""
+
+
 class ToolCall(BaseModel):
     """工具調用定義"""
     name: str = Field(description="工具名稱")
@@ -21,6 +37,109 @@ class Message(BaseModel):
     tool_calls: Optional[List[ToolCall]] = Field(default=None, description="工具調用")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="元數據")
 
+    def to_langchain(self) -> BaseMessage:
+        """轉換為 LangChain 訊息物件"""
+        if self.role == "system":
+            return SystemMessage(content=self.content)
+        if self.role == "user":
+            return HumanMessage(content=self.content)
+        if self.role == "tool":
+            return ToolMessage(
+                content=self.content,
+                tool_call_id=self.metadata.get("tool_call_id", ""),
+                name=self.metadata.get("name")
+            )
+        tool_calls = [
+            {"name": call.name, "args": call.args, "id": call.call_id}
+            for call in self.tool_calls or []
+        ]
+        return AIMessage(content=self.content, tool_calls=tool_calls)
+
+    @classmethod
+    def from_langchain(cls, message: BaseMessage) -> "Message":
+        """從 LangChain 訊息物件建立"""
+        content = content_to_text(message.content)
+        if isinstance(message, SystemMessage):
+            return cls(role="system", content=content)
+        if isinstance(message, HumanMessage):
+            return cls(role="user", content=content)
+        if isinstance(message, ToolMessage):
+            return cls(
+                role="tool",
+                content=content,
+                metadata={"tool_call_id": message.tool_call_id, "name": message.name}
+            )
+        tool_calls = [
+            ToolCall(name=call["name"], args=call.get("args", {}), call_id=call.get("id"))
+            for call in getattr(message, "tool_calls", None) or []
+        ]
+        return cls(role="assistant", content=content, tool_calls=tool_calls or None)
+
+
+class StreamEvent(BaseModel):
+    """流式回應事件"""
+    type: Literal["text_delta", "tool_call_start", "tool_call_end", "final", "error"] = Field(description="事件類型")
+    content: str = Field(default="", description="文字內容（增量、工具結果或最終回應）")
+    tool_name: Optional[str] = Field(default=None, description="工具名稱")
+    call_id: Optional[str] = Field(default=None, description="工具調用ID")
+    metadata: Dict[str, Any] = Field(default_factory=dict, description="元數據")
+
+
+class AgentResult(BaseModel):
+    """Agent 單輪執行結果"""
+    content: str = Field(default="", description="最終回應（未完成時為目前為止的部分回應）")
+    status: Literal["completed", "max_iterations", "timeout", "error"] = Field(
+        default="completed", description="結束狀態"
+    )
+    messages: List[Message] = Field(default_factory=list, description="本輪新增的訊息")
+    iterations: int = Field(default=0, description="模型呼叫次數")
+    elapsed: float = Field(default=0.0, description="執行時間（秒）")
+    error: Optional[str] = Field(default=None, description="未完成或失敗的原因")
+
+    @property
+    def partial(self) -> bool:
+        """是否因達到限制而提前結束"""
+        return self.status in ("max_iterations", "timeout")
+
+
+class TeamStep(BaseModel):
+    """團隊流程中的一個步驟（DAG 節點）"""
+    id: str = Field(description="步驟 ID")
+    agent: str = Field(description="執行此步驟的成員 ID")
+    prompt: Optional[str] = Field(
+        default=None, description="提示詞模板，可使用 {input} 與相依步驟 ID 作為欄位（None 表示附上所有相依輸出）"
+    )
+    depends_on: List[str] = Field(default_factory=list, description="相依的步驟 ID")
+    timeout: Optional[float] = Field(default=None, description="步驟最長執行時間（秒）")
+
+
+class TeamStepResult(BaseModel):
+    """團隊步驟的執行結果與計時（時間皆為相對流程開始的秒數）"""
+    step_id: str = Field(description="步驟 ID")
+    agent: str = Field(description="執行此步驟的成員 ID")
+    status: Literal["completed", "max_iterations", "timeout", "error", "skipped"] = Field(description="結束狀態")
+    content: str = Field(default="", description="步驟輸出")
+    error: Optional[str] = Field(default=None, description="未完成、失敗或略過的原因")
+    started_at: float = Field(default=0.0, description="開始執行的時間")
+    finished_at: float = Field(default=0.0, description="結束的時間")
+    queued: float = Field(default=0.0, description="相依步驟完成後等待併發名額的時間")
+    duration: float = Field(default=0.0, description="執行時間")
+    iterations: int = Field(default=0, description="模型呼叫次數")
+
+
+class TeamResult(BaseModel):
+    """團隊流程執行結果"""
+    content: str = Field(default="", description="最終步驟的輸出")
+    status: Literal["completed", "partial", "error"] = Field(default="completed", description="結束狀態")
+    steps: Dict[str, TeamStepResult] = Field(default_factory=dict, description="各步驟結果（依完成順序）")
+    elapsed: float = Field(default=0.0, description="總執行時間（秒）")
+    critical_path: List[str] = Field(default_factory=list, description="決定總執行時間的步驟鏈")
+
+    @property
+    def outputs(self) -> Dict[str, str]:
+        """各步驟的輸出"""
+        return {step_id: step.content for step_id, step in self.steps.items()}
+
 
 class AgentState(BaseModel):
     """Agent 狀態"""
@@ -40,6 +159,11 @@ class AgentConfig(BaseModel):
     tools: List[str] = Field(default_factory=list, description="可用工具列表")
     llm_config: Dict[str, Any] = Field(default_factory=dict, description="LLM 配置")
     max_iterations: int = Field(default=10, description="最大迭代次數")
+    max_execution_time: Optional[float] = Field(default=None, description="單輪最長執行時間（秒）")
     temperature: float = Field(default=0.7, description="生成溫度")
+    context_token_budget: Optional[int] = Field(default=None, description="每輪送出的上下文 token 上限")
+    context_policy: str = Field(default="system_recent", description="上下文選取策略")
+    tool_top_k: Optional[int] = Field(default=None, description="每輪依訊息檢索綁定的工具數（None 表示綁定全部）")
+    always_include_tools: List[str] = Field(default_factory=list, description="啟用工具檢索時永遠綁定的工具")
 
     model_config = {"use_enum_values": True}
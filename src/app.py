@@ -9,6 +9,7 @@ class AgentApp:
         self.factory = None
         self.tool_manager = None
         self.llm = None
+        self.mcp_client = None
 
     async def setup(self):
         print("🤖 Agent Template 快速測試")
@@ -43,15 +44,24 @@ class AgentApp:
             print("ℹ️  將使用空配置繼續")
             mcp_config = {"mcpServers": {}}
 
-        # 初始化 MCP 工具
-        self.mcp_client = MCPClientService(mcp_config["mcpServers"], self.tool_manager)
+        # 初始化 MCP 工具（工具定義快取於本地，第二次啟動不需等待伺服器）
+        schema_cache_path = os.path.join(os.path.dirname(__file__), ".cache", "mcp_schemas.json")
+        self.mcp_client = await MCPClientService.create(
+            mcp_config["mcpServers"], self.tool_manager, schema_cache_path=schema_cache_path
+        )
         available_tools = self.tool_manager.get_tool_names()
         print(f"🛠️  可用工具數量: {len(available_tools)}")
 
         # 3. 創建代理工廠和 Agent
         print("\n🏭 3. 創建 Agent...")
         from agent import AgentFactory
-        self.factory = AgentFactory(tool_manager=self.tool_manager)
+        from config.config_manager import ConfigManager
+
+        app_config = ConfigManager(os.path.join(os.path.dirname(__file__), "config")).load_config()
+        self.factory = AgentFactory(
+            tool_manager=self.tool_manager,
+            max_execution_time=app_config.max_execution_time
+        )
 
         # 直接創建代理，使用可用的工具
         self.agent = self.factory.create_agent(
@@ -169,10 +179,15 @@ class AgentApp:
             print("ℹ️  請檢查配置並重試")
 
     async def _run(self):
-        await self.setup()
-        ok = await self.test_conversation()
-        if ok:
-            await self.interact()
+        try:
+            await self.setup()
+            ok = await self.test_conversation()
+            if ok:
+                await self.interact()
+        finally:
+            # 關閉 MCP 伺服器子行程
+            if self.mcp_client:
+                await self.mcp_client.aclose()
 
 # 讓其他模組可以 import
 app = AgentApp()
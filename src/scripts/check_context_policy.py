@@ -0,0 +1,102 @@
+"""
+上下文策略檢查 - 裁剪後的訊息必須是 provider 可接受的對話
+
+各策略在預算內裁剪對話歷史後，檢查：
+  1. 每個助理訊息的 tool_call 都有對應的工具結果，每個工具結果都有對應的 tool_call
+     （否則 OpenAI / Anthropic 會以 400 拒絕請求）
+  2. 除系統訊息與釘選訊息外，對話從使用者訊息開始
+  3. 釘選的訊息（含工具呼叫）在捲出最近視窗後仍被保留
+有任何案例不符時以非零狀態碼結束。
+
+用法（於 src 目錄）：
+    python scripts/check_context_policy.py
+"""
+
+import os
+import sys
+from typing import List, Optional, Set
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import (  # noqa: E402
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+from agent.core.context_manager import ContextManager  # noqa: E402
+
+
+def tool_turn(turn: int) -> List[BaseMessage]:
+    call_id = f"call-{turn}"
+    return [
+        HumanMessage(content=f"第 {turn} 個問題，請查詢資料"),
+        AIMessage(content="", tool_calls=[{"name": "lookup", "args": {"turn": turn}, "id": call_id}]),
+        ToolMessage(content=f"第 {turn} 筆查詢結果 " * 5, tool_call_id=call_id),
+        AIMessage(content=f"第 {turn} 個回答"),
+    ]
+
+
+def conversation(turns: int) -> List[BaseMessage]:
+    messages: List[BaseMessage] = [SystemMessage(content="你是測試助理")]
+    for turn in range(turns):
+        messages.extend(tool_turn(turn))
+    return messages
+
+
+def problems(selected: List[BaseMessage]) -> List[str]:
+    found = []
+    call_ids: Set[Optional[str]] = set()
+    result_ids: Set[Optional[str]] = set()
+    for message in selected:
+        if isinstance(message, AIMessage):
+            call_ids |= {call.get("id") for call in message.tool_calls or []}
+        elif isinstance(message, ToolMessage):
+            if message.tool_call_id not in call_ids:
+                found.append(f"工具結果 {message.tool_call_id} 沒有對應的 tool_call")
+            result_ids.add(message.tool_call_id)
+    missing = call_ids - result_ids
+    if missing:
+        found.append(f"tool_call {sorted(missing)} 沒有對應的工具結果")
+    return found
+
+
+def check(name: str, policy: str, pins: List[int], expect_kept: List[int]) -> bool:
+    messages = conversation(12)
+    manager = ContextManager(budget=150, policy=policy)
+    for index in pins:
+        manager.pin(index)
+    selected = manager.select(messages)
+
+    found = problems(selected)
+    kept = {id(messages[i]) for i in expect_kept}
+    recent = [m for m in selected if not isinstance(m, SystemMessage) and id(m) not in kept]
+    if not recent or not isinstance(recent[0], HumanMessage):
+        found.append("最近的對話不是從使用者訊息開始")
+    missing = [i for i in expect_kept if all(m is not messages[i] for m in selected)]
+    if missing:
+        found.append(f"釘選的訊息未保留: {missing}")
+    if len(selected) >= len(messages):
+        found.append("沒有裁剪（預算設定不足以觸發裁剪）")
+
+    ok = not found
+    print(f"{'✅' if ok else '❌'} {name}: 保留 {len(selected)}/{len(messages)} 則訊息{'' if ok else '，' + '；'.join(found)}")
+    return ok
+
+
+def main() -> int:
+    # conversation 中第 0 輪為索引 1-4：1 使用者、2 工具呼叫、3 工具結果、4 回答
+    results = [
+        check("sliding_window", "sliding_window", [], []),
+        check("system_recent", "system_recent", [], []),
+        check("pinned：釘選工具呼叫", "pinned", [2], [2, 3]),
+        check("pinned：釘選工具結果", "pinned", [3], [2, 3]),
+        check("pinned：釘選使用者訊息與回答", "pinned", [1, 4], [1, 4]),
+    ]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
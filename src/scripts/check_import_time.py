@@ -0,0 +1,102 @@
+"""
+匯入時間檢查 - import agent 不可載入延遲匯入的套件，自身匯入時間不可超過預算
+
+每次在新的 Python 子行程中匯入 agent 套件（避免模組快取），檢查：
+  1. 只在使用時才需要的套件（provider SDK、langgraph.prebuilt、MCP）沒有在
+     匯入時被載入（主要檢查，與機器速度無關）
+  2. agent 自身的匯入時間：先匯入必要的相依套件（langchain_core 等，約佔匯入
+     時間的九成，隨機器與磁碟快取浮動），再量測 import agent，取多次量測的
+     中位數與預算比較
+載入了延遲匯入的套件或超過預算時以非零狀態碼結束。
+
+用法（於 src 目錄）：
+    python scripts/check_import_time.py [--budget 秒數] [--runs 次數]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 匯入 agent 時不應載入的套件（皆於首次使用時才匯入）
+LAZY_MODULES = [
+    "langchain_ollama",
+    "langchain_anthropic",
+    "langchain_openai",
+    "langchain_google_genai",
+    "langchain_mistralai",
+    "langchain_deepseek",
+    "langgraph.prebuilt",
+    "langchain_mcp_adapters",
+    "mcp",
+]
+
+# agent 匯入時必定載入的相依套件，先行匯入以排除其時間
+DEPENDENCIES = [
+    "langchain_core.language_models.chat_models",
+    "langchain_core.messages",
+    "langchain_core.tools",
+    "langgraph.checkpoint.base",
+    "tenacity",
+    "dotenv",
+]
+
+MEASURE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+for name in %r:
+    importlib.import_module(name)
+middle = time.perf_counter()
+import agent
+end = time.perf_counter()
+print(json.dumps({
+    "dependencies": middle - start,
+    "elapsed": end - middle,
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+""" % (DEPENDENCIES, LAZY_MODULES)
+
+
+def measure() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", MEASURE],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="檢查 import agent 的時間")
+    parser.add_argument("--budget", type=float, default=0.3, help="agent 自身匯入時間預算（秒），預設 0.3")
+    parser.add_argument("--runs", type=int, default=5, help="量測次數，取中位數，預設 5")
+    args = parser.parse_args()
+
+    results = [measure() for _ in range(args.runs)]
+    loaded = sorted({module for result in results for module in result["loaded"]})
+    elapsed = statistics.median(result["elapsed"] for result in results)
+    dependencies = statistics.median(result["dependencies"] for result in results)
+
+    ok = not loaded
+    if loaded:
+        print(f"❌ 匯入時載入了應延遲匯入的套件: {', '.join(loaded)}")
+    else:
+        print(f"✅ 匯入時未載入延遲匯入的套件（{len(LAZY_MODULES)} 個）")
+
+    within = elapsed <= args.budget
+    ok = ok and within
+    print(
+        f"{'✅' if within else '❌'} import agent: {elapsed:.3f} 秒（預算 {args.budget:.3f} 秒，"
+        f"{args.runs} 次取中位數；另有相依套件 {dependencies:.3f} 秒不計入）"
+    )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+容錯行為檢查 - Retry-After 解析與錯誤傳遞
+
+檢查：
+  1. get_retry_after 可解析秒數、HTTP-date 與 retry-after-ms，無法解析的值回傳 None
+     （不可在 tenacity 的等待回呼中拋出例外而蓋掉原本的 429）
+  2. LLM_Provider.invoke_chat / ainvoke_chat 拋出 provider 錯誤，不轉成回應文字；
+     啟用容錯時重試用盡才拋出 AllProvidersFailedError
+  3. RouterChatModel 只把可重試的錯誤計入端點錯誤率，錯誤的請求不會剔除健康端點
+有任何案例不符時以非零狀態碼結束。
+
+用法（於 src 目錄）：
+    python scripts/check_resilience.py
+"""
+
+import asyncio
+import email.utils
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, BaseMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatResult  # noqa: E402
+
+from agent.core.llm_factory import LLM_Provider, register_provider, unregister_provider  # noqa: E402
+from agent.core.resilience import AllProvidersFailedError, RetryPolicy, get_retry_after  # noqa: E402
+from agent.core.router import RouterChatModel  # noqa: E402
+
+RESULTS: List[bool] = []
+
+
+def report(name: str, passed: bool, detail: str = "") -> None:
+    RESULTS.append(passed)
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+
+
+class HTTPError(Exception):
+    """帶有回應標頭與狀態碼的假 HTTP 錯誤"""
+
+    def __init__(self, status_code: int, headers: Optional[Dict[str, str]] = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}, "status_code": status_code})()
+
+
+class FailingChatModel(BaseChatModel):
+    """前 failures 次呼叫拋出 error，之後回傳 ok"""
+
+    failures: int = 1
+    error: Any = None
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "failing"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+
+def check_retry_after() -> None:
+    future = email.utils.formatdate(time.time() + 30, usegmt=True)
+    cases: List[tuple] = [
+        ("秒數", {"retry-after": "7"}, lambda value: value == 7.0),
+        ("HTTP-date", {"retry-after": future}, lambda value: value is not None and 25 <= value <= 31),
+        ("過去的 HTTP-date", {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}, lambda value: value == 0.0),
+        ("retry-after-ms", {"retry-after-ms": "1500"}, lambda value: value == 1.5),
+        ("無法解析的 retry-after-ms 改用 retry-after", {"retry-after-ms": "x", "retry-after": "2"}, lambda value: value == 2.0),
+        ("無法解析的值", {"retry-after": "garbage"}, lambda value: value is None),
+        ("非有限數值", {"retry-after": "nan"}, lambda value: value is None),
+        ("沒有標頭", {}, lambda value: value is None),
+    ]
+    for name, headers, expect in cases:
+        try:
+            value = get_retry_after(HTTPError(429, headers))
+            report(f"Retry-After {name}", expect(value), repr(value))
+        except Exception as e:
+            report(f"Retry-After {name}", False, f"拋出 {type(e).__name__}: {e}")
+
+
+def make_provider(name: str, factory: Callable[[], BaseChatModel], **kwargs: Any) -> LLM_Provider:
+    register_provider(name, lambda llm: factory())
+    try:
+        return LLM_Provider(model="fake", provider=name, pooled=False, **kwargs)
+    finally:
+        unregister_provider(name)
+
+
+def check_invoke_errors() -> None:
+    plain = make_provider("check-plain", lambda: FailingChatModel(error=HTTPError(429)))
+    try:
+        text = plain.invoke_chat("hi")
+        report("未啟用容錯時 invoke_chat 拋出 429", False, f"回傳文字 {text!r}")
+    except HTTPError:
+        report("未啟用容錯時 invoke_chat 拋出 429", True)
+
+    policy = RetryPolicy(max_attempts=3, initial_wait=0.01, max_wait=0.01)
+    retried = make_provider(
+        "check-retried", lambda: FailingChatModel(failures=2, error=HTTPError(503)), retry_policy=policy
+    )
+    try:
+        report("啟用容錯時暫時性錯誤重試後成功", retried.invoke_chat("hi") == "ok")
+    except Exception as e:
+        report("啟用容錯時暫時性錯誤重試後成功", False, f"拋出 {type(e).__name__}: {e}")
+
+    exhausted = make_provider(
+        "check-exhausted", lambda: FailingChatModel(failures=99, error=HTTPError(503)), retry_policy=policy
+    )
+    try:
+        text = asyncio.run(exhausted.ainvoke_chat("hi"))
+        report("重試用盡時 ainvoke_chat 拋出 AllProvidersFailedError", False, f"回傳文字 {text!r}")
+    except AllProvidersFailedError:
+        report("重試用盡時 ainvoke_chat 拋出 AllProvidersFailedError", True)
+
+    bad_request = make_provider(
+        "check-bad-request", lambda: FailingChatModel(error=HTTPError(400)), retry_policy=policy
+    )
+    try:
+        bad_request.invoke_chat("hi")
+        report("不可重試的錯誤直接拋出", False)
+    except HTTPError as e:
+        report("不可重試的錯誤直接拋出", e.status_code == 400)
+
+
+def check_router_errors() -> None:
+    router = RouterChatModel(
+        models=[FailingChatModel(failures=99, error=HTTPError(400)), FailingChatModel(failures=99, error=HTTPError(400))],
+        names=["a", "b"],
+    )
+    for _ in range(10):
+        try:
+            router.invoke("hi")
+        except HTTPError:
+            pass
+    stats = router.get_stats()
+    ejected = [s.name for s in router.stats if s.ejected_until > 0]
+    report(
+        "不可重試的錯誤不計入端點錯誤率",
+        all(s["error_rate"] == 0 for s in stats) and not ejected,
+        f"錯誤率 {[s['error_rate'] for s in stats]}，剔除 {ejected}",
+    )
+
+    router = RouterChatModel(
+        models=[FailingChatModel(failures=99, error=HTTPError(503)), FailingChatModel(failures=0)],
+        names=["down", "up"],
+    )
+    answers = [router.invoke("hi").content for _ in range(10)]
+    down = next(s for s in router.stats if s.name == "down")
+    report(
+        "可重試的錯誤計入錯誤率並切換端點",
+        all(answer == "ok" for answer in answers) and down.error_rate > 0,
+        f"down 錯誤率 {down.error_rate:.2f}",
+    )
+
+
+def main() -> int:
+    check_retry_after()
+    check_invoke_errors()
+    check_router_errors()
+    return 0 if all(RESULTS) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
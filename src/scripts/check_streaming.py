@@ -0,0 +1,94 @@
+"""
+流式輸出檢查 - 包裝模型的 token 不可重複
+
+ResilientChatModel 等包裝模型會在內部呼叫其他模型；若內層模型的執行進入
+LangGraph 的 messages 串流，stream_response 的每個 text_delta 會出現兩次。
+本腳本以不需網路的假模型逐一檢查各包裝模型，有任何輸出不符時以非零狀態碼結束。
+
+用法（於 src 目錄）：
+    python scripts/check_streaming.py
+"""
+
+import asyncio
+import os
+import sys
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult  # noqa: E402
+
+from agent.core.agent_factory import AgentFactory  # noqa: E402
+from agent.core.hedging import HedgedChatModel  # noqa: E402
+from agent.core.resilience import ResilientChatModel  # noqa: E402
+from agent.core.router import RouterChatModel  # noqa: E402
+
+REPLY = "串流 輸出 不應 重複"
+
+
+class StaticChatModel(BaseChatModel):
+    """固定回覆的假模型，串流時逐詞輸出"""
+
+    reply: str = REPLY
+
+    @property
+    def _llm_type(self) -> str:
+        return "static"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "StaticChatModel":
+        return self
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        words = self.reply.split(" ")
+        for index, word in enumerate(words):
+            await asyncio.sleep(0)
+            text = word if index == len(words) - 1 else word + " "
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+
+WRAPPERS: Dict[str, Callable[[], BaseChatModel]] = {
+    "ResilientChatModel": lambda: ResilientChatModel(models=[StaticChatModel()], names=["static"]),
+    "RouterChatModel": lambda: RouterChatModel(models=[StaticChatModel(), StaticChatModel()], names=["a", "b"]),
+    "HedgedChatModel": lambda: HedgedChatModel(primary=StaticChatModel(), secondary=StaticChatModel()),
+}
+
+
+async def check(name: str, model: BaseChatModel) -> bool:
+    agent = AgentFactory().create_agent(name, "串流檢查", "你是測試助理", model)
+    deltas, final = [], None
+    async for event in agent.stream_response("你好"):
+        if event.type == "text_delta":
+            deltas.append(event.content)
+        elif event.type == "final":
+            final = event.content
+
+    streamed = "".join(deltas)
+    ok = streamed == REPLY and final == REPLY
+    print(f"{'✅' if ok else '❌'} {name}: text_delta={streamed!r} final={final!r}")
+    return ok
+
+
+async def main() -> int:
+    results = [await check(name, factory()) for name, factory in WRAPPERS.items()]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,76 @@
+"""
+工具檢索檢查 - 檢索沒有可信結果時必須綁定全部工具
+
+tool_top_k 啟用時，ToolSelector 依最後一則使用者訊息以 BM25 挑選工具。
+訊息與工具描述沒有共同字詞時（例如中文訊息、英文描述），檢索結果為空，
+模型不可因此在沒有任何工具的情況下回答。本腳本檢查：
+  1. 明確提到工具的訊息只綁定檢索出的 top_k 個工具
+  2. 沒有足夠相關結果的訊息綁定全部工具
+有任何案例不符時以非零狀態碼結束。
+
+用法（於 src 目錄）：
+    python scripts/check_tool_retrieval.py
+"""
+
+import os
+import sys
+from typing import List, Set
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.tools import StructuredTool  # noqa: E402
+
+from agent.tools.tool_retriever import BM25Index, ToolSelector  # noqa: E402
+
+TOOLS = {
+    "get_weather": "Get the current weather forecast for a city",
+    "fetch_url": "Fetch a web page and return its content as markdown",
+    "read_file": "Read a file from the local filesystem",
+    "write_file": "Write text content to a file on the local filesystem",
+    "list_directory": "List the entries of a directory",
+    "search_web": "Search the web with a search engine and return result links",
+    "send_email": "Send an email message to a recipient",
+    "create_calendar_event": "Create an event in the user's calendar",
+    "run_sql_query": "Run a read-only SQL query against the database",
+    "translate_text": "Translate text between languages",
+}
+
+# (訊息, 必須綁定的工具；None 表示必須綁定全部工具)
+CASES = [
+    ("get the weather forecast for Taipei", {"get_weather"}),
+    ("fetch the web page at https://example.com", {"fetch_url"}),
+    ("run this sql query on the database", {"run_sql_query"}),
+    ("請用合適的工具查詢天氣", None),
+    ("幫我抓取這個網址 https://example.com", None),
+    ("what's it like outside in Paris", None),
+]
+
+
+class FakeModel:
+    def bind_tools(self, tools: List[StructuredTool]) -> Set[str]:
+        return {tool.name for tool in tools}
+
+
+def make_tool(name: str, description: str) -> StructuredTool:
+    return StructuredTool.from_function(func=lambda query="": query, name=name, description=description)
+
+
+def main() -> int:
+    tools = [make_tool(name, description) for name, description in TOOLS.items()]
+    selector = ToolSelector(FakeModel(), tools, BM25Index.from_tools(tools), top_k=3)
+
+    ok = True
+    for query, expected in CASES:
+        names = selector.select(query)
+        bound = selector.bind(names)
+        if expected is None:
+            passed = bound == set(TOOLS)
+        else:
+            passed = expected <= bound and len(bound) <= selector.top_k
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} {query!r}: 綁定 {len(bound)} 個工具 {sorted(bound)}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())